@@ -0,0 +1,157 @@
+import os
+import csv
+import json
+import argparse
+
+import numpy as np
+
+# Générateur de jeux de données synthétiques pour les benchmarks.
+# Les valeurs sont tirées par colonne et par lot (numpy), avec une graine fixe :
+# mêmes paramètres -> même fichier, quelle que soit la taille des lots.
+
+TYPES = ("int", "float", "str", "bool")
+FORMATS = ("csv", "json", "jsonl")
+
+_BATCH_SIZE = 100000
+_WORDS = np.array([f"mot{i}" for i in range(1000)], dtype=object)
+
+
+def parse_size(text):
+    """ "10k" -> 10000, "1.5m" -> 1500000."""
+    text = str(text).strip().lower()
+    factor = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    if factor != 1: text = text[:-1]
+    return int(float(text) * factor)
+
+
+def column_specs(columns, types=TYPES, nesting=0):
+    """Noms et types des colonnes : `types` répétés dans l'ordre, plus une colonne imbriquée si `nesting`."""
+    specs = [("id", "id")]
+    specs += [(f"{t}_{i}", t) for i, t in zip(range(1, columns), _cycle(types))]
+    if nesting:
+        specs.append(("nested", "nested"))
+    return specs
+
+
+def _cycle(types):
+    while True:
+        yield from types
+
+
+def _nested(rng, n, depth):
+    """Objets imbriqués sur `depth` niveaux (un dict et une liste par niveau)."""
+    ints = rng.integers(0, 1000, size=(n, depth)).tolist()
+    values = []
+    for row in ints:
+        value = {"v": row[-1], "l": row[-1:]}
+        for v in reversed(row[:-1]):
+            value = {"v": v, "l": [v, v + 1], "child": value}
+        values.append(value)
+    return values
+
+
+def _column(rng, kind, start, n, depth):
+    if kind == "id": return np.arange(start, start + n).tolist()
+    if kind == "int": return rng.integers(-1000000, 1000000, size=n).tolist()
+    if kind == "float": return np.round(rng.normal(0, 1000, size=n), 3).tolist()
+    if kind == "bool": return (rng.random(n) < 0.5).tolist()
+    if kind == "str": return _WORDS[rng.integers(0, len(_WORDS), size=n)].tolist()
+    return _nested(rng, n, depth)
+
+
+def iter_batches(rows, columns=8, types=TYPES, null_ratio=0.0, nesting=0, seed=0, batch_size=None):
+    """Génère les lignes par lots de dictionnaires (les valeurs nulles valent None)."""
+    batch_size = batch_size or _BATCH_SIZE
+    specs = column_specs(columns, types, nesting)
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        # Une graine par lot : le contenu ne dépend pas de l'ordre de génération
+        rng = np.random.default_rng([seed, start])
+        values = {}
+        for name, kind in specs:
+            col = _column(rng, kind, start, n, nesting)
+            if null_ratio and kind != "id":
+                for i in np.flatnonzero(rng.random(n) < null_ratio).tolist():
+                    col[i] = None
+            values[name] = col
+        names = list(values)
+        yield [dict(zip(names, row)) for row in zip(*values.values())]
+
+
+def _csv_cell(v):
+    if v is None: return ""
+    if isinstance(v, bool): return "true" if v else "false"
+    if isinstance(v, (dict, list)): return json.dumps(v, separators=(",", ":"))
+    return v
+
+
+def write(path, fmt, rows, columns=8, types=TYPES, null_ratio=0.0, nesting=0, seed=0):
+    """Écrit le jeu de données en streaming ; renvoie le chemin."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Format inconnu : {fmt} (choix : {', '.join(FORMATS)})")
+    batches = iter_batches(rows, columns, types, null_ratio, nesting, seed)
+    specs = column_specs(columns, types, nesting)
+    tmp = path + ".part"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow([name for name, _ in specs])
+            for batch in batches:
+                writer.writerows([_csv_cell(v) for v in r.values()] for r in batch)
+        elif fmt == "jsonl":
+            for batch in batches:
+                f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in batch))
+        else:
+            separator = "["
+            for batch in batches:
+                f.write(separator + "\n" + ",\n".join(json.dumps(r, separators=(",", ":")) for r in batch))
+                separator = ","
+            f.write("\n]\n" if separator == "," else "[]\n")
+    os.replace(tmp, path)
+    return path
+
+
+def dataset_name(fmt, rows, columns=8, types=TYPES, null_ratio=0.0, nesting=0, seed=0):
+    """Nom de fichier qui décrit tous les paramètres (un fichier déjà généré est réutilisé)."""
+    return (f"bench_{rows}r_{columns}c_{'-'.join(types)}_n{null_ratio:g}_d{nesting}_s{seed}.{fmt}")
+
+
+def ensure(directory, fmt, rows, columns=8, types=TYPES, null_ratio=0.0, nesting=0, seed=0):
+    """Chemin du jeu de données, généré seulement s'il n'existe pas encore."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, dataset_name(fmt, rows, columns, types, null_ratio, nesting, seed))
+    if not os.path.exists(path):
+        write(path, fmt, rows, columns, types, null_ratio, nesting, seed)
+    return path
+
+
+def parse_types(text):
+    types = tuple(t.strip() for t in text.split(",") if t.strip())
+    unknown = [t for t in types if t not in TYPES]
+    if unknown or not types:
+        raise argparse.ArgumentTypeError(f"Types inconnus : {', '.join(unknown)} (choix : {', '.join(TYPES)})")
+    return types
+
+
+def add_arguments(parser):
+    parser.add_argument("--columns", type=int, default=8, help="nombre de colonnes (id compris)")
+    parser.add_argument("--types", type=parse_types, default=TYPES, help="types des colonnes, répétés dans l'ordre")
+    parser.add_argument("--nulls", type=float, default=0.0, help="proportion de valeurs nulles (0 à 1)")
+    parser.add_argument("--nesting", type=int, default=0, help="profondeur des colonnes imbriquées (0 = aucune)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère un jeu de données synthétique (CSV / JSON / JSON Lines)")
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=parse_size, default=100000, help="nombre de lignes (10k, 1m...)")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="par défaut : extension du fichier")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip(".").lower()
+    write(args.path, fmt, args.rows, args.columns, args.types, args.nulls, args.nesting, args.seed)
+    print(f"{args.rows} lignes écrites dans {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import multiprocessing
+
+import numpy as np
+
+from . import generate
+from datafilter.modules import config
+from datafilter.modules import filter as my_filter
+from datafilter.modules import sort as my_sort
+from datafilter.modules import stats as my_stats
+from datafilter.modules.formats import fcsv, fjson
+
+# Benchmarks des opérations de base (chargement, filtre, tri, statistiques, export) sur des jeux
+# de données synthétiques de plusieurs tailles. Chaque mesure tourne dans un processus neuf :
+# pas de cache (index, inférence de types...) hérité d'une mesure précédente. La mémoire mesurée
+# est le pic de RSS de l'opération seule, au-delà de la mémoire déjà occupée après le chargement. Les résultats peuvent être enregistrés comme référence,
+# puis comparés à chaque lancement : un écart au-delà du seuil est signalé comme régression.
+#
+#   cd backend
+#   python -m benchmarks.run --sizes 10k,100k,1m --save-baseline
+#   python -m benchmarks.run --sizes 10k,100k,1m            # compare à la référence
+
+OPERATIONS = ("load", "filter", "sort", "stats", "save")
+DEFAULT_SIZES = "10k,100k,1m"
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 0.25  # régression : +25 % de temps ou de mémoire
+MIN_SECONDS = 0.01        # en dessous, le bruit de mesure domine : pas de régression de temps
+MIN_RSS_MB = 1.0          # idem pour la mémoire
+
+
+# --- Mesures (processus fils) ---
+
+def _peak_rss_mb():
+    """Mémoire résidente maximale du processus et de ses fils (pool parallèle), en Mo."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux : Ko, macOS : octets
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def _peak_children_mb():
+    """Mémoire résidente maximale des processus fils (pool parallèle), en Mo."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def _proc_status_mb(key):
+    """Champ mémoire de /proc/self/status (VmRSS, VmHWM), en Mo ; None hors Linux."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """
+    Remet à zéro le pic de mémoire du processus (Linux : VmHWM ramené à la RSS courante).
+    Renvoie (base, reset) : la mémoire de départ de la mesure, et si le pic a bien été remis à zéro.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return _peak_rss_mb(), False
+    return _proc_status_mb("VmRSS"), True
+
+
+def _rss_growth_mb(base, reset, children_before):
+    """Mémoire ajoutée par l'opération : hausse du pic du processus, ou de celui du pool parallèle."""
+    peak = _proc_status_mb("VmHWM") if reset else _peak_rss_mb()
+    if base is None or peak is None:
+        return None
+    growth = peak - base
+    children = _peak_children_mb()
+    if children is not None and children > children_before:
+        growth = max(growth, children - children_before)
+    return max(growth, 0.0)
+
+
+def _load(path):
+    if path.endswith(".csv"):
+        return fcsv.load(path)
+    # Sans accumulateur : les statistiques sont mesurées par l'opération "stats"
+    return fjson.load(path)
+
+
+def _first_column(data, kinds):
+    for name, col in data.columns.items():
+        if col.kind in kinds and name != "id":
+            return name
+    return "id"
+
+
+def _operation(op, path, data, workdir):
+    """Exécute l'opération ; renvoie le nombre de lignes traitées."""
+    if op == "load":
+        return len(_load(path))
+    if op == "filter":
+        field = _first_column(data, ("int", "float"))
+        value = 0 if field != "id" else len(data) // 2
+        my_filter.filter_data(data, field, value, ">")
+    elif op == "sort":
+        my_sort.sort_data(data, [_first_column(data, ("str", "int", "float"))])
+    elif op == "stats":
+        my_stats.analyze_structure(data)
+    elif op == "save":
+        config.OUTPUT_DIR = workdir
+        name, extension = os.path.splitext(os.path.basename(path))
+        if extension == ".csv":
+            fcsv.save(data, f"saved_{name}")
+        else:
+            fjson.save(data, f"saved_{name}", indent=None, extension=extension)
+    return len(data)
+
+
+def _measure(op, path, workdir, conn):
+    try:
+        data = None if op == "load" else _load(path)
+        # Le pic atteint pendant le chargement ne compte pas : on ne mesure que l'opération
+        children_before = _peak_children_mb() or 0.0
+        base, reset = _reset_peak_rss()
+        start = time.perf_counter()
+        rows = _operation(op, path, data, workdir)
+        seconds = time.perf_counter() - start
+        growth = _rss_growth_mb(base, reset, children_before)
+        conn.send({"seconds": seconds, "rows": rows, "rss_growth_mb": growth})
+    except BaseException as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def measure(op, path, workdir):
+    """
+    Une mesure dans un processus neuf (spawn). Ce n'est pas un processus "daemon" :
+    le pool de datafilter.modules.parallel peut y démarrer ses propres processus.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_measure, args=(op, path, workdir, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        result = {"error": "le processus de mesure s'est arrêté sans résultat"}
+    process.join()
+    if "error" in result:
+        raise RuntimeError(f"{op} sur {os.path.basename(path)} : {result['error']}")
+    return result
+
+
+# --- Campagne ---
+
+def run(sizes, formats, operations, repeat=3, data_dir=None, columns=8, types=generate.TYPES,
+        null_ratio=0.0, nesting=0, seed=0, log=print):
+    """Mesure chaque opération `repeat` fois (le meilleur temps est retenu) ; renvoie les résultats."""
+    data_dir = data_dir or os.path.join(config.TMP_DIR, "benchmarks")
+    workdir = os.path.join(data_dir, "output")
+    os.makedirs(workdir, exist_ok=True)
+    results = {}
+    for rows in sizes:
+        for fmt in formats:
+            log(f"Jeu de données : {rows} lignes, {fmt}...")
+            path = generate.ensure(data_dir, fmt, rows, columns, types, null_ratio, nesting, seed)
+            for op in operations:
+                runs = [measure(op, path, workdir) for _ in range(repeat)]
+                seconds = min(r["seconds"] for r in runs)
+                rss = [r["rss_growth_mb"] for r in runs if r["rss_growth_mb"] is not None]
+                results[f"{fmt}/{rows}/{op}"] = {
+                    "format": fmt, "rows": rows, "operation": op,
+                    "seconds": round(seconds, 6),
+                    "rows_per_sec": round(runs[0]["rows"] / seconds) if seconds else None,
+                    "rss_growth_mb": round(min(rss), 1) if rss else None,
+                }
+    return results
+
+
+def environment(args):
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "dataset": {"columns": args.columns, "types": list(args.types), "nulls": args.nulls,
+                    "nesting": args.nesting, "seed": args.seed},
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Écarts relatifs à la référence ; renvoie {clé: {"time": ratio, "rss": ratio, "regression": bool}}."""
+    report = {}
+    for key, current in results.items():
+        base = baseline.get(key)
+        if base is None: continue
+        entry = {"time": None, "rss": None}
+        if base.get("seconds"):
+            entry["time"] = current["seconds"] / base["seconds"]
+        slow = entry["time"] is not None and entry["time"] > 1 + threshold and current["seconds"] >= MIN_SECONDS
+        if base.get("rss_growth_mb") and current.get("rss_growth_mb") is not None:
+            entry["rss"] = current["rss_growth_mb"] / base["rss_growth_mb"]
+        heavy = (entry["rss"] is not None and entry["rss"] > 1 + threshold
+                 and current["rss_growth_mb"] >= MIN_RSS_MB)
+        entry["regression"] = slow or heavy
+        report[key] = entry
+    return report
+
+
+def _percent(ratio):
+    return "" if ratio is None else f"{(ratio - 1) * 100:+.0f} %"
+
+
+def format_table(results, report=None):
+    report = report or {}
+    header = ("format", "lignes", "opération", "temps (s)", "lignes/s", "+RSS max (Mo)", "Δ temps", "Δ RSS", "")
+    lines = [header]
+    for key, r in results.items():
+        cmp = report.get(key, {})
+        lines.append((r["format"], f"{r['rows']:,}".replace(",", " "), r["operation"], f"{r['seconds']:.3f}",
+                      f"{r['rows_per_sec']:,}".replace(",", " ") if r["rows_per_sec"] else "-",
+                      "-" if r["rss_growth_mb"] is None else f"{r['rss_growth_mb']:.1f}",
+                      _percent(cmp.get("time")), _percent(cmp.get("rss")),
+                      "RÉGRESSION" if cmp.get("regression") else ""))
+    widths = [max(len(str(line[i])) for line in lines) for i in range(len(header))]
+    return "\n".join("  ".join(str(v).ljust(w) for v, w in zip(line, widths)).rstrip() for line in lines)
+
+
+def _csv_list(choices):
+    def parse(text):
+        values = [v.strip() for v in text.split(",") if v.strip()]
+        unknown = [v for v in values if v not in choices]
+        if unknown or not values:
+            raise argparse.ArgumentTypeError(f"Valeurs inconnues : {', '.join(unknown)} (choix : {', '.join(choices)})")
+        return values
+    return parse
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks chargement / filtre / tri / stats / export")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="tailles en lignes (10k,100k,1m,10m)")
+    parser.add_argument("--formats", type=_csv_list(generate.FORMATS), default=["csv", "json"])
+    parser.add_argument("--ops", type=_csv_list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="mesures par opération (meilleur temps retenu)")
+    parser.add_argument("--data-dir", default=None, help="jeux de données générés (défaut : TMP_DIR/benchmarks)")
+    generate.add_arguments(parser)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="fichier de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre ces résultats comme référence")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="écart relatif au-delà duquel une mesure est une régression (0.25 = +25 %%)")
+    parser.add_argument("--output", default=None, help="écrit aussi les résultats dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    sizes = [generate.parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    results = run(sizes, args.formats, args.ops, args.repeat, args.data_dir, args.columns, args.types,
+                  args.nulls, args.nesting, args.seed)
+    document = {"environment": environment(args), "results": results}
+
+    report = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("dataset") != document["environment"]["dataset"]:
+            print("⚠️ Paramètres des jeux de données différents de ceux de la référence", file=sys.stderr)
+        report = compare(results, baseline.get("results", {}), args.threshold)
+
+    print(format_table(results, report))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline}")
+        return 0
+
+    regressions = [key for key, entry in (report or {}).items() if entry["regression"]]
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {args.threshold:.0%} : {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
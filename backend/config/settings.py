@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -57,7 +59,15 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:8000",
 ]
 
+# En-tête utilisé par le frontend pour désigner son espace de travail
+CORS_ALLOW_HEADERS = (
+    *default_headers,
+    "x-workspace",
+)
+
 MIDDLEWARE = [
+    # En premier : mesure la requête entière (durées exposées via /metrics/ et Server-Timing)
+    'datafilter.instrumentation.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,8 +78,20 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Rendu JSON mesuré (phase "serialize" de Server-Timing et /metrics/)
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'datafilter.instrumentation.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 ROOT_URLCONF = 'config.urls'
 
+# Sessions stockées dans un cookie signé : pas besoin de table en base
+# (la session ne contient que le handle de l'espace de travail)
+SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
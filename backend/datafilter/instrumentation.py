@@ -0,0 +1,48 @@
+from django.conf import settings
+from rest_framework import renderers
+
+from .modules import config
+from .modules import metrics as my_metrics
+
+
+class MetricsMiddleware:
+    """
+    Mesure chaque requête (voir modules/metrics.py) et ajoute l'en-tête Server-Timing :
+    durée de chaque phase (parse, convert, filter, sort, serialize...) et durée totale.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not config.METRICS_ENABLED:
+            return self.get_response(request)
+        with my_metrics.request() as metrics:
+            metrics.method = request.method
+            response = self.get_response(request)
+            metrics.status = response.status_code
+            if metrics.endpoint == "unknown":
+                # URL inconnue (404) ou non résolue : une seule série pour toutes
+                metrics.endpoint = "not_found" if response.status_code == 404 else "unknown"
+        if config.METRICS_SERVER_TIMING:
+            response["Server-Timing"] = metrics.server_timing()
+            origin = request.headers.get("Origin")
+            if origin and origin in getattr(settings, "CORS_ALLOWED_ORIGINS", ()):
+                # Sans cet en-tête, le navigateur cache Server-Timing au front (autre origine)
+                response["Timing-Allow-Origin"] = origin
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # L'URL est résolue : les phases du traitement sont rangées sous le nom de la vue
+        metrics = my_metrics.current()
+        if metrics is not None and request.resolver_match is not None:
+            metrics.endpoint = request.resolver_match.url_name or request.resolver_match.view_name
+        return None
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """Rendu JSON des réponses de l'API, mesuré comme phase "serialize"."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with my_metrics.phase("serialize"):
+            return super().render(data, accepted_media_type, renderer_context)
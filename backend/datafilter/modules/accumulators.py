@@ -0,0 +1,290 @@
+import math
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import jobs
+from . import sketches
+from . import utils
+
+# Accumulateurs de statistiques : une seule passe sur les données,
+# mise à jour par lots (chargement, filtres) et fusion entre partitions.
+
+
+def _item(value):
+    """Convertit un scalaire numpy en valeur Python (sérialisable en JSON)."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class NumberAccumulator:
+    """count, min, max, moyenne et variance (Welford / Chan pour la fusion)."""
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.distinct = sketches.HyperLogLog()
+        self.quantiles = sketches.KLLSketch()
+
+    def update(self, values):
+        if isinstance(values, np.ndarray):
+            n = len(values)
+            if not n: return
+            vmin, vmax = _item(values.min()), _item(values.max())
+            floats = values.astype(np.float64)
+        else:
+            n = len(values)
+            if not n: return
+            vmin, vmax = min(values), max(values)
+            floats = np.array(values, dtype=np.float64)
+        mean = float(floats.mean())
+        m2 = float(((floats - mean) ** 2).sum())
+        self._combine(n, vmin, vmax, mean, m2)
+        self.distinct.update_hashes(sketches.hash_numbers(floats))
+        self.quantiles.update(floats)
+
+    def _combine(self, n, vmin, vmax, mean, m2):
+        if not n: return
+        if not self.count:
+            self.count, self.min, self.max, self.mean, self.m2 = n, vmin, vmax, mean, m2
+            return
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, vmin)
+        self.max = max(self.max, vmax)
+
+    def merge(self, other):
+        self._combine(other.count, other.min, other.max, other.mean, other.m2)
+        self.distinct.merge(other.distinct)
+        self.quantiles.merge(other.quantiles)
+
+    def report(self):
+        variance = self.m2 / self.count if self.count else 0
+        quantiles = self.quantiles.quantiles(config.STATS_QUANTILES)
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.mean,
+            'variance': variance,
+            'std': math.sqrt(variance),
+            'distinct_count': self.distinct.estimate(),
+            'median': self.quantiles.quantiles([0.5])[0],
+            'quantiles': {f"p{round(q * 100)}": v for q, v in zip(config.STATS_QUANTILES, quantiles)},
+        }
+
+
+class BoolAccumulator:
+    def __init__(self):
+        self.count = 0
+        self.true_count = 0
+
+    def update(self, values):
+        self.count += len(values)
+        if isinstance(values, np.ndarray):
+            self.true_count += int(np.count_nonzero(values))
+        else:
+            self.true_count += sum(1 for v in values if v is True)
+
+    def merge(self, other):
+        self.count += other.count
+        self.true_count += other.true_count
+
+    def report(self):
+        false_count = self.count - self.true_count
+        return {
+            'count': self.count,
+            'true_count': self.true_count,
+            'false_count': false_count,
+            'true_percentage': (self.true_count / self.count) * 100 if self.count else 0,
+            'false_percentage': (false_count / self.count) * 100 if self.count else 0
+        }
+
+
+class StrAccumulator:
+    def __init__(self):
+        self.count = 0
+        self.sample_values = []
+        self.distinct = sketches.HyperLogLog()
+        self.top_values = sketches.HeavyHitters()
+
+    def update(self, values):
+        self.count += len(values)
+        missing = config.STATS_MAX_SAMPLE_VALUES - len(self.sample_values)
+        if missing > 0:
+            self.sample_values.extend(list(values[:missing]))
+        self.distinct.update_hashes(sketches.hash_strings(list(set(values))))
+        self.top_values.update(values)
+
+    def update_codes(self, codes, dictionary):
+        """Colonne encodée : on compte les codes, puis on ne manipule que les valeurs distinctes."""
+        self.count += len(codes)
+        missing = config.STATS_MAX_SAMPLE_VALUES - len(self.sample_values)
+        if missing > 0:
+            self.sample_values.extend(dictionary[codes[:missing]].tolist())
+
+        counts = np.bincount(codes, minlength=len(dictionary))
+        present = np.flatnonzero(counts)
+        self.distinct.update_hashes(sketches.hash_strings(dictionary[present]))
+        self.top_values.update_counts(dictionary[present], counts[present])
+
+    def merge(self, other):
+        self.count += other.count
+        missing = config.STATS_MAX_SAMPLE_VALUES - len(self.sample_values)
+        if missing > 0:
+            self.sample_values.extend(other.sample_values[:missing])
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+
+    def report(self):
+        return {
+            'count': self.count,
+            'sample_values': self.sample_values,
+            'distinct_count': self.distinct.estimate(),
+            'top_values': self.top_values.top(),
+        }
+
+
+class SizeAccumulator:
+    """Listes et dictionnaires : statistiques sur la taille."""
+
+    def __init__(self):
+        self.count = 0
+        self.size_min = None
+        self.size_max = None
+        self.size_sum = 0
+
+    def update(self, values):
+        sizes = [len(v) for v in values]
+        if not sizes: return
+        self.count += len(sizes)
+        self.size_sum += sum(sizes)
+        self.size_min = min(sizes) if self.size_min is None else min(self.size_min, min(sizes))
+        self.size_max = max(sizes) if self.size_max is None else max(self.size_max, max(sizes))
+
+    def merge(self, other):
+        if not other.count: return
+        self.count += other.count
+        self.size_sum += other.size_sum
+        self.size_min = other.size_min if self.size_min is None else min(self.size_min, other.size_min)
+        self.size_max = other.size_max if self.size_max is None else max(self.size_max, other.size_max)
+
+    def report(self):
+        return {
+            'count': self.count,
+            'size_min': self.size_min or 0,
+            'size_max': self.size_max or 0,
+            'size_mean': self.size_sum / self.count if self.count else 0
+        }
+
+
+TYPE_ACCUMULATORS = {
+    'number': NumberAccumulator,
+    'bool': BoolAccumulator,
+    'str': StrAccumulator,
+    'list': SizeAccumulator,
+    'dict': SizeAccumulator,
+}
+
+
+class ColumnAccumulator:
+    """Statistiques d'un champ : nulls + un accumulateur par type rencontré."""
+
+    def __init__(self):
+        self.non_null_count = 0
+        self.null_count = 0
+        self.types = {}
+
+    def _acc(self, ftype):
+        if ftype not in self.types:
+            self.types[ftype] = TYPE_ACCUMULATORS[ftype]()
+        return self.types[ftype]
+
+    def update_column(self, col, rows=None):
+        """Ajoute les valeurs d'une colonne (éventuellement restreinte à `rows`)."""
+        nulls = col.nulls if rows is None else col.nulls[rows]
+        values = col.values if rows is None else col.values[rows]
+        valid = ~nulls
+        null_count = int(np.count_nonzero(nulls))
+        self.null_count += null_count
+        self.non_null_count += len(nulls) - null_count
+        if null_count == len(nulls): return
+
+        match col.kind:
+            case ds.KIND_INT | ds.KIND_FLOAT:
+                self._acc('number').update(values[valid])
+            case ds.KIND_BOOL:
+                self._acc('bool').update(values[valid])
+            case ds.KIND_STR:
+                self._acc('str').update_codes(values[valid], col.dictionary)
+            case _:
+                self.update_values(values[valid])
+
+    def update_values(self, values):
+        """Valeurs Python hétérogènes (non nulles) : regroupement par type en une passe."""
+        groups = {}
+        for value in values:
+            field_type = utils.get_type_str(value)
+            if field_type in ['unknown', 'None']:
+                self.null_count += 1
+                self.non_null_count -= 1
+                continue
+            if utils.type_is_number(field_type):
+                field_type = 'number'
+            groups.setdefault(field_type, []).append(value)
+
+        for ftype, group in groups.items():
+            self._acc(ftype).update(group)
+
+    def merge(self, other):
+        self.non_null_count += other.non_null_count
+        self.null_count += other.null_count
+        for ftype, acc in other.types.items():
+            self._acc(ftype).merge(acc)
+
+    def report(self):
+        return {
+            'type_stats': {ftype: acc.report() for ftype, acc in self.types.items() if acc.count},
+            'non_null_count': self.non_null_count,
+            'null_count': self.null_count,
+        }
+
+
+class StatsAccumulator:
+    """Statistiques de tout un Dataset, alimentées colonne par colonne ou lot par lot."""
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def column(self, name):
+        if name not in self.columns:
+            self.columns[name] = ColumnAccumulator()
+        return self.columns[name]
+
+    def update_column(self, col, rows=None):
+        self.column(col.name).update_column(col, rows)
+
+    def update(self, data, rows=None):
+        """Ajoute toutes les colonnes d'un Dataset (ou seulement les lignes `rows`)."""
+        for col in data.columns.values():
+            # Une colonne à la fois : un job de statistiques annulé s'arrête avant la suivante
+            jobs.checkpoint()
+            self.update_column(col, rows)
+        self.rows += len(data) if rows is None else len(rows)
+        return self
+
+    def merge(self, other):
+        for name, acc in other.columns.items():
+            self.column(name).merge(acc)
+        self.rows += other.rows
+        return self
+
+    def report(self):
+        return {field: self.columns[field].report() for field in sorted(self.columns)}
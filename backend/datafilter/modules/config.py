@@ -16,4 +16,95 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(TMP_DIR, exist_ok=True)
 
 TAB_PADDING = 2
-STATS_MAX_SAMPLE_VALUES = 3
\ No newline at end of file
+STATS_MAX_SAMPLE_VALUES = 3
+# Statistiques calculées pendant la lecture du fichier (sketches compris, sur chaque chargement).
+# Désactivé : elles sont calculées au premier /stats/ puis gardées avec le Dataset.
+STATS_AT_LOAD = False
+
+# Résumés approximatifs des statistiques (erreurs cibles)
+STATS_DISTINCT_ERROR = 0.01   # HyperLogLog : erreur relative sur le nombre de valeurs distinctes
+STATS_QUANTILE_ERROR = 0.01   # KLL : erreur de rang sur les percentiles
+STATS_QUANTILES = (0.25, 0.5, 0.75, 0.9, 0.99)
+STATS_TOP_K = 10              # nombre de valeurs les plus fréquentes renvoyées
+STATS_TOP_K_ERROR = 0.001     # erreur maximale sur leurs comptes, en fraction du total
+
+# Nombre de lignes reconstruites par lot lors des exports / conversions
+DATASET_BATCH_SIZE = 10000
+
+# Tri : au-delà de ce budget (clés de tri en mémoire), tri fusion externe par morceaux sur disque
+SORT_MEMORY_BUDGET = 256 * 1024**2  # octets, 0 = toujours en mémoire
+
+# Parquet / Arrow (paquet optionnel 'pyarrow')
+PARQUET_ROW_GROUP_SIZE = 100000  # lignes par groupe (et par lot d'écriture)
+PARQUET_COMPRESSION = "snappy"   # codec par défaut des fichiers Parquet écrits
+
+# Export en streaming
+EXPORT_BUFFER_SIZE = 1024 * 1024  # tampon d'écriture (octets)
+EXPORT_GZIP_LEVEL = 6
+EXPORT_ZSTD_LEVEL = 3             # nécessite le paquet optionnel 'zstandard'
+
+# Espaces de travail (un par session / handle)
+WORKSPACE_MEMORY_BUDGET = 2 * 1024**3  # octets, 0 = illimité
+WORKSPACE_TTL = 30 * 60                # secondes d'inactivité avant expiration, 0 = jamais
+WORKSPACE_SHARE_BASE = True            # partage du fichier chargé entre les sessions
+
+# Index secondaires (construits au premier filtre sur une colonne, puis réutilisés)
+INDEX_ENABLED = True
+INDEX_MIN_ROWS = 50000  # en dessous, un parcours complet est aussi rapide
+
+# Expressions de filtre ("age > 30 and city in ('Paris', 'Lyon')") : plans compilés gardés en cache
+FILTER_EXPRESSION_CACHE_SIZE = 256
+
+# Chargement CSV en streaming
+CSV_CHUNK_SIZE = 50000  # lignes lues et converties par bloc
+CSV_SAMPLE_ROWS = 1000  # lignes utilisées pour deviner le type de chaque colonne
+
+# Chargement JSON / JSON Lines en streaming
+JSON_CHUNK_SIZE = 50000         # enregistrements convertis en colonnes par lot
+JSON_BLOCK_SIZE = 1024 * 1024   # caractères lus à la fois dans un tableau JSON
+
+# Chargement XML en streaming (iterparse)
+XML_RECORD_PATH = None     # éléments lus comme lignes, depuis la racine ("items/item", '*' possible) ; None = enfants de la racine
+XML_CHUNK_SIZE = 50000     # enregistrements convertis en colonnes par lot
+XML_ROOT_TAG = "records"   # export : élément racine
+XML_RECORD_TAG = "record"  # export : un élément par ligne
+
+# YAML (parseur C libyaml si PyYAML en dispose)
+YAML_CHUNK_SIZE = 50000    # enregistrements convertis en colonnes par lot
+YAML_LINE_WIDTH = 4096     # export : longueur de ligne avant repli des longues chaînes
+
+# Exécution parallèle (pool de processus, colonnes en mémoire partagée)
+PARALLEL_WORKERS = 0               # nombre de processus, 0 = nombre de coeurs, 1 = désactivé
+PARALLEL_MIN_ROWS = 500000         # en dessous, le coût du pool dépasse le gain : exécution série
+PARALLEL_START_METHOD = "spawn"    # "fork" est déconseillé dans un serveur multi-thread
+
+# Agrégation par groupes (/groupby/)
+GROUPBY_MAX_GROUPS = 1000000  # groupes agrégés à la fois ; au-delà, traitement par tranches écrites dans TMP_DIR
+
+# Schéma (types de chaque colonne), voir schema.py
+SCHEMA_SAMPLE_CONFIDENCE = None     # ex. 0.99 : colonnes hétérogènes lues sur un échantillon, None = lecture complète
+SCHEMA_SAMPLE_MIN_FREQUENCY = 0.001  # fréquence minimale d'un type vu avec ce niveau de confiance
+
+# Cache des résultats de requêtes (lignes filtrées, tris, stats), voir result_cache.py
+RESULT_CACHE_STORE = "memory"          # "memory" (par process), "disk" (partagé entre workers), None = désactivé
+RESULT_CACHE_BUDGET = 512 * 1024**2    # octets, 0 = illimité
+
+# Cache disque des fichiers parsés (colonnes numpy relues en mmap, dans TMP_DIR)
+DATASET_CACHE_ENABLED = True
+DATASET_CACHE_BUDGET = 10 * 1024**3  # octets, 0 = illimité
+
+# Mesures de performance : /metrics/ (format Prometheus) et en-tête Server-Timing, voir metrics.py
+METRICS_ENABLED = True
+METRICS_SERVER_TIMING = True   # durée de chaque phase dans l'en-tête Server-Timing des réponses
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # secondes
+METRICS_MEMORY_BUCKETS = tuple(2**i * 1024**2 for i in range(0, 14, 2))  # 1 Mo à 4 Go
+# Profilage des requêtes lentes (échantillonnage des piles), désactivé par défaut
+METRICS_PROFILE_SLOW_MS = None   # seuil en millisecondes au-delà duquel le profil est écrit, None = désactivé
+METRICS_PROFILE_INTERVAL = 0.005  # secondes entre deux échantillons
+METRICS_PROFILE_DIR = os.path.join(TMP_DIR, "profiles")
+METRICS_PROFILE_KEEP = 50         # profils conservés (les plus récents)
+
+# Tâches en arrière-plan (chargement, export, statistiques), suivies via /jobs/<id>/
+JOB_WORKERS = 2        # threads d'exécution des tâches
+JOB_TTL = 15 * 60      # secondes pendant lesquelles une tâche terminée reste consultable, 0 = toujours
+LOAD_PREVIEW_WAIT = 5  # secondes d'attente max du premier lot avant de répondre à un /load/ en arrière-plan
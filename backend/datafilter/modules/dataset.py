@@ -0,0 +1,390 @@
+from functools import cached_property
+
+import numpy as np
+
+from . import config
+from . import jobs
+from . import metrics as my_metrics
+from . import schema as my_schema
+
+# Types de colonnes gérés nativement
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_BOOL = "bool"
+KIND_STR = "str"
+KIND_OBJECT = "object"  # listes, dicts, types mélangés...
+
+NUMERIC_KINDS = {KIND_INT, KIND_FLOAT}
+
+_DTYPES = {
+    KIND_INT: np.int64,
+    KIND_FLOAT: np.float64,
+    KIND_BOOL: np.bool_,
+}
+_FILLERS = {
+    KIND_INT: 0,
+    KIND_FLOAT: 0.0,
+    KIND_BOOL: False,
+}
+
+
+def infer_kind(values):
+    """Devine le type de colonne à partir des valeurs Python (None ignorés)."""
+    types = set(map(type, values))
+    types.discard(type(None))
+
+    if not types: return KIND_OBJECT
+    if types == {bool}: return KIND_BOOL
+    if types == {int}: return KIND_INT
+    if types <= {int, float}: return KIND_FLOAT
+    if types == {str}: return KIND_STR
+    return KIND_OBJECT
+
+
+def _object_array(values):
+    """Tableau numpy de type object sans que numpy n'essaie de 'déplier' les listes."""
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+def encode_strings(values, nulls):
+    """Encodage dictionnaire : renvoie (codes int32, dictionnaire trié)."""
+    mapping = {}
+    codes = np.fromiter(
+        (-1 if v is None else mapping.setdefault(v, len(mapping)) for v in values),
+        dtype=np.int32, count=len(values)
+    )
+    # Dictionnaire trié : l'ordre des codes suit l'ordre des chaînes (utile pour le tri)
+    uniques = _object_array(list(mapping.keys()))
+    order = np.argsort(uniques, kind="stable")
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+
+    if len(rank):
+        codes = np.where(nulls, 0, rank[np.maximum(codes, 0)]).astype(np.int32)
+    else:
+        codes = np.zeros(len(values), dtype=np.int32)
+    return codes, uniques[order]
+
+
+class Column:
+    """
+    Colonne typée.
+    - values : tableau numpy (int64, float64, bool, codes int32 pour les str, object sinon)
+    - nulls : masque booléen, True si la valeur est absente ou None
+    - missing : masque booléen des lignes où la clé n'existe pas (None si la clé est partout)
+    - dictionary : valeurs distinctes triées (uniquement pour les colonnes str)
+    """
+
+    def __init__(self, name, kind, values, nulls, dictionary=None, missing=None):
+        self.name = name
+        self.kind = kind
+        self.values = values
+        self.nulls = nulls
+        self.dictionary = dictionary
+        self.missing = missing
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def from_values(cls, name, values, missing=None):
+        """Construit une colonne à partir d'une liste de valeurs Python."""
+        kind = infer_kind(values)
+        obj = _object_array(values)
+        nulls = np.equal(obj, None)
+
+        if kind == KIND_STR:
+            codes, dictionary = encode_strings(values, nulls)
+            return cls(name, kind, codes, nulls, dictionary=dictionary, missing=missing)
+
+        if kind in _DTYPES:
+            obj[nulls] = _FILLERS[kind]
+            try:
+                return cls(name, kind, obj.astype(_DTYPES[kind]), nulls, missing=missing)
+            except OverflowError:
+                # Entiers trop grands pour int64 : on garde les objets Python
+                obj[nulls] = None
+                kind = KIND_OBJECT
+
+        return cls(name, KIND_OBJECT, obj, nulls, missing=missing)
+
+    @property
+    def nbytes(self):
+        total = self.values.nbytes + self.nulls.nbytes
+        if self.missing is not None: total += self.missing.nbytes
+        if self.dictionary is not None: total += sum(len(s) + 49 for s in self.dictionary)
+        if self.kind == KIND_OBJECT: total += len(self.values) * 64  # estimation grossière
+        return total
+
+    def take(self, indices):
+        """Nouvelle colonne restreinte aux lignes demandées (le dictionnaire est partagé)."""
+        missing = self.missing[indices] if self.missing is not None else None
+        if missing is not None and not missing.any(): missing = None
+        return Column(self.name, self.kind, self.values[indices], self.nulls[indices],
+                      dictionary=self.dictionary, missing=missing)
+
+    def decoded(self, indices=None):
+        """Valeurs 'brutes' sous forme de tableau numpy (les str sont décodées)."""
+        values = self.values if indices is None else self.values[indices]
+        if self.kind == KIND_STR:
+            if not len(self.dictionary): return np.full(len(values), None, dtype=object)
+            return self.dictionary[values]
+        return values
+
+    def to_list(self, indices=None):
+        """Valeurs Python de la colonne (None pour les nulls)."""
+        nulls = self.nulls if indices is None else self.nulls[indices]
+        out = self.decoded(indices).astype(object)
+        out[nulls] = None
+        return out.tolist()
+
+
+class Dataset:
+    """Jeu de données en colonnes, remplace l'ancienne liste de dictionnaires."""
+
+    def __init__(self, columns=None, length=0):
+        self.columns = {}
+        for col in columns or []:
+            self.columns[col.name] = col
+        self.length = len(columns[0]) if columns else length
+        # Statistiques calculées pendant le chargement (StatsAccumulator), si disponibles
+        self.stats = None
+
+    def __len__(self):
+        return self.length
+
+    def __bool__(self):
+        return self.length > 0
+
+    @property
+    def fields(self):
+        """Champs dans l'ordre d'apparition."""
+        return list(self.columns.keys())
+
+    @cached_property
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+    def schema(self):
+        """Type de chaque colonne {champ: kind}."""
+        return {name: col.kind for name, col in self.columns.items()}
+
+    def column(self, name):
+        return self.columns.get(name)
+
+    @classmethod
+    def from_records(cls, records):
+        """Construit un Dataset à partir d'une liste de dictionnaires."""
+        if records is None: return cls()
+        if isinstance(records, dict): records = [records]
+        if not isinstance(records, list):
+            raise ValueError("Les données doivent être une liste d'objets")
+        for row in records:
+            if not isinstance(row, dict):
+                raise ValueError("Chaque élément des données doit être un objet (clé/valeur)")
+
+        fields = {}
+        for row in records:
+            for k in row:
+                if k not in fields: fields[k] = None
+
+        n = len(records)
+        columns = []
+        for field in fields:
+            values = [row.get(field) for row in records]
+            present = np.fromiter((field in row for row in records), dtype=bool, count=n)
+            missing = None if present.all() else ~present
+            columns.append(Column.from_values(field, values, missing=missing))
+
+        return cls(columns, length=n)
+
+    def select(self, fields):
+        """Dataset limité aux champs demandés (colonnes partagées, sans copie). None = tous les champs."""
+        if fields is None: return self
+        return Dataset([self.columns[f] for f in fields if f in self.columns], length=self.length)
+
+    def take(self, indices):
+        """Nouveau Dataset restreint (et/ou réordonné) selon les indices donnés."""
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = [col.take(indices) for col in self.columns.values()]
+        return Dataset(columns, length=len(indices))
+
+    def to_records(self, indices=None, fields=None):
+        """Reconstruit la liste de dictionnaires (pour l'affichage ou l'export), éventuellement sur quelques champs."""
+        if indices is None:
+            indices = np.arange(self.length)
+        indices = np.asarray(indices, dtype=np.int64)
+
+        with my_metrics.phase("serialize", rows=len(indices)):
+            fields = self.fields if fields is None else [f for f in fields if f in self.columns]
+            values = [self.columns[f].to_list(indices) for f in fields]
+            records = [dict(zip(fields, row)) for row in zip(*values)] if fields else [{} for _ in indices]
+
+            # On retire les clés absentes de la ligne d'origine
+            for f in fields:
+                col = self.columns[f]
+                if col.missing is None: continue
+                for i in np.flatnonzero(col.missing[indices]):
+                    del records[i][f]
+        return records
+
+    def iter_indices(self, batch_size=None, indices=None):
+        """Découpe les lignes (toutes, ou `indices`) en lots d'indices."""
+        batch_size = batch_size or config.DATASET_BATCH_SIZE
+        if indices is None:
+            indices = np.arange(self.length)
+        for start in range(0, len(indices), batch_size):
+            jobs.checkpoint(rows=start)
+            yield indices[start:start + batch_size]
+        jobs.checkpoint(rows=len(indices))
+
+    def iter_records(self, batch_size=None, indices=None):
+        """Génère les lignes par lots pour éviter de tout reconstruire d'un coup."""
+        for batch in self.iter_indices(batch_size, indices):
+            yield self.to_records(batch)
+
+    def head(self, n=50):
+        return self.to_records(np.arange(min(n, self.length)))
+
+
+def _empty_piece(kind, length):
+    """Morceau de colonne entièrement absent (clé inexistante sur ces lignes)."""
+    if kind == KIND_OBJECT:
+        values = np.full(length, None, dtype=object)
+    elif kind == KIND_STR:
+        values = np.zeros(length, dtype=np.int32)
+    else:
+        values = np.full(length, _FILLERS[kind], dtype=_DTYPES[kind])
+    mask = np.ones(length, dtype=bool)
+    dictionary = np.empty(0, dtype=object) if kind == KIND_STR else None
+    return Column(None, kind, values, mask, dictionary=dictionary, missing=mask.copy())
+
+
+def concat_columns(name, pieces, length):
+    """
+    Assemble des morceaux de colonne [(début, Column), ...] en une seule colonne de `length` lignes.
+    Les morceaux de types différents sont unifiés (int + float -> float, sinon object).
+    """
+    kinds = {col.kind for _, col in pieces if not col.nulls.all()}
+    if not kinds: kind = KIND_OBJECT
+    elif len(kinds) == 1: kind = kinds.pop()
+    elif kinds <= NUMERIC_KINDS: kind = KIND_FLOAT
+    else: kind = KIND_OBJECT
+
+    # On comble les trous (lots où la clé n'apparaissait pas)
+    filled, position = [], 0
+    for start, col in pieces:
+        if start > position: filled.append(_empty_piece(kind, start - position))
+        filled.append(col)
+        position = start + len(col)
+    if position < length: filled.append(_empty_piece(kind, length - position))
+
+    dictionary = None
+    if kind == KIND_STR:
+        # Fusion des dictionnaires : on ré-encode chaque morceau vers le dictionnaire commun
+        dictionary = np.unique(np.concatenate([c.dictionary for c in filled if c.kind == KIND_STR]))
+        values = np.concatenate([
+            np.searchsorted(dictionary, c.dictionary)[c.values].astype(np.int32)
+            if c.kind == KIND_STR and len(c.dictionary) else np.zeros(len(c), dtype=np.int32)
+            for c in filled
+        ])
+    elif kind == KIND_OBJECT:
+        values = np.concatenate([
+            c.values if c.kind == KIND_OBJECT else _object_array(c.to_list()) for c in filled
+        ])
+    else:
+        values = np.concatenate([
+            c.values.astype(_DTYPES[kind]) if c.kind in _DTYPES
+            else np.full(len(c), _FILLERS[kind], dtype=_DTYPES[kind])
+            for c in filled
+        ])
+
+    nulls = np.concatenate([c.nulls for c in filled])
+    missing = None
+    if any(c.missing is not None for c in filled):
+        missing = np.concatenate([
+            c.missing if c.missing is not None else np.zeros(len(c), dtype=bool) for c in filled
+        ])
+    return Column(name, kind, values, nulls, dictionary=dictionary, missing=missing)
+
+
+class DatasetBuilder:
+    """
+    Construit un Dataset lot par lot (chargement en streaming).
+    Chaque lot est converti en colonnes tout de suite : on ne garde jamais toutes les lignes Python en mémoire.
+    Si un accumulateur de statistiques est fourni, il est alimenté au fil des lots.
+    Le schéma (types de chaque colonne) est lui aussi construit lot par lot.
+    """
+
+    def __init__(self, accumulator=None):
+        self._pieces = {}  # champ -> [(début, Column), ...]
+        self.length = 0
+        self.accumulator = accumulator
+        self.schema = my_schema.Schema()
+
+    def _add_piece(self, col):
+        self._pieces.setdefault(col.name, []).append((self.length, col))
+        self.schema.update_column(col)
+        if self.accumulator is not None:
+            self.accumulator.update_column(col)
+
+    def __len__(self):
+        return self.length
+
+    def _advance(self, length):
+        first = not self.length
+        self.length += length
+        if first:
+            # Premier lot : la vue peut déjà l'afficher pendant que la lecture continue
+            jobs.publish_partial(self.snapshot)
+        jobs.checkpoint(rows=self.length)
+
+    def add_columns(self, columns, length):
+        """Ajoute un lot sous forme {champ: [valeurs]} (toutes les listes font `length` éléments)."""
+        with my_metrics.phase("convert", rows=length):
+            for name, values in columns.items():
+                self._add_piece(Column.from_values(name, values))
+        self._advance(length)
+
+    def add_dataset(self, batch):
+        """Ajoute un lot déjà converti en colonnes (formats colonnes comme Parquet)."""
+        with my_metrics.phase("convert", rows=len(batch)):
+            for col in batch.columns.values():
+                self._add_piece(col)
+        self._advance(len(batch))
+
+    def add_records(self, records):
+        """Ajoute un lot sous forme de liste de dictionnaires."""
+        with my_metrics.phase("convert"):
+            batch = Dataset.from_records(records)
+        self.add_dataset(batch)
+
+    def snapshot(self):
+        """Dataset des lignes déjà lues, sans vider le builder (ni statistiques)."""
+        columns = [concat_columns(name, pieces, self.length) for name, pieces in self._pieces.items()]
+        return Dataset(columns, length=self.length)
+
+    def build(self):
+        if self.accumulator is not None:
+            # Les lignes où un champ n'apparaissait pas comptent comme nulles
+            for name, pieces in self._pieces.items():
+                gap = self.length - sum(len(col) for _, col in pieces)
+                if gap: self.accumulator.column(name).null_count += gap
+            self.accumulator.rows = self.length
+
+        for name, pieces in self._pieces.items():
+            self.schema.column(name).null_count += self.length - sum(len(col) for _, col in pieces)
+        self.schema.rows = self.length
+
+        columns = [concat_columns(name, pieces, self.length) for name, pieces in self._pieces.items()]
+        self._pieces = {}
+        dataset = Dataset(columns, length=self.length)
+        dataset.stats = self.accumulator
+        my_schema.remember(dataset, self.schema)
+        return dataset
+
+
+def as_dataset(data):
+    """Accepte un Dataset ou une liste de dictionnaires."""
+    if isinstance(data, Dataset): return data
+    return Dataset.from_records(data or [])
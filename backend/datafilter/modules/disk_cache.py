@@ -0,0 +1,164 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+
+# Cache disque des fichiers déjà parsés, un dossier par version de fichier :
+#   <clé>/meta.pkl        description des colonnes, dictionnaires, colonnes object, stats
+#   <clé>/source.json     chemin et date de modification du fichier d'origine (relu seul par _drop_stale)
+#   <clé>/<n>.<part>.npy  tableaux numpy (valeurs, nulls, missing), relus en mmap
+# Recharger un fichier revient à mapper ses colonnes : pas de copie, et les pages
+# sont partagées entre tous les process qui ouvrent la même entrée.
+
+_FORMAT_VERSION = 1
+_META = "meta.pkl"
+_SOURCE = "source.json"
+_SAMPLE_SIZE = 1024 * 1024  # octets lus en début, milieu et fin de fichier pour le hash
+
+
+def cache_dir():
+    return os.path.join(config.TMP_DIR, "datasets")
+
+
+def content_hash(path):
+    """Hash d'échantillons du contenu : détecte une réécriture qui conserverait mtime et taille."""
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(size // 2 - _SAMPLE_SIZE // 2, 0), max(size - _SAMPLE_SIZE, 0)}):
+            f.seek(offset)
+            digest.update(f.read(_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def entry_key(path):
+    st = os.stat(path)
+    raw = f"{_FORMAT_VERSION}|{os.path.realpath(path)}|{st.st_mtime_ns}|{st.st_size}|{content_hash(path)}"
+    return hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _read_meta(entry):
+    with open(os.path.join(entry, _META), "rb") as f:
+        return pickle.load(f)
+
+
+def load(path, key=None):
+    """Dataset mis en cache pour ce fichier (colonnes en mmap, lecture seule), ou None."""
+    entry = os.path.join(cache_dir(), key or entry_key(path))
+
+    def array(name):
+        return np.load(os.path.join(entry, name), mmap_mode="r")
+
+    try:
+        meta = _read_meta(entry)
+        columns = []
+        for i, spec in enumerate(meta["columns"]):
+            values = spec["objects"] if spec["kind"] == ds.KIND_OBJECT else array(f"{i}.values.npy")
+            missing = array(f"{i}.missing.npy") if spec["has_missing"] else None
+            columns.append(ds.Column(spec["name"], spec["kind"], values, array(f"{i}.nulls.npy"),
+                                     dictionary=spec["dictionary"], missing=missing))
+        # La date de modification du dossier sert d'ordre LRU pour l'éviction
+        os.utime(entry)
+    except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+        # Entrée absente, évincée entre-temps ou corrompue : on reparse le fichier
+        return None
+
+    data = ds.Dataset(columns, length=meta["length"])
+    data.stats = meta["stats"]
+    return data
+
+
+def store(path, data, key=None):
+    """Écrit le Dataset dans le cache. L'entrée n'apparaît qu'une fois complète (rename atomique)."""
+    root = cache_dir()
+    os.makedirs(root, exist_ok=True)
+    key = key or entry_key(path)
+    entry = os.path.join(root, key)
+    if os.path.exists(entry):
+        return entry
+
+    tmp = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+    try:
+        specs = []
+        for i, col in enumerate(data.columns.values()):
+            spec = {"name": col.name, "kind": col.kind, "dictionary": col.dictionary,
+                    "has_missing": col.missing is not None, "objects": None}
+            if col.kind == ds.KIND_OBJECT:
+                spec["objects"] = col.values
+            else:
+                np.save(os.path.join(tmp, f"{i}.values.npy"), col.values)
+            np.save(os.path.join(tmp, f"{i}.nulls.npy"), col.nulls)
+            if col.missing is not None:
+                np.save(os.path.join(tmp, f"{i}.missing.npy"), col.missing)
+            specs.append(spec)
+
+        real_path = os.path.realpath(path)
+        meta = {"path": real_path, "length": len(data), "columns": specs, "stats": data.stats}
+        with open(os.path.join(tmp, _META), "wb") as f:
+            pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(os.path.join(tmp, _SOURCE), "w", encoding="utf-8") as f:
+            json.dump({"path": real_path, "mtime_ns": os.stat(path).st_mtime_ns}, f)
+        os.rename(tmp, entry)
+    except OSError:
+        # Un autre process a écrit la même entrée entre-temps (ou disque plein) : on abandonne
+        shutil.rmtree(tmp, ignore_errors=True)
+        return None
+
+    _drop_stale(real_path, keep=key)
+    enforce_budget()
+    return entry
+
+
+def _entries():
+    root = cache_dir()
+    if not os.path.isdir(root): return []
+    return [os.path.join(root, name) for name in os.listdir(root) if not name.startswith(".")]
+
+
+def _entry_size(entry):
+    return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+
+def _read_source(entry):
+    with open(os.path.join(entry, _SOURCE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _drop_stale(real_path, keep):
+    """Supprime les anciennes versions d'un fichier qui vient d'être remis en cache (seul source.json est lu)."""
+    for entry in _entries():
+        if os.path.basename(entry) == keep: continue
+        try:
+            if _read_source(entry)["path"] == real_path:
+                shutil.rmtree(entry, ignore_errors=True)
+        except (OSError, ValueError, KeyError):
+            continue
+
+
+def enforce_budget(budget=None):
+    """Évince les entrées les moins récemment utilisées au-delà du budget disque."""
+    budget = config.DATASET_CACHE_BUDGET if budget is None else budget
+    if not budget: return
+    entries = []
+    for entry in _entries():
+        try:
+            entries.append((os.path.getmtime(entry), _entry_size(entry), entry))
+        except OSError:
+            continue
+    total = sum(size for _, size, _ in entries)
+    # Un fichier déjà mappé reste lisible après suppression (Unix) : l'éviction est sans risque
+    for _, size, entry in sorted(entries):
+        if total <= budget: break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def clear():
+    shutil.rmtree(cache_dir(), ignore_errors=True)
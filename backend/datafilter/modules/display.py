@@ -1,6 +1,8 @@
 import os
 import config
 import modules.utils as utils
+import modules.dataset as ds
+import modules.schema as my_schema
 
 def clear():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -48,44 +50,19 @@ def print_data(data, current_filepath):
     print("[ Données ]\n")
     show_current_file(current_filepath, data)
 
+    # Le Dataset est columnaire : on reconstruit les lignes une fois pour les deux passes
+    data = ds.as_dataset(data)
+    records = data.to_records()
+
     # 1. Détermination des colonnes
     columns = utils.get_all_fields(data)
 
-    # 2. Détermination des types des colonnes
-    col_types = utils.get_column_types(data)
-    col_types_str = {}
-    for col, types in col_types.items():
-        # Construire la chaîne de types
-        type_parts = []
-        if "list" in types["base"]:
-            if types["sub"]:
-                list_types_str = ",".join(sorted(types["sub"]))
-                type_parts.append(f"list of {list_types_str}")
-            else:
-                type_parts.append("list")
-            # Ajouter les autres types non-list
-            other_types = sorted(types["base"] - {"list"})
-            type_parts.extend(other_types)
-        else:
-            type_parts = sorted(types["base"])
-        
-        # Afficher tous les types séparés par " | "
-        if type_parts:
-            col_types_str[col] = " | ".join(type_parts)
-        else:
-            col_types_str[col] = "unknown"
+    # 2. Détermination des types des colonnes (schéma calculé une fois par Dataset)
+    col_types_str = my_schema.infer(data).type_strs()
 
     # 3. Calcul des largeurs de colonnes
     widths = {col: max(len(col), len(col_types_str[col])) for col in columns}
-    for row in data:
-        for col in columns:
-            value = str(row[col]) if col in row else ""
-            if not value: value = ""
-            
-            if len(value) > widths[col]:
-                widths[col] = len(value)
-    
-    for ligne in data:
+    for ligne in records:
         for col in columns:
             value = str(ligne[col]) if col in ligne else ""
             if not value: value = ""
@@ -113,7 +90,7 @@ def print_data(data, current_filepath):
     print(ligne_sep)
 
     # 6. Affichage des Données
-    for ligne in data:
+    for ligne in records:
         row_str = "|"
         for col in columns:
             type = col_types_str[col].split()[0]
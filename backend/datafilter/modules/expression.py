@@ -0,0 +1,456 @@
+import re
+import threading
+import operator as op
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import filter as my_filter
+
+# Langage de filtres, par exemple :
+#   age > 30 and city in ("Paris", "Lyon") and name ~ "^A"
+#   not (score between 10 and 20) or `first name` != null
+# - comparaisons : = (ou ==), !=, >, >=, <, <=
+# - ~ / !~ : expression régulière (re.search) sur le texte de la valeur
+# - in / not in (liste), between ... and ... (bornes incluses)
+# - and / or / not, parenthèses ; les noms de colonnes exotiques s'écrivent entre `backquotes`
+# L'expression est analysée une seule fois puis compilée en un arbre d'évaluateurs vectorisés
+# (masques numpy sur les colonnes), mis en cache par texte d'expression.
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<quoted>`[^`]*`)
+  | (?P<op>==|!=|>=|<=|!~|[=<>~(),])
+  | (?P<word>[^\W\d][\w.]*)
+)''', re.VERBOSE)
+_ESCAPE = re.compile(r'\\(.)')
+_END = re.compile(r'\s*$')
+
+_KEYWORDS = {"and", "or", "not", "in", "between", "true", "false", "null", "none"}
+_CONSTANTS = {"true": True, "false": False, "null": None, "none": None}
+_ORDER = {">": op.gt, ">=": op.ge, "<": op.lt, "<=": op.le}
+
+_CACHE = OrderedDict()  # texte -> Plan compilé
+_LOCK = threading.Lock()
+
+
+def _tokenize(text):
+    tokens, pos = [], 0
+    while not _END.match(text, pos):
+        m = _TOKEN.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(f"Expression invalide (position {pos + 1}) : caractère inattendu")
+        kind = m.lastgroup
+        value, start = m.group(kind), m.start(kind)
+        if kind == "word" and value.lower() in _KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value, start))
+        pos = m.end()
+    return tokens
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _zeros(size):
+    return np.zeros(size, dtype=bool)
+
+
+def _column(data, field, rows):
+    col = data.column(field)
+    if col is not None and rows is not None:
+        col = col.take(rows)
+    return col
+
+
+def _text_hits(values, predicate):
+    """Applique `predicate` une fois par valeur distincte (le dictionnaire pour les colonnes str)."""
+    return np.fromiter((predicate(v) for v in values), dtype=bool, count=len(values))
+
+
+def _by_unique(col, predicate):
+    """Masque d'une colonne typée, en n'évaluant `predicate` que sur ses valeurs distinctes."""
+    if col.kind == ds.KIND_STR:
+        if not len(col.dictionary): return _zeros(len(col))
+        return _text_hits(col.dictionary, predicate)[col.values] & ~col.nulls
+    uniques, inverse = np.unique(col.values, return_inverse=True)
+    return _text_hits(uniques.tolist(), predicate)[inverse] & ~col.nulls
+
+
+def _json_text(v):
+    # Texte d'une valeur tel qu'il apparaît dans le fichier (true / false en minuscules)
+    return str(v).lower() if isinstance(v, bool) else str(v)
+
+
+def _known(col, size, nullable=False):
+    """
+    Lignes où une condition sur `col` a une valeur (vraie ou fausse) : ni null ni clé absente.
+    Avec `nullable` (`= null`, `!= null`, `in (null)`), la condition porte sur les nulls : seules les clés
+    absentes sont inconnues.
+    """
+    if col is None:
+        return _zeros(size)
+    known = np.ones(len(col), dtype=bool) if nullable else ~col.nulls
+    if col.missing is not None:
+        known &= ~col.missing
+    return known
+
+
+# --- Noeuds de l'expression compilée ---
+# Chaque noeud renvoie le masque des lignes `rows` (toutes si None) qui vérifient la condition.
+# evaluate() renvoie aussi les lignes où la condition est connue (logique à trois valeurs, comme SQL) :
+# une comparaison sur un null ou une clé absente est inconnue, et `not` d'une condition inconnue aussi.
+
+class _Comparison:
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = operator
+        self.value = value
+        self.pattern = re.compile(value) if operator in ("~", "!~") else None
+
+    def __str__(self):
+        return f"{_field_text(self.field)} {self.operator} {_value_text(self.value)}"
+
+    def mask(self, data, rows=None):
+        size = len(data) if rows is None else len(rows)
+        if self.operator == "=":
+            # Même comportement que /filter/ (insensible à la casse, "none" = null)
+            return my_filter.filter_mask(data, self.field, self.value, "=", rows=rows)
+        if self.operator in (">", "<") and _is_number(self.value):
+            return my_filter.filter_mask(data, self.field, self.value, self.operator, rows=rows)
+
+        col = _column(data, self.field, rows)
+        if col is None:
+            return _zeros(size)
+        match self.operator:
+            case "!=":
+                mask = ~my_filter._equals_mask(col, self.value) & ~col.nulls
+            case "~" | "!~":
+                mask = self._regex_mask(col)
+            case _:
+                mask = self._order_mask(col)
+        if col.missing is not None:
+            mask &= ~col.missing
+        return mask
+
+    def evaluate(self, data, rows=None):
+        size = len(data) if rows is None else len(rows)
+        nullable = self.operator in ("=", "!=") and str(self.value).lower() == "none"
+        return self.mask(data, rows), _known(_column(data, self.field, rows), size, nullable)
+
+    def _regex_mask(self, col):
+        search = self.pattern.search
+        if col.kind == ds.KIND_OBJECT:
+            mask = np.fromiter((v is not None and search(_json_text(v)) is not None for v in col.values),
+                               dtype=bool, count=len(col))
+        else:
+            mask = _by_unique(col, lambda v: search(_json_text(v)) is not None)
+        if self.operator == "!~":
+            mask = ~mask & ~col.nulls
+        return mask
+
+    def _order_mask(self, col):
+        compare = _ORDER[self.operator]
+        value = self.value
+        present = ~col.nulls
+        if _is_number(value):
+            if col.kind in (ds.KIND_INT, ds.KIND_FLOAT, ds.KIND_BOOL):
+                return compare(col.values, value) & present
+            if col.kind == ds.KIND_OBJECT:
+                return np.fromiter((_is_number(v) and compare(v, value) for v in col.values),
+                                   dtype=bool, count=len(col))
+            return _zeros(len(col))
+        if isinstance(value, str):
+            if col.kind == ds.KIND_STR:
+                # Dictionnaire trié : la comparaison devient un seuil sur les codes
+                side = "right" if self.operator in (">", "<=") else "left"
+                threshold = np.searchsorted(col.dictionary, value, side=side)
+                codes = col.values >= threshold if self.operator in (">", ">=") else col.values < threshold
+                return codes & present
+            if col.kind == ds.KIND_OBJECT:
+                return np.fromiter((isinstance(v, str) and compare(v, value) for v in col.values),
+                                   dtype=bool, count=len(col))
+        return _zeros(len(col))
+
+
+class _In:
+    def __init__(self, field, values, negate=False):
+        self.field = field
+        self.values = values
+        self.negate = negate
+
+    def __str__(self):
+        items = ", ".join(_value_text(v) for v in self.values)
+        return f"{_field_text(self.field)} {'not in' if self.negate else 'in'} ({items})"
+
+    def mask(self, data, rows=None):
+        col = _column(data, self.field, rows)
+        if col is None:
+            return _zeros(len(data) if rows is None else len(rows))
+
+        targets = {str(v).lower() for v in self.values}
+        if col.kind == ds.KIND_STR:
+            # Une seule passe sur le dictionnaire, quelle que soit la longueur de la liste
+            mask = _by_unique(col, lambda s: s.lower() in targets)
+        elif col.kind in (ds.KIND_INT, ds.KIND_FLOAT):
+            numbers = [n for n in map(my_filter._parse_number, self.values) if n is not None]
+            mask = np.isin(col.values, numbers) & ~col.nulls
+        else:
+            mask = _zeros(len(col))
+            for v in self.values:
+                mask |= my_filter._equals_mask(col, v)
+        if "none" in targets:
+            mask |= col.nulls
+
+        if self.negate:
+            mask = ~mask & ~col.nulls
+        if col.missing is not None:
+            mask &= ~col.missing
+        return mask
+
+    def evaluate(self, data, rows=None):
+        size = len(data) if rows is None else len(rows)
+        nullable = any(str(v).lower() == "none" for v in self.values)
+        return self.mask(data, rows), _known(_column(data, self.field, rows), size, nullable)
+
+
+class _Not:
+    def __init__(self, operand):
+        self.operand = operand
+
+    def __str__(self):
+        return f"not ({self.operand})"
+
+    def mask(self, data, rows=None):
+        return self.evaluate(data, rows)[0]
+
+    def evaluate(self, data, rows=None):
+        # Négation d'une condition inconnue : toujours inconnue (ni les nulls ni les clés absentes)
+        mask, known = self.operand.evaluate(data, rows)
+        return ~mask & known, known
+
+
+class _And:
+    def __init__(self, operands):
+        self.operands = operands
+
+    def __str__(self):
+        return " and ".join(f"({o})" for o in self.operands)
+
+    def mask(self, data, rows=None):
+        # Chaque condition n'est évaluée que sur les lignes qui ont passé les précédentes
+        mask = self.operands[0].mask(data, rows)
+        for operand in self.operands[1:]:
+            positions = np.flatnonzero(mask)
+            if not len(positions): break
+            mask[positions] = operand.mask(data, positions if rows is None else rows[positions])
+        return mask
+
+    def evaluate(self, data, rows=None):
+        # Vrai si tout est vrai, faux dès qu'une condition est fausse, inconnu sinon
+        results = [operand.evaluate(data, rows) for operand in self.operands]
+        mask = np.logical_and.reduce([m for m, _ in results])
+        false = np.logical_or.reduce([~m & k for m, k in results])
+        return mask, mask | false
+
+
+class _Or:
+    def __init__(self, operands):
+        self.operands = operands
+
+    def __str__(self):
+        return " or ".join(f"({o})" for o in self.operands)
+
+    def mask(self, data, rows=None):
+        # Seules les lignes pas encore retenues sont évaluées par les conditions suivantes
+        mask = self.operands[0].mask(data, rows)
+        for operand in self.operands[1:]:
+            positions = np.flatnonzero(~mask)
+            if not len(positions): break
+            mask[positions] = operand.mask(data, positions if rows is None else rows[positions])
+        return mask
+
+    def evaluate(self, data, rows=None):
+        # Vrai dès qu'une condition est vraie, faux si tout est faux, inconnu sinon
+        results = [operand.evaluate(data, rows) for operand in self.operands]
+        mask = np.logical_or.reduce([m for m, _ in results])
+        false = np.logical_and.reduce([~m & k for m, k in results])
+        return mask, mask | false
+
+
+def _field_text(field):
+    if re.fullmatch(r'[^\W\d][\w.]*', field) and field.lower() not in _KEYWORDS:
+        return field
+    return f"`{field}`"
+
+
+def _value_text(value):
+    if value is None: return "null"
+    if isinstance(value, bool): return str(value).lower()
+    if isinstance(value, str): return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return repr(value)
+
+
+# --- Analyse syntaxique (descente récursive) ---
+
+class _Parser:
+    def __init__(self, text):
+        self.tokens = _tokenize(text)
+        self.i = 0
+
+    def peek(self, kind=None, value=None):
+        if self.i >= len(self.tokens): return None
+        token = self.tokens[self.i]
+        if kind is not None and token[0] != kind: return None
+        if value is not None and token[1] != value: return None
+        return token
+
+    def take(self, kind=None, value=None):
+        token = self.peek(kind, value)
+        if token is not None: self.i += 1
+        return token
+
+    def expect(self, kind, value, what):
+        token = self.take(kind, value)
+        if token is None: self.fail(f"{what} attendu")
+        return token
+
+    def fail(self, message):
+        position = self.tokens[self.i][2] + 1 if self.i < len(self.tokens) else "fin"
+        raise ValueError(f"Expression invalide (position {position}) : {message}")
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Expression vide")
+        node = self.parse_or()
+        if self.i < len(self.tokens):
+            self.fail("opérateur 'and' / 'or' attendu")
+        return node
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.take("keyword", "or"):
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else _Or(operands)
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.take("keyword", "and"):
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else _And(operands)
+
+    def parse_not(self):
+        if self.take("keyword", "not"):
+            return _Not(self.parse_not())
+        if self.take("op", "("):
+            node = self.parse_or()
+            self.expect("op", ")", "')'")
+            return node
+        return self.parse_condition()
+
+    def parse_field(self):
+        token = self.take("word") or self.take("quoted")
+        if token is None: self.fail("nom de colonne attendu")
+        return token[1][1:-1] if token[0] == "quoted" else token[1]
+
+    def parse_value(self):
+        token = self.take()
+        if token is None: self.fail("valeur attendue")
+        kind, text, _ = token
+        if kind == "number":
+            return float(text) if any(c in text for c in ".eE") else int(text)
+        if kind == "string":
+            return _ESCAPE.sub(r'\1', text[1:-1])
+        if kind == "keyword" and text in _CONSTANTS:
+            return _CONSTANTS[text]
+        if kind == "word":
+            return text  # mot sans guillemets : chaîne
+        self.i -= 1
+        self.fail("valeur attendue")
+
+    def parse_condition(self):
+        field = self.parse_field()
+
+        if self.take("keyword", "between"):
+            low = self.parse_value()
+            self.expect("keyword", "and", "'and'")
+            high = self.parse_value()
+            return _And([_Comparison(field, ">=", low), _Comparison(field, "<=", high)])
+
+        negate = bool(self.take("keyword", "not"))
+        if negate or self.peek("keyword", "in"):
+            self.expect("keyword", "in", "'in'")
+            self.expect("op", "(", "'('")
+            values = [self.parse_value()]
+            while self.take("op", ","):
+                values.append(self.parse_value())
+            self.expect("op", ")", "')'")
+            return _In(field, values, negate)
+
+        token = self.take("op")
+        if token is None or token[1] in "(),":
+            if token is not None: self.i -= 1
+            self.fail("opérateur de comparaison attendu")
+        operator = "=" if token[1] == "==" else token[1]
+        value = self.parse_value()
+        if operator in ("~", "!~"):
+            if not isinstance(value, str): self.fail("expression régulière attendue entre guillemets")
+            try:
+                return _Comparison(field, operator, value)
+            except re.error as e:
+                raise ValueError(f"Expression régulière invalide : {e}")
+        return _Comparison(field, operator, value)
+
+
+class Plan:
+    """Expression compilée : réutilisable sur n'importe quel Dataset."""
+
+    def __init__(self, text, root):
+        self.text = text
+        self.root = root
+
+    def __str__(self):
+        """Forme normalisée (parenthésée, guillemets doubles) de l'expression."""
+        return str(self.root)
+
+    def mask(self, data, rows=None):
+        data = ds.as_dataset(data)
+        return self.root.mask(data, rows)
+
+    def rows(self, data, rows=None):
+        """Indices (triés) des lignes qui vérifient l'expression, parmi `rows` (toutes par défaut)."""
+        data = ds.as_dataset(data)
+        root = self.root
+        if isinstance(root, _Comparison) and root.operator in ("=", ">", "<") \
+                and (root.operator == "=" or _is_number(root.value)):
+            # Condition simple : même chemin que /filter/ (index de colonne si rentable)
+            return my_filter.filter_rows(data, root.field, root.value, root.operator, rows=rows)
+        mask = root.mask(data, rows)
+        return np.flatnonzero(mask) if rows is None else rows[mask]
+
+
+def compile(text):
+    """Analyse et compile l'expression (ValueError si elle est invalide) ; les plans sont mis en cache."""
+    with _LOCK:
+        plan = _CACHE.get(text)
+        if plan is not None:
+            _CACHE.move_to_end(text)
+            return plan
+    plan = Plan(text, _Parser(text).parse())
+    with _LOCK:
+        _CACHE[text] = plan
+        if len(_CACHE) > config.FILTER_EXPRESSION_CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return plan
+
+
+def filter_data(data, text):
+    data = ds.as_dataset(data)
+    if not data:
+        return ds.Dataset()
+
+    return data.take(compile(text).rows(data))
@@ -2,17 +2,22 @@ import os
 import shutil
 # Import relatif car config est dans le même dossier
 from . import config
+from . import dataset as ds
+from . import accumulators as acc
+from . import disk_cache
+from . import filter as my_filter
+from . import metrics as my_metrics
 # Import relatif pour aller chercher dans le sous-dossier formats
-from .formats import fcsv, fjson, fxml, fyml
+from .formats import fcsv, fjson, fxml, fyml, fparquet, streams
 
 def cleanTmpDir():
     if os.path.exists(config.TMP_DIR):
         shutil.rmtree(config.TMP_DIR, ignore_errors=True)
 
-def load_data(path):
+def resolve_path(path):
     if not path:
         raise ValueError("Path cannot be empty")
-    
+
     # Si le chemin est relatif (ex: "data/students.csv"), on le colle au DATA_DIR
     # Cela permet de trouver le fichier même si on lance le script depuis ailleurs
     if not os.path.isabs(path) and not os.path.exists(path):
@@ -22,32 +27,105 @@ def load_data(path):
 
     if not os.path.exists(path):
         raise FileNotFoundError(f"Le fichier {path} n'existe pas.")
-    
+    return path
+
+def is_binary(path):
+    """Formats binaires : pas d'aperçu texte brut possible."""
+    return path.lower().endswith(fparquet.PARQUET_EXTENSIONS + fparquet.ARROW_EXTENSIONS)
+
+def preview_records(path, n=5):
+    """Premières lignes d'un fichier binaire (Parquet / Arrow), pour l'aperçu."""
+    return fparquet.head(resolve_path(path), n)
+
+def load_data(path, columns=None, filters=None):
+    """
+    Charge un fichier sous forme de Dataset.
+    - columns : ne garder que ces colonnes
+    - filters : [(champ, opérateur, valeur)], ne garder que les lignes qui les vérifient
+    Parquet / Arrow ne lisent que les colonnes demandées et sautent les groupes de lignes exclus
+    par leurs statistiques ; les autres formats sont lus entièrement (ou repris du cache) puis réduits.
+    """
+    path = resolve_path(path)
     name, extension = os.path.splitext(path.lower())
+    partial = columns is not None or bool(filters)
+
+    if partial and is_binary(path):
+        with my_metrics.phase("parse") as p:
+            data = fparquet.load(path, columns, filters, accumulator=_accumulator())
+            p.rows = len(data)
+        return data
 
-    match extension:
-        case '.csv': return fcsv.load(path)
-        case '.json': return fjson.load(path)
-        case '.fxml': return fxml.load(path)
-        case '.fyml': return fyml.load(path)
-        case _: raise ValueError(f"Format de fichier non supporté: {extension}")
+    data = _load_full(path, extension)
+    if partial:
+        data = reduce_data(data, columns, filters)
+    return data
 
-def save_data(data, path):
+def reduce_data(data, columns=None, filters=None):
+    """Lignes de `data` qui vérifient les filtres, limitées aux colonnes demandées (chargement partiel)."""
+    return my_filter.apply_filters(data, filters).select(columns)
+
+def _accumulator():
+    """Accumulateur de statistiques alimenté pendant la lecture, seulement si STATS_AT_LOAD est activé."""
+    return acc.StatsAccumulator() if config.STATS_AT_LOAD else None
+
+def _load_full(path, extension):
+    key = None
+    if config.DATASET_CACHE_ENABLED:
+        # Fichier déjà parsé : les colonnes sont simplement mappées depuis le cache disque
+        key = disk_cache.entry_key(path)
+        cached = disk_cache.load(path, key=key)
+        if cached is not None:
+            return cached
+
+    with my_metrics.phase("parse") as p:
+        match extension:
+            # Avec STATS_AT_LOAD, les statistiques sont calculées pendant la lecture, au fil des blocs / lots
+            case '.csv': data = fcsv.load(path, accumulator=_accumulator())
+            case '.json' | '.jsonl' | '.ndjson': data = fjson.load(path, accumulator=_accumulator())
+            case '.parquet' | '.pq' | '.arrow' | '.feather' | '.ipc':
+                data = fparquet.load(path, accumulator=_accumulator())
+            case '.fxml' | '.xml': data = fxml.load(path, accumulator=_accumulator())
+            case '.fyml' | '.yml' | '.yaml': data = fyml.load(path, accumulator=_accumulator())
+            case _: raise ValueError(f"Format de fichier non supporté: {extension}")
+        p.rows, p.bytes_read = len(data), os.path.getsize(path)
+
+    data = ds.as_dataset(data)
+    if key is not None:
+        disk_cache.store(path, data, key=key)
+    return data
+
+def save_data(data, path, indices=None, compression=None, compact=False):
+    """
+    Exporte les données (ou seulement les lignes `indices`, dans cet ordre) en streaming.
+    - compression : 'gzip' ou 'zstd', déduite aussi de l'extension (export.csv.gz)
+    - compact : JSON sans indentation
+    """
     if not path:
         raise ValueError("Path cannot be empty")
     
     # Nettoyage et préparation du chemin de sortie
     filename = os.path.basename(path)
     name, extension = os.path.splitext(filename.lower())
+    if extension in streams.EXTENSIONS:
+        compression = compression or streams.EXTENSIONS[extension]
+        name, extension = os.path.splitext(name)
+    streams.check_compression(compression)
     
     # On sauvegarde toujours dans le dossier output défini dans config
     # pour éviter de mettre le bazar partout
-    output_path = os.path.join(config.OUTPUT_DIR, filename)
-    
-    match extension:
-        case '.csv': return fcsv.save(data, name)
-        case '.json': return fjson.save(data, name)
-        case '.fxml': return fxml.save(data, name)
-        case '.fyml': return fyml.save(data, name)
-        case _:
-            raise ValueError(f"Format de fichier non supporté: {extension}")
\ No newline at end of file
+    data = ds.as_dataset(data)
+
+    with my_metrics.phase("write", rows=len(data) if indices is None else len(indices)):
+        match extension:
+            case '.csv': return fcsv.save(data, name, indices=indices, compression=compression)
+            case '.json' | '.jsonl' | '.ndjson':
+                return fjson.save(data, name, indent=None if compact else 4, indices=indices,
+                                  compression=compression, extension=extension)
+            case '.parquet' | '.pq' | '.arrow' | '.feather' | '.ipc':
+                return fparquet.save(data, name, indices=indices, compression=compression, extension=extension)
+            case '.fxml' | '.xml':
+                return fxml.save(data, name, indices=indices, compression=compression, extension=extension)
+            case '.fyml' | '.yml' | '.yaml':
+                return fyml.save(data, name, indices=indices, compression=compression, extension=extension)
+            case _:
+                raise ValueError(f"Format de fichier non supporté: {extension}")
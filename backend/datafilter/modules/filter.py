@@ -1,25 +1,147 @@
+import numpy as np
+
+from . import dataset as ds
+from . import index as my_index
+from . import parallel as my_parallel
+
+
+def _parse_number(value):
+    """Convertit la valeur recherchée en nombre si possible."""
+    if isinstance(value, bool): return None
+    if isinstance(value, (int, float)): return value
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def _equals_mask(col, value):
+    target = str(value).lower()
+    present = ~col.nulls
+
+    match col.kind:
+        case ds.KIND_STR:
+            # On compare une seule fois chaque valeur distincte, puis on projette sur les codes
+            lowered = np.array([s.lower() for s in col.dictionary], dtype=object)
+            codes = np.flatnonzero(lowered == target)
+            mask = np.isin(col.values, codes) & present
+        case ds.KIND_INT | ds.KIND_FLOAT:
+            number = _parse_number(value)
+            mask = (col.values == number) & present if number is not None else np.zeros(len(col), dtype=bool)
+        case ds.KIND_BOOL:
+            if target in ("true", "false"):
+                mask = (col.values == (target == "true")) & present
+            else:
+                mask = np.zeros(len(col), dtype=bool)
+        case _:
+            mask = np.fromiter((str(v).lower() == target for v in col.values), dtype=bool, count=len(col))
+            mask &= present
+
+    # Comportement historique : str(None) == "none"
+    if target == "none":
+        mask |= col.nulls
+    return mask
+
+
+def _compare_mask(col, value, operator):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.zeros(len(col), dtype=bool)
+
+    match col.kind:
+        case ds.KIND_INT | ds.KIND_FLOAT | ds.KIND_BOOL:
+            values = col.values
+        case ds.KIND_OBJECT:
+            values = col.values
+            ok = np.fromiter((isinstance(v, (int, float)) for v in values), dtype=bool, count=len(col))
+            result = np.zeros(len(col), dtype=bool)
+            subset = values[ok]
+            result[ok] = (subset > value) if operator == ">" else (subset < value)
+            return result
+        case _:
+            return np.zeros(len(col), dtype=bool)
+
+    mask = (values > value) if operator == ">" else (values < value)
+    return mask & ~col.nulls
+
+
+def filter_mask(data, field, value, operator="=", rows=None):
+    """
+    Renvoie le masque booléen des lignes qui vérifient la condition.
+    Si `rows` est fourni, seules ces lignes sont évaluées (le masque a alors la taille de `rows`).
+    """
+    data = ds.as_dataset(data)
+    size = len(data) if rows is None else len(rows)
+    col = data.column(field)
+    if col is None:
+        return np.zeros(size, dtype=bool)
+    if my_parallel.enabled_for(size):
+        return my_parallel.filter_mask(data, field, value, operator, rows=rows)
+    if rows is not None:
+        col = col.take(rows)
+
+    if operator == "=":
+        mask = _equals_mask(col, value)
+    elif operator in (">", "<"):
+        mask = _compare_mask(col, value, operator)
+    else:
+        mask = np.zeros(size, dtype=bool)
+
+    # Les lignes où la clé n'existe pas sont toujours exclues
+    if col.missing is not None:
+        mask &= ~col.missing
+    return mask
+
+
+def _index_rows(data, field, value, operator):
+    """Lignes qui vérifient la condition, obtenues par l'index de la colonne."""
+    col = data.column(field)
+    if operator == "=":
+        hits = my_index.get_index(data, field, operator).lookup(value)
+        if str(value).lower() == "none":
+            # Comportement historique : str(None) == "none"
+            extra = col.nulls if col.missing is None else col.nulls & ~col.missing
+            hits = np.union1d(hits, np.flatnonzero(extra))
+        return hits
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return np.empty(0, dtype=np.int64)
+    return my_index.get_index(data, field, operator).range(operator, value)
+
+
+def filter_rows(data, field, value, operator="=", rows=None):
+    """
+    Renvoie les indices (triés) des lignes qui vérifient la condition.
+    Passe par un index (hash pour '=', trié pour '>' / '<') quand c'est rentable.
+    """
+    data = ds.as_dataset(data)
+    if my_index.should_use(data, field, operator, rows):
+        hits = _index_rows(data, field, value, operator)
+        if rows is None:
+            return hits
+        return np.intersect1d(rows, hits, assume_unique=True)
+
+    mask = filter_mask(data, field, value, operator, rows=rows)
+    return np.flatnonzero(mask) if rows is None else rows[mask]
+
+
+def apply_filters(data, filters):
+    """
+    Dataset réduit aux lignes qui vérifient tous les filtres [(champ, opérateur, valeur)].
+    Pensé pour les lots lus au chargement : pas d'index, chaque filtre ne voit que les lignes restantes.
+    """
+    rows = None
+    for field, operator, value in filters or []:
+        mask = filter_mask(data, field, value, operator, rows=rows)
+        rows = np.flatnonzero(mask) if rows is None else rows[mask]
+        if not len(rows): break
+    if rows is None or len(rows) == len(data):
+        return data
+    return data.take(rows)
+
+
 def filter_data(data, field, value, operator="="):
+    data = ds.as_dataset(data)
     if not data:
-        return []
-    
-    filtered = []
-    for row in data:
-        if field not in row:
-            continue
-            
-        item_val = row[field]
-        
-        try:
-            if operator == "=":
-                if str(item_val).lower() == str(value).lower():
-                    filtered.append(row)
-            elif operator == ">" and isinstance(item_val, (int, float)) and isinstance(value, (int, float)):
-                if item_val > value:
-                    filtered.append(row)
-            elif operator == "<" and isinstance(item_val, (int, float)) and isinstance(value, (int, float)):
-                if item_val < value:
-                    filtered.append(row)
-        except:
-            continue
-            
-    return filtered
\ No newline at end of file
+        return ds.Dataset()
+
+    return data.take(filter_rows(data, field, value, operator))
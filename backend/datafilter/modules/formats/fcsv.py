@@ -1,47 +1,186 @@
 import os
+import re
 import csv
 import json
+import itertools
+from collections import OrderedDict
+
+import numpy as np
+
+from .. import config
+from .. import dataset as ds
+from .. import jobs
+from . import streams
+
+# Un JSON valide ne peut commencer que par l'un de ces caractères :
+# inutile de tenter json.loads (et de lever une exception) sur les autres chaînes
+_JSON_START = frozenset('-0123456789[{"')
+# Les seuls mots acceptés par json.loads
+_LITERALS = {'true': True, 'false': False, 'null': None, 'NaN': float('nan'), 'Infinity': float('inf')}
+_LITERAL_START = frozenset('tfnNI')
+_INT_RE = re.compile(r'-?(?:0|[1-9]\d*)')
+_FLOAT_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+# Types déjà devinés pour un fichier donné (chemin, date de modif, taille)
+_INFERENCE_CACHE = OrderedDict()
+_INFERENCE_CACHE_SIZE = 64
+
+def convert_cell(v):
+    """Conversion générique d'une cellule : JSON si possible, sinon la chaîne nettoyée."""
+    if not v: return v
+    v = v.strip()
+    if not v: return v
+
+    first = v[0]
+    if first in _LITERAL_START: return _LITERALS.get(v, v)
+    if first not in _JSON_START: return v
+    if _FLOAT_RE.fullmatch(v):
+        return int(v) if _INT_RE.fullmatch(v) else float(v)
+    try:
+        return json.loads(v)
+    except json.JSONDecodeError:
+        return v
+
+def _convert_int(v):
+    if v and _INT_RE.fullmatch(v): return int(v)
+    return convert_cell(v)
+
+def _convert_float(v):
+    if v and _FLOAT_RE.fullmatch(v):
+        return int(v) if _INT_RE.fullmatch(v) else float(v)
+    return convert_cell(v)
+
+def _convert_bool(v):
+    if v == "true": return True
+    if v == "false": return False
+    return convert_cell(v)
+
+def _convert_str(v):
+    # Chemin rapide : la plupart des cellules d'une colonne texte ne ressemblent pas à du JSON
+    if v and v[0] not in _JSON_START and v[0] not in _LITERAL_START and not v[0].isspace() and not v[-1].isspace():
+        return v
+    return convert_cell(v)
+
+CONVERTERS = {
+    "int": _convert_int,
+    "float": _convert_float,
+    "bool": _convert_bool,
+    "str": _convert_str,
+    "any": convert_cell,
+}
+
+def infer_converters(header, sample):
+    """Choisit un convertisseur par colonne à partir d'un échantillon de lignes."""
+    kinds = []
+    for i in range(len(header)):
+        types = set()
+        for row in sample:
+            if i >= len(row) or not row[i]: continue
+            types.add(type(convert_cell(row[i])))
+        types.discard(type(None))
+        if types == {bool}: kinds.append("bool")
+        elif types == {int}: kinds.append("int")
+        elif types and types <= {int, float}: kinds.append("float")
+        elif types == {str}: kinds.append("str")
+        else: kinds.append("any")
+    return kinds
+
+def _cached_kinds(path, header, sample):
+    st = os.stat(path)
+    key = (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+    kinds = _INFERENCE_CACHE.get(key)
+    if kinds is None or len(kinds) != len(header):
+        kinds = infer_converters(header, sample)
+        _INFERENCE_CACHE[key] = kinds
+        if len(_INFERENCE_CACHE) > _INFERENCE_CACHE_SIZE:
+            _INFERENCE_CACHE.popitem(last=False)
+    _INFERENCE_CACHE.move_to_end(key)
+    return kinds
+
+def iter_batches(path, chunk_size=None):
+    """
+    Lit le CSV par blocs de `chunk_size` lignes et renvoie des lots {colonne: [valeurs]}.
+    Les types sont devinés sur le premier bloc, puis chaque colonne utilise un convertisseur dédié
+    (avec repli sur la conversion générique pour les cellules qui ne correspondent pas).
+    """
+    chunk_size = chunk_size or config.CSV_CHUNK_SIZE
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header: return
+
+        converters = None
+        width = len(header)
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows: break
+            jobs.checkpoint(bytes_read=f.buffer.tell())
+            # Les lignes vides sont ignorées, comme csv.DictReader
+            rows = [row for row in rows if row]
+            if not rows: continue
+
+            if converters is None:
+                kinds = _cached_kinds(path, header, rows[:config.CSV_SAMPLE_ROWS])
+                converters = [CONVERTERS[k] for k in kinds]
+
+            # Les lignes trop courtes sont complétées par None, comme csv.DictReader
+            if any(len(row) != width for row in rows):
+                rows = [row[:width] + [None] * (width - len(row)) for row in rows]
+
+            batch = {}
+            for name, convert, values in zip(header, converters, zip(*rows)):
+                batch[name] = list(map(convert, values))
+            yield batch, len(rows)
+
+def load(path, chunk_size=None, accumulator=None):
+    builder = ds.DatasetBuilder(accumulator)
+    for batch, length in iter_batches(path, chunk_size):
+        builder.add_columns(batch, length)
+    return builder.build()
+
+def _to_csv_value(v):
+    if isinstance(v, str): return v
+    return json.dumps(v)
+
+def _float_cell(v):
+    # json.dumps(float) == repr(float), sauf NaN / Infinity
+    return repr(v) if v - v == 0 else json.dumps(v)
+
+def _csv_cells(col, indices):
+    """Cellules d'une colonne pour les lignes `indices`, converties en bloc selon le type (mêmes règles que _to_csv_value)."""
+    if col is None:
+        return np.full(len(indices), 'null', dtype=object)
+    values = col.values[indices]
+    match col.kind:
+        case ds.KIND_STR:
+            cells = col.decoded(indices).astype(object)
+        case ds.KIND_INT:
+            cells = np.array(values.astype(str), dtype=object)
+        case ds.KIND_FLOAT:
+            cells = np.fromiter(map(_float_cell, values.tolist()), dtype=object, count=len(values))
+        case ds.KIND_BOOL:
+            cells = np.where(values, 'true', 'false').astype(object)
+        case _:
+            return np.fromiter(map(_to_csv_value, values), dtype=object, count=len(values))
+    cells[col.nulls[indices]] = 'null'
+    return cells
+
+def save(data, filename, indices=None, compression=None):
+    all_fields = sorted(data.fields)
 
-from .. import config 
-
-def load(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        data = [row for row in reader]
-    
-    for row in data:
-        for k, v in row.items():
-            try:
-                if v: row[k] = json.loads(v.strip())
-            except (json.JSONDecodeError, TypeError):
-                row[k] = v.strip() if v else ""
-    return data
-
-def save(data, filename):
-    all_fields = set()
-    for row in data: all_fields.update(row.keys())
-    all_fields = sorted(all_fields)
-    
-    tmp_data = []
-    for row in data:
-        new_row = {}
-        for field in all_fields:
-            v = row.get(field)
-            if isinstance(v, str): new_row[field] = v
-            else: new_row[field] = json.dumps(v)
-        tmp_data.append(new_row)
-        
     # Utilisation des chemins depuis config
     # Attention: filename peut être un chemin complet ou juste un nom
     # on s'assure d'avoir juste le nom pour le fichier final
-    base_name = os.path.basename(filename)
-    if not base_name.endswith('.csv'): base_name += '.csv'
+    base_name = streams.output_name(os.path.basename(filename), '.csv', compression)
 
     path = os.path.join(config.OUTPUT_DIR, base_name)
-    
-    with open(path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=all_fields)
-        writer.writeheader()
-        writer.writerows(tmp_data)
-        
-    return path
\ No newline at end of file
+
+    with streams.open_text(path, compression) as f:
+        writer = csv.writer(f)
+        writer.writerow(all_fields)
+        # Écriture par lots, colonne par colonne : on ne reconstruit jamais les lignes en dictionnaires
+        for batch in data.iter_indices(indices=indices):
+            columns = [_csv_cells(data.column(field), batch) for field in all_fields]
+            writer.writerows(zip(*columns))
+
+    return path
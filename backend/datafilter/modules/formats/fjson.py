@@ -1,18 +1,176 @@
 import os
+import re
 import json
+import itertools
 from .. import config
+from .. import dataset as ds
+from .. import jobs
+from . import streams
 
-def load(path):    
+# Extensions lues comme du JSON "une valeur par ligne"
+LINE_EXTENSIONS = ('.jsonl', '.ndjson')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+# Fin d'un élément de tableau : blancs, séparateur (',' ou ']'), blancs
+_SEPARATOR = re.compile(r'[ \t\n\r]*([,\]]?)[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+class _Reader:
+    """Tampon de texte lu par blocs, dans lequel on décode les valeurs JSON une à une."""
+
+    def __init__(self, f, block_size):
+        self.f = f
+        self.block_size = block_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Ajoute un bloc au tampon (en oubliant ce qui a déjà été décodé). False en fin de fichier."""
+        if self.eof: return False
+        block = self.f.read(self.block_size)
+        if not block:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + block
+        self.pos = 0
+        jobs.checkpoint(bytes_read=self.f.buffer.tell())
+        return True
+
+    def peek(self):
+        """Premier caractère significatif (None en fin de fichier)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return None
+
+    def decode(self):
+        """Décode la valeur suivante, en lisant d'autres blocs tant qu'elle est incomplète."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # Un nombre coupé par la fin du bloc se décode sans erreur : on relit pour en être sûr
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof: raise
+            self.fill()
+
+def _iter_array(reader):
+    """Éléments d'un tableau dont le '[' vient d'être lu ; boucle serrée sur le tampon courant."""
+    scan = _decoder.scan_once
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+    while True:
+        if reader.peek() is None:
+            raise ValueError("Tableau JSON non terminé")
+        buf, pos = reader.buf, reader.pos
+        while True:
+            try:
+                value, end = scan(buf, pos)
+            except (StopIteration, json.JSONDecodeError):
+                break  # élément coupé par la fin du tampon (ou invalide : l'erreur sort en fin de fichier)
+            m = _SEPARATOR.match(buf, end)
+            sep = m.group(1)
+            if not sep:
+                if m.end() < len(buf):
+                    raise ValueError("Tableau JSON mal formé : ',' ou ']' attendu")
+                break  # séparateur pas encore lu : on relira l'élément avec le bloc suivant
+            yield value
+            pos = m.end()
+            if sep == ']':
+                reader.pos = pos
+                return
+        reader.pos = pos
+        if not reader.fill():
+            reader.decode()  # fin de fichier : lève l'erreur de syntaxe précise
+            raise ValueError("Tableau JSON non terminé")
+
+def iter_values(path, block_size=None):
+    """
+    Génère les objets du tableau JSON de premier niveau sans charger tout le fichier.
+    Un objet seul est traité comme une ligne unique (comme avant).
+    """
+    block_size = block_size or config.JSON_BLOCK_SIZE
     with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        reader = _Reader(f, block_size)
+        first = reader.peek()
+        if first is None:
+            raise ValueError("Le fichier JSON est vide")
+        if first == '{':
+            yield reader.decode()
+        elif first == '[':
+            reader.pos += 1
+            yield from _iter_array(reader)
+        else:
+            raise ValueError("Les données doivent être une liste d'objets")
 
-def save(data, filename, indent=4):
-    base_name = os.path.basename(filename)
-    if not base_name.endswith('.json'): base_name += '.json'
-    
+        if reader.peek() is not None:
+            raise ValueError("Contenu inattendu après la fin des données JSON")
+
+def iter_lines(path):
+    """JSON Lines / NDJSON : une valeur par ligne, les lignes vides sont ignorées."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if number % config.JSON_CHUNK_SIZE == 0:
+                jobs.checkpoint(bytes_read=f.buffer.tell())
+            if not line.strip(): continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Ligne {number} : JSON invalide ({e.msg})")
+
+def iter_batches(path, chunk_size=None):
+    """Lots de `chunk_size` enregistrements, lus au fil du fichier."""
+    chunk_size = chunk_size or config.JSON_CHUNK_SIZE
+    lines = path.lower().endswith(LINE_EXTENSIONS)
+    values = iter_lines(path) if lines else iter_values(path)
+    while True:
+        batch = list(itertools.islice(values, chunk_size))
+        if not batch: return
+        yield batch
+
+def load(path, chunk_size=None, accumulator=None):
+    builder = ds.DatasetBuilder(accumulator)
+    for batch in iter_batches(path, chunk_size):
+        builder.add_records(batch)
+    return builder.build()
+
+def _indented(record, indent):
+    """Enregistrement tel qu'il apparaît dans json.dump(liste, indent=indent)."""
+    prefix = ' ' * indent
+    return prefix + json.dumps(record, indent=indent).replace('\n', '\n' + prefix)
+
+def save(data, filename, indent=4, indices=None, compression=None, extension='.json'):
+    """
+    Écrit les lignes par lots, sans construire la liste complète.
+    - extension '.jsonl' / '.ndjson' : un objet JSON compact par ligne
+    - indent=None : tableau JSON compact (un objet par ligne), sinon même rendu que json.dump(indent=...)
+    """
+    base_name = streams.output_name(os.path.basename(filename), extension, compression)
     path = os.path.join(config.OUTPUT_DIR, base_name)
+    lines = extension in LINE_EXTENSIONS
+
+    with streams.open_text(path, compression) as f:
+        if lines:
+            for batch in data.iter_records(indices=indices):
+                f.write(''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in batch))
+            return path
 
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=indent)
+        separator = ''
+        f.write('[')
+        for batch in data.iter_records(indices=indices):
+            if indent is None:
+                items = [json.dumps(r, separators=(',', ':')) for r in batch]
+            else:
+                items = [_indented(r, indent) for r in batch]
+            f.write(separator + '\n' + ',\n'.join(items))
+            separator = ','
+        f.write('\n]' if separator else ']')
 
-    return path
\ No newline at end of file
+    return path
@@ -0,0 +1,230 @@
+import os
+import json
+
+import numpy as np
+
+from .. import config
+from .. import dataset as ds
+from .. import filter as my_filter
+from .. import jobs
+from . import streams
+
+# Formats colonnes (nécessitent le paquet optionnel 'pyarrow')
+PARQUET_EXTENSIONS = ('.parquet', '.pq')
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+
+# Codecs acceptés par chaque format (la compression 'gzip' n'existe pas en Arrow IPC)
+_PARQUET_CODECS = {"gzip": "gzip", "zstd": "zstd"}
+_ARROW_CODECS = {"zstd": "zstd"}
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Les formats Parquet / Arrow nécessitent le paquet 'pyarrow' (pip install pyarrow)")
+    return pyarrow
+
+def is_parquet(path):
+    return path.lower().endswith(PARQUET_EXTENSIONS)
+
+# --- Lecture ---
+
+def _to_column(name, arr):
+    """Convertit un tableau Arrow en Column (les types numpy sont repris sans passer par Python)."""
+    pa = _pyarrow()
+    pc = pa.compute
+    t = arr.type
+    if pa.types.is_dictionary(t):
+        arr = arr.dictionary_decode()
+        t = arr.type
+    if pa.types.is_temporal(t):
+        # Dates et heures : texte ISO, comme elles apparaîtraient dans un CSV / JSON
+        arr = pc.cast(arr, pa.string())
+        t = arr.type
+    elif pa.types.is_decimal(t):
+        arr = pc.cast(arr, pa.float64())
+        t = arr.type
+
+    nulls = arr.is_null().to_numpy(zero_copy_only=False)
+
+    if pa.types.is_integer(t) and not pa.types.is_uint64(t):
+        values = pc.fill_null(arr, 0).to_numpy(zero_copy_only=False).astype(np.int64)
+        return ds.Column(name, ds.KIND_INT, values, nulls)
+    if pa.types.is_floating(t):
+        values = pc.fill_null(arr, 0.0).to_numpy(zero_copy_only=False).astype(np.float64)
+        return ds.Column(name, ds.KIND_FLOAT, values, nulls)
+    if pa.types.is_boolean(t):
+        values = pc.fill_null(arr, False).to_numpy(zero_copy_only=False)
+        return ds.Column(name, ds.KIND_BOOL, values, nulls)
+    if (pa.types.is_string(t) or pa.types.is_large_string(t)) and not nulls.all():
+        # Encodage dictionnaire fait par Arrow, puis dictionnaire trié comme dans encode_strings
+        encoded = arr.dictionary_encode()
+        uniques = ds._object_array(encoded.dictionary.to_pylist())
+        order = np.argsort(uniques, kind="stable")
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order), dtype=np.int32)
+        codes = rank[pc.fill_null(encoded.indices, 0).to_numpy(zero_copy_only=False)]
+        codes[nulls] = 0
+        return ds.Column(name, ds.KIND_STR, codes, nulls, dictionary=uniques[order])
+
+    # Listes, structures, grands entiers... : valeurs Python
+    return ds.Column.from_values(name, arr.to_pylist())
+
+def _to_dataset(table):
+    columns = []
+    for name, chunked in zip(table.column_names, table.columns):
+        arr = chunked.combine_chunks() if hasattr(chunked, "combine_chunks") else chunked
+        columns.append(_to_column(name, arr))
+    return ds.Dataset(columns, length=table.num_rows)
+
+def _may_match(statistics, filters):
+    """
+    Le groupe de lignes peut-il contenir une ligne qui vérifie tous les filtres ?
+    On ne conclut qu'à partir du min / max des colonnes numériques, dans le doute on lit le groupe.
+    """
+    for field, operator, value in filters:
+        stats = statistics.get(field)
+        if stats is None: continue
+        low, high = stats
+        if operator == "=" and str(value).lower() == "none": continue  # "none" désigne aussi les nulls
+        # Les valeurs venant de l'interface sont souvent des chaînes ("15")
+        number = my_filter._parse_number(value)
+        if number is None: continue
+        if operator == "=" and (number < low or number > high): return False
+        if operator == ">" and high <= number: return False
+        if operator == "<" and low >= number: return False
+    return True
+
+def _row_group_statistics(metadata, index):
+    """{colonne: (min, max)} des colonnes numériques d'un groupe de lignes (les nulls n'y comptent pas)."""
+    group = metadata.row_group(index)
+    result = {}
+    for i in range(group.num_columns):
+        chunk = group.column(i)
+        stats = chunk.statistics
+        if stats is None or not stats.has_min_max: continue
+        if not isinstance(stats.min, (int, float)) or isinstance(stats.min, bool): continue
+        # Colonnes de premier niveau uniquement (pas les champs imbriqués)
+        if "." in chunk.path_in_schema: continue
+        result[chunk.path_in_schema] = (stats.min, stats.max)
+    return result
+
+def _select_columns(schema_names, columns):
+    if columns is None: return None
+    # Les colonnes inconnues sont ignorées, comme une clé absente de toutes les lignes
+    return [c for c in columns if c in schema_names]
+
+def iter_batches(path, columns=None, filters=None):
+    """
+    Lots (Dataset) lus dans le fichier.
+    - columns : seules ces colonnes sont lues (les colonnes utilisées par les filtres en plus)
+    - filters : [(champ, opérateur, valeur)] ; les groupes de lignes Parquet dont les statistiques
+      excluent toute correspondance ne sont pas lus, les autres sont filtrés ligne à ligne
+    """
+    pa = _pyarrow()
+    filters = list(filters or [])
+    wanted = None if columns is None else list(dict.fromkeys([*columns, *(f for f, _, _ in filters)]))
+
+    if is_parquet(path):
+        pf = pa.parquet.ParquetFile(path, memory_map=True)
+        names = _select_columns(pf.schema_arrow.names, wanted)
+        done = 0
+        for i in range(pf.metadata.num_row_groups):
+            # Progression : taille compressée des groupes déjà traités (lus ou sautés)
+            group = pf.metadata.row_group(i)
+            done += sum(group.column(j).total_compressed_size for j in range(group.num_columns))
+            if filters and not _may_match(_row_group_statistics(pf.metadata, i), filters):
+                jobs.checkpoint(bytes_read=done)
+                continue
+            batch = _to_dataset(pf.read_row_group(i, columns=names))
+            jobs.checkpoint(bytes_read=done)
+            yield my_filter.apply_filters(batch, filters).select(columns)
+        return
+
+    source = pa.memory_map(path, 'r')
+    try:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+    names = _select_columns(reader.schema.names, wanted)
+    for record_batch in batches:
+        if names is not None:
+            record_batch = record_batch.select(names)
+        yield my_filter.apply_filters(_to_dataset(record_batch), filters).select(columns)
+
+def load(path, columns=None, filters=None, accumulator=None):
+    builder = ds.DatasetBuilder(accumulator)
+    for batch in iter_batches(path, columns, filters):
+        builder.add_dataset(batch)
+    return builder.build()
+
+def head(path, n=5):
+    """Premières lignes du fichier (aperçu), sans lire le reste."""
+    records = []
+    for batch in iter_batches(path):
+        records.extend(batch.head(n - len(records)))
+        if len(records) >= n: break
+    return records
+
+# --- Écriture ---
+
+def _schema(pa, data):
+    types = {
+        ds.KIND_INT: pa.int64(),
+        ds.KIND_FLOAT: pa.float64(),
+        ds.KIND_BOOL: pa.bool_(),
+    }
+    # Les str et les colonnes hétérogènes (sérialisées en JSON) sont des chaînes
+    return pa.schema([(name, types.get(col.kind, pa.string())) for name, col in data.columns.items()])
+
+def _json_text(v):
+    if v is None or isinstance(v, str): return v
+    return json.dumps(v)
+
+def _to_arrow(pa, col, indices):
+    nulls = col.nulls[indices]
+    match col.kind:
+        case ds.KIND_INT | ds.KIND_FLOAT | ds.KIND_BOOL:
+            return pa.array(col.values[indices], mask=nulls)
+        case ds.KIND_STR:
+            return pa.array(col.decoded(indices), mask=nulls, type=pa.string())
+        case _:
+            return pa.array([_json_text(v) for v in col.values[indices]], type=pa.string())
+
+def _record_batch(pa, data, schema, indices):
+    arrays = [_to_arrow(pa, data.columns[name], indices) for name in schema.names]
+    return pa.record_batch(arrays, schema=schema)
+
+def save(data, filename, indices=None, compression=None, extension='.parquet'):
+    """
+    Écrit un fichier Parquet (un groupe de lignes par lot) ou Arrow IPC / Feather.
+    Les colonnes hétérogènes (listes, dicts, types mélangés) sont écrites en texte JSON.
+    """
+    pa = _pyarrow()
+    parquet = extension in PARQUET_EXTENSIONS
+    codecs = _PARQUET_CODECS if parquet else _ARROW_CODECS
+    if compression is not None and compression not in codecs:
+        raise ValueError(f"Compression non supportée pour {extension}: {compression}")
+
+    # La compression est interne au format : le nom du fichier garde son extension
+    base_name = streams.output_name(os.path.basename(filename), extension)
+    path = os.path.join(config.OUTPUT_DIR, base_name)
+    schema = _schema(pa, data)
+
+    if parquet:
+        codec = codecs.get(compression, config.PARQUET_COMPRESSION)
+        with pa.parquet.ParquetWriter(path, schema, compression=codec) as writer:
+            for batch in data.iter_indices(config.PARQUET_ROW_GROUP_SIZE, indices):
+                writer.write_batch(_record_batch(pa, data, schema, batch), row_group_size=len(batch))
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=codecs.get(compression))
+        with pa.ipc.new_file(path, schema, options=options) as writer:
+            for batch in data.iter_indices(config.PARQUET_ROW_GROUP_SIZE, indices):
+                writer.write_batch(_record_batch(pa, data, schema, batch))
+    return path
@@ -1,7 +1,179 @@
+import os
+import re
+import itertools
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+
 from .. import config
+from .. import dataset as ds
+from .. import jobs
+from . import streams
+
+# XML "orienté enregistrements" : chaque élément désigné par le chemin d'enregistrement est une ligne.
+#   <records>
+#     <record id="1"><name>Alice</name><tag>a</tag><tag>b</tag></record>
+#   </records>
+# -> {"id": 1, "name": "Alice", "tag": ["a", "b"]}
+# - attributs et éléments enfants deviennent des champs, un enfant répété devient une liste
+# - un enfant qui a lui-même des enfants ou des attributs devient un dict
+# - les textes sont convertis en nombre / booléen quand ils en ont la forme
+# La lecture est incrémentale (iterparse) : chaque enregistrement est effacé dès qu'il est converti,
+# la mémoire ne dépend pas de la taille du document.
+
+XML_EXTENSIONS = ('.fxml', '.xml')
+
+_INT_RE = re.compile(r'-?(?:0|[1-9]\d*)')
+_FLOAT_RE = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+_BOOLS = {"true": True, "false": False}
+# Caractères interdits en XML 1.0 (contrôles sauf tabulation et retours à la ligne)
+_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+_NAME_START = re.compile(r'[A-Za-z_]')
+_NAME_INVALID = re.compile(r'[^A-Za-z0-9_.-]')
+
+# --- Lecture ---
+
+def _convert_text(text):
+    if text is None: return None
+    text = text.strip()
+    if not text: return None
+    if text in _BOOLS: return _BOOLS[text]
+    if _FLOAT_RE.fullmatch(text):
+        return int(text) if _INT_RE.fullmatch(text) else float(text)
+    return text
+
+def _local(tag):
+    """Nom sans l'espace de noms ({uri}nom -> nom)."""
+    return tag.rsplit('}', 1)[-1] if tag[:1] == '{' else tag
+
+def _add_field(record, repeated, name, value):
+    # Champ répété : on passe en liste (`repeated` distingue ces listes des valeurs déjà listes)
+    if name not in record:
+        record[name] = value
+    elif name in repeated:
+        record[name].append(value)
+    else:
+        record[name] = [record[name], value]
+        repeated.add(name)
+
+def _to_value(elem):
+    """Valeur d'un élément : scalaire s'il n'a que du texte, sinon dict (attributs, enfants, '#text')."""
+    if not len(elem) and not elem.attrib:
+        return _convert_text(elem.text)
+    return _to_record(elem)
+
+def _to_record(elem):
+    record, repeated = {}, set()
+    for name, value in elem.attrib.items():
+        _add_field(record, repeated, _local(name), _convert_text(value))
+    for child in elem:
+        _add_field(record, repeated, _local(child.tag), _to_value(child))
+    # Texte propre à l'élément (une ligne qui n'a que du texte le garde aussi, au lieu de devenir {})
+    text = _convert_text(elem.text)
+    if text is not None:
+        _add_field(record, repeated, "#text", text)
+    return record
+
+def parse_path(path):
+    """Chemin d'enregistrement "a/b/c" (depuis la racine, exclue) -> liste d'étapes ('*' : tout élément)."""
+    steps = [s for s in (path or "").strip("/").split("/") if s]
+    return steps or ["*"]
+
+def _matches(stack, steps):
+    # stack : noms des éléments ouverts, racine comprise
+    if len(stack) != len(steps) + 1: return False
+    return all(step in ("*", name) for step, name in zip(steps, stack[1:]))
+
+def iter_records(path, record_path=None):
+    """
+    Génère les enregistrements du document, sans jamais construire l'arbre complet.
+    record_path : éléments à lire comme lignes, depuis la racine (ex. "items/item") ;
+    par défaut XML_RECORD_PATH, ou tous les enfants directs de la racine.
+    """
+    steps = parse_path(record_path if record_path is not None else config.XML_RECORD_PATH)
+    depth = len(steps) + 1
+    stack, elements = [], []
+    count = 0
+    with open(path, 'rb') as f:
+        try:
+            for event, elem in ET.iterparse(f, events=("start", "end")):
+                if event == "start":
+                    stack.append(_local(elem.tag))
+                    elements.append(elem)
+                    continue
+                if len(stack) == depth and _matches(stack, steps):
+                    yield _to_record(elem)
+                    count += 1
+                    if count % config.XML_CHUNK_SIZE == 0:
+                        jobs.checkpoint(bytes_read=f.tell())
+                stack.pop()
+                elements.pop()
+                if len(stack) < depth and elements:
+                    # Élément terminé au niveau des enregistrements (ou au-dessus) : on le libère
+                    elem.clear()
+                    elements[-1].remove(elem)
+        except ET.ParseError as e:
+            raise ValueError(f"XML invalide : {e}")
+
+def iter_batches(path, chunk_size=None, record_path=None):
+    chunk_size = chunk_size or config.XML_CHUNK_SIZE
+    records = iter_records(path, record_path)
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch: return
+        yield batch
+
+def load(path, chunk_size=None, accumulator=None, record_path=None):
+    builder = ds.DatasetBuilder(accumulator)
+    for batch in iter_batches(path, chunk_size, record_path):
+        builder.add_records(batch)
+    return builder.build()
+
+# --- Écriture ---
+
+def _tag(name):
+    """Nom d'élément valide : caractères interdits remplacés par '_'."""
+    name = _NAME_INVALID.sub('_', str(name))
+    return name if name and _NAME_START.match(name) else '_' + name
+
+def _text(v):
+    if isinstance(v, bool): return "true" if v else "false"
+    return escape(_INVALID_CHARS.sub('', str(v)))
+
+def _element(name, value, indent):
+    tag = _tag(name)
+    if value is None:
+        return f"{indent}<{tag}/>"
+    if isinstance(value, list):
+        # Liste : élément répété (une liste vide n'écrit rien)
+        return "\n".join(_element(name, item, indent) for item in value)
+    if isinstance(value, dict):
+        # '#text' redevient le texte de l'élément (aller-retour avec la lecture)
+        text = "" if value.get("#text") is None else _text(value["#text"])
+        body = _children({k: v for k, v in value.items() if k != "#text"}, indent + '  ')
+        if not body:
+            return f"{indent}<{tag}>{text}</{tag}>" if text else f"{indent}<{tag}/>"
+        return f"{indent}<{tag}>{text}\n{body}\n{indent}</{tag}>"
+    return f"{indent}<{tag}>{_text(value)}</{tag}>"
+
+def _children(record, indent):
+    return "\n".join(line for line in (_element(k, v, indent) for k, v in record.items()) if line)
+
+def _record(record, tag):
+    body = _children(record, "    ")
+    return f"  <{tag}>\n{body}\n  </{tag}>\n" if body else f"  <{tag}/>\n"
 
-def load(path):
-    raise NotImplementedError("FXML format not yet implemented")
+def save(data, filename, indices=None, compression=None, extension='.xml'):
+    """
+    Écrit un document <records><record>...</record></records>, lot par lot.
+    Les listes deviennent des éléments répétés, les dicts des éléments imbriqués.
+    """
+    base_name = streams.output_name(os.path.basename(filename), extension, compression)
+    path = os.path.join(config.OUTPUT_DIR, base_name)
+    root, tag = _tag(config.XML_ROOT_TAG), _tag(config.XML_RECORD_TAG)
 
-def save(data, path):
-    raise NotImplementedError("FXML format not yet implemented")
\ No newline at end of file
+    with streams.open_text(path, compression) as f:
+        f.write(f'<?xml version="1.0" encoding="utf-8"?>\n<{root}>\n')
+        for batch in data.iter_records(indices=indices):
+            f.write(''.join(_record(r, tag) for r in batch))
+        f.write(f'</{root}>\n')
+    return path
@@ -1,7 +1,105 @@
+import os
+import itertools
+
 from .. import config
+from .. import dataset as ds
+from .. import jobs
+from . import streams
+
+# YAML (nécessite le paquet 'PyYAML'), lu document par document :
+# - un document liste : chacun de ses éléments est une ligne
+# - un document objet : une ligne
+# - plusieurs documents séparés par '---' : leurs lignes sont mises bout à bout
+# Le parseur C (libyaml) est utilisé quand PyYAML a été compilé avec, sinon le parseur Python
+# (10 à 20 fois plus lent).
+
+YAML_EXTENSIONS = ('.fyml', '.yml', '.yaml')
+
+_classes = None
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError("Le format YAML nécessite le paquet 'PyYAML' (pip install pyyaml)")
+    return yaml
+
+def _loader_dumper():
+    """Classes de lecture / écriture (C si disponible), créées une seule fois."""
+    global _classes
+    if _classes is None:
+        yaml = _yaml()
+        base_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+        base_dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+        class Loader(base_loader):
+            pass
+        # Dates gardées telles quelles (chaînes), comme en CSV / JSON
+        Loader.add_constructor("tag:yaml.org,2002:timestamp", yaml.SafeLoader.construct_yaml_str)
+
+        class Dumper(base_dumper):
+            pass
+
+        _classes = (Loader, Dumper)
+    return _classes
+
+def is_accelerated():
+    """Vrai si la lecture / écriture passe par libyaml."""
+    return hasattr(_yaml(), "CSafeLoader")
+
+def _record(value):
+    # Les clés YAML peuvent être des nombres ou des booléens : les noms de colonnes sont des chaînes
+    if isinstance(value, dict) and not all(isinstance(k, str) for k in value):
+        return {str(k): v for k, v in value.items()}
+    return value
+
+def iter_records(path):
+    """Génère les enregistrements du fichier ; un seul document est en mémoire à la fois."""
+    yaml = _yaml()
+    Loader, _ = _loader_dumper()
+    with open(path, 'rb') as f:
+        try:
+            for document in yaml.load_all(f, Loader=Loader):
+                if document is None: continue  # document vide
+                if isinstance(document, list):
+                    yield from map(_record, document)
+                else:
+                    yield _record(document)
+                jobs.checkpoint(bytes_read=f.tell())
+        except yaml.YAMLError as e:
+            raise ValueError(f"YAML invalide : {e}")
+
+def iter_batches(path, chunk_size=None):
+    chunk_size = chunk_size or config.YAML_CHUNK_SIZE
+    records = iter_records(path)
+    while True:
+        batch = list(itertools.islice(records, chunk_size))
+        if not batch: return
+        yield batch
+
+def load(path, chunk_size=None, accumulator=None):
+    builder = ds.DatasetBuilder(accumulator)
+    for batch in iter_batches(path, chunk_size):
+        builder.add_records(batch)
+    return builder.build()
 
-def load(path):
-    raise NotImplementedError("FYML format not yet implemented")
+def save(data, filename, indices=None, compression=None, extension='.yml'):
+    """
+    Écrit une liste YAML, lot par lot : chaque lot est sérialisé seul puis ajouté au fichier,
+    le résultat se relit comme une seule liste.
+    """
+    yaml = _yaml()
+    _, Dumper = _loader_dumper()
+    base_name = streams.output_name(os.path.basename(filename), extension, compression)
+    path = os.path.join(config.OUTPUT_DIR, base_name)
 
-def save(data, path):
-    raise NotImplementedError("FYML format not yet implemented")
\ No newline at end of file
+    with streams.open_text(path, compression) as f:
+        empty = True
+        for batch in data.iter_records(indices=indices):
+            if not batch: continue
+            yaml.dump(batch, f, Dumper=Dumper, allow_unicode=True, sort_keys=False,
+                      default_flow_style=False, width=config.YAML_LINE_WIDTH)
+            empty = False
+        if empty:
+            f.write("[]\n")
+    return path
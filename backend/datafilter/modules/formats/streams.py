@@ -0,0 +1,38 @@
+import io
+import gzip
+
+from .. import config
+
+# Compressions supportées à l'export : nom -> extension ajoutée au fichier
+SUFFIXES = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+# Et dans l'autre sens, pour reconnaître "export.csv.gz"
+EXTENSIONS = {suffix: name for name, suffix in SUFFIXES.items()}
+
+def check_compression(compression):
+    if compression is not None and compression not in SUFFIXES:
+        raise ValueError(f"Compression non supportée: {compression} (choix : {', '.join(SUFFIXES)})")
+    return compression
+
+def output_name(base_name, extension, compression=None):
+    """Nom du fichier exporté : extension du format, puis celle de la compression."""
+    if not base_name.endswith(extension): base_name += extension
+    if compression: base_name += SUFFIXES[compression]
+    return base_name
+
+def open_text(path, compression=None):
+    """Ouvre un fichier texte en écriture (UTF-8), compressé à la volée si demandé."""
+    check_compression(compression)
+    if compression == "gzip":
+        return gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=config.EXPORT_GZIP_LEVEL)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("La compression zstd nécessite le paquet 'zstandard' (pip install zstandard)")
+        raw = open(path, 'wb')
+        writer = zstandard.ZstdCompressor(level=config.EXPORT_ZSTD_LEVEL).stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8', newline='', write_through=False)
+    return open(path, 'w', encoding='utf-8', newline='', buffering=config.EXPORT_BUFFER_SIZE)
@@ -0,0 +1,476 @@
+import os
+import json
+import uuid
+import pickle
+import shutil
+from collections import namedtuple
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import jobs
+from . import metrics as my_metrics
+from . import parallel as my_parallel
+from . import sketches
+from . import sort as my_sort
+
+# Agrégation par groupes (GROUP BY) :
+# - chaque ligne reçoit un numéro de groupe dense, calculé clé par clé sans boucle Python par ligne :
+#   code de la valeur (indice dans le dictionnaire pour les str, rang parmi les valeurs distinctes
+#   triées par np.unique sinon), combiné au numéro des clés précédentes puis renuméroté par np.unique.
+#   C'est un regroupement par tri, pas une table de hachage
+# - les agrégats sont ensuite accumulés par numéro de groupe (bincount, ufunc.at), par partitions
+#   de lignes fusionnées à la fin
+# - au-delà de GROUPBY_MAX_GROUPS groupes (estimés par HyperLogLog), les lignes sont réparties en
+#   partitions selon le hash de leurs clés et chaque partition est regroupée, agrégée et écrite sur
+#   disque à son tour : la mémoire reste bornée quel que soit le nombre de groupes
+
+OPERATIONS = ("count", "sum", "mean", "min", "max", "distinct")
+
+Aggregation = namedtuple("Aggregation", ["op", "field", "name"])
+
+
+def parse_aggregations(specs):
+    """
+    Liste d'Aggregation à partir de [{op, field, name}] (field facultatif pour count).
+    Le nom par défaut est "op_field" (ou "count"). ValueError si la spécification est invalide.
+    """
+    result, names = [], set()
+    for spec in specs or [{"op": "count"}]:
+        if not isinstance(spec, dict) or spec.get("op") not in OPERATIONS:
+            raise ValueError(f"Agrégation invalide : op doit valoir {', '.join(OPERATIONS)}")
+        op, field = spec["op"], spec.get("field")
+        if field is None and op != "count":
+            raise ValueError(f"L'agrégation '{op}' nécessite un champ")
+        name = spec.get("name") or (op if field is None else f"{op}_{field}")
+        if name in names:
+            raise ValueError(f"Nom d'agrégation en double : {name}")
+        names.add(name)
+        result.append(Aggregation(op, field, str(name)))
+    return result
+
+
+# --- Numéros de groupes ---
+
+def _key_codes(col, rows):
+    """Code dense de chaque ligne pour une colonne de regroupement ; les nulls prennent le dernier code."""
+    nulls = col.nulls[rows]
+    match col.kind:
+        case ds.KIND_STR:
+            codes, size = col.values[rows].astype(np.int64), len(col.dictionary)
+        case ds.KIND_OBJECT:
+            codes = my_sort.object_ranks(col.values[rows], nulls)
+            size = int(codes.max()) + 1 if len(codes) else 0
+        case _:
+            uniques, codes = np.unique(col.values[rows], return_inverse=True)
+            size = len(uniques)
+    return np.where(nulls, size, codes), size + 1
+
+
+def group_ids(data, keys, rows):
+    """
+    Numéro de groupe de chaque ligne de `rows`, dans l'ordre des clés (nulls en dernier).
+    Renvoie (ids, nombre de groupes, première ligne de chaque groupe).
+    """
+    if not len(rows):
+        return np.empty(0, dtype=np.int64), 0, rows[:0]
+    composite = np.zeros(len(rows), dtype=np.int64)
+    first = np.zeros(1, dtype=np.int64)
+    for field in keys:
+        col = data.column(field)
+        if col is None: continue  # colonne absente : un seul groupe (null) pour cette clé
+        codes, size = _key_codes(col, rows)
+        # Renumérotation après chaque clé : le code composite reste inférieur au nombre de lignes
+        _, first, composite = np.unique(composite * size + codes, return_index=True, return_inverse=True)
+    return composite.astype(np.int64), len(first), rows[first]
+
+
+def _groups_bound(data, keys, n_rows):
+    """Majorant du nombre de groupes sans lire les lignes (dictionnaires des str, bool), sinon le nombre de lignes."""
+    bound = 1
+    for field in keys:
+        col = data.column(field)
+        if col is None: continue
+        match col.kind:
+            case ds.KIND_STR:
+                bound *= len(col.dictionary) + 1
+            case ds.KIND_BOOL:
+                bound *= 3
+            case _:
+                return n_rows
+    return min(bound, n_rows)
+
+
+def _key_hashes(data, keys, rows):
+    """
+    Hash 64 bits des clés de regroupement de chaque ligne : deux lignes du même groupe ont le même hash
+    (1 et 1.0 dans une colonne object, 0.0 et -0.0, tous les NaN, tous les nulls). Des groupes différents
+    peuvent partager un hash : seule la répartition en partitions en dépend.
+    """
+    hashes = np.zeros(len(rows), dtype=np.uint64)
+    for field in keys:
+        col = data.column(field)
+        if col is None: continue
+        nulls = col.nulls[rows]
+        match col.kind:
+            case ds.KIND_STR | ds.KIND_INT | ds.KIND_BOOL:
+                column = sketches.hash_numbers(col.values[rows].astype(np.int64))
+            case ds.KIND_FLOAT:
+                values = col.values[rows]
+                column = sketches.hash_numbers(np.where(np.isnan(values), np.nan, values))
+            case _:
+                column = sketches.hash_strings([_object_text(v) for v in col.values[rows]])
+        hashes = sketches.combine_hashes(hashes, np.where(nulls, np.uint64(0), column))
+    return hashes
+
+
+def _object_text(v):
+    """Texte d'une valeur de colonne object, identique pour les valeurs d'un même groupe (voir sort.object_ranks)."""
+    if isinstance(v, bool) or isinstance(v, str):
+        return repr(v)
+    if isinstance(v, (int, float)):
+        return repr(float(v))
+    return json.dumps(v, sort_keys=True, default=str)
+
+
+# --- Accumulation ---
+
+def _numbers(col, rows):
+    """Valeurs numériques d'une colonne (les valeurs non numériques des colonnes object sont ignorées)."""
+    nulls = col.nulls[rows]
+    if col.kind in (ds.KIND_INT, ds.KIND_BOOL):
+        return col.values[rows].astype(np.int64), ~nulls
+    if col.kind == ds.KIND_FLOAT:
+        return col.values[rows], ~nulls
+    if col.kind == ds.KIND_OBJECT:
+        values = col.values[rows]
+        valid = np.fromiter((isinstance(v, (int, float)) and not isinstance(v, bool) for v in values),
+                            dtype=bool, count=len(values))
+        numbers = np.zeros(len(values), dtype=np.float64)
+        numbers[valid] = values[valid].astype(np.float64)
+        return numbers, valid
+    return np.zeros(len(rows)), np.zeros(len(rows), dtype=bool)
+
+
+def _distinct_codes(col, rows):
+    """Identifiant 64 bits de chaque valeur, comparable entre partitions (mêmes colonnes partagées)."""
+    match col.kind:
+        case ds.KIND_STR | ds.KIND_INT | ds.KIND_BOOL:
+            return col.values[rows].astype(np.int64)
+        case ds.KIND_FLOAT:
+            return (col.values[rows] + 0.0).view(np.int64)  # +0.0 : -0.0 et 0.0 confondus
+        case _:
+            # Même texte que pour les clés de regroupement : 1 et 1.0, ou deux dicts égaux, sont une seule valeur
+            return sketches.hash_strings([_object_text(v) for v in col.values[rows]]).view(np.int64)
+
+
+def _unique_pairs(groups, codes):
+    """Couples (groupe, valeur) distincts."""
+    if not len(groups):
+        return groups, codes
+    order = np.lexsort((codes, groups))
+    groups, codes = groups[order], codes[order]
+    keep = np.ones(len(groups), dtype=bool)
+    keep[1:] = (groups[1:] != groups[:-1]) | (codes[1:] != codes[:-1])
+    return groups[keep], codes[keep]
+
+
+class GroupAccumulator:
+    """
+    États d'agrégation de `n_groups` groupes : mis à jour par lots de lignes,
+    fusionnables entre partitions (même principe que StatsAccumulator).
+    """
+
+    def __init__(self, aggregations, n_groups):
+        self.aggregations = aggregations
+        self.n_groups = n_groups
+        self.sizes = np.zeros(n_groups, dtype=np.int64)
+        self.states = {}
+        self.kinds = {}        # type de colonne des min / max (pour le décodage)
+        self.dictionaries = {}
+
+    def update(self, data, rows, ids):
+        n = self.n_groups
+        self.sizes += np.bincount(ids, minlength=n)
+        for agg in self.aggregations:
+            col = None if agg.field is None else data.column(agg.field)
+            state = self.states.setdefault(agg.name, {})
+            if agg.op == "count":
+                if agg.field is None:
+                    continue
+                valid = np.zeros(len(rows), dtype=bool) if col is None else ~col.nulls[rows]
+                state["n"] = state.get("n", 0) + np.bincount(ids[valid], minlength=n)
+            elif col is None:
+                continue
+            elif agg.op in ("sum", "mean"):
+                values, valid = _numbers(col, rows)
+                integral = values.dtype == np.int64
+                sums = state.setdefault("sum", np.zeros(n, dtype=np.int64 if integral else np.float64))
+                if integral and sums.dtype == np.int64:
+                    np.add.at(sums, ids[valid], values[valid])  # somme exacte des entiers
+                else:
+                    state["sum"] = sums + np.bincount(ids[valid], weights=values[valid], minlength=n)
+                state["n"] = state.get("n", 0) + np.bincount(ids[valid], minlength=n)
+            elif agg.op in ("min", "max"):
+                self._update_extreme(agg, col, rows, ids, state)
+            else:
+                groups, codes = _unique_pairs(ids[~col.nulls[rows]], _distinct_codes(col, rows)[~col.nulls[rows]])
+                if "groups" in state:
+                    groups, codes = _unique_pairs(np.concatenate([state["groups"], groups]),
+                                                  np.concatenate([state["codes"], codes]))
+                state["groups"], state["codes"] = groups, codes
+        return self
+
+    def _update_extreme(self, agg, col, rows, ids, state):
+        lowest = agg.op == "min"
+        if col.kind == ds.KIND_STR:
+            # Dictionnaire trié : min / max des codes
+            values, valid = col.values[rows].astype(np.int64), ~col.nulls[rows]
+            self.dictionaries[agg.name] = col.dictionary
+        else:
+            values, valid = _numbers(col, rows)
+        self.kinds[agg.name] = col.kind
+        if values.dtype == np.int64:
+            info = np.iinfo(np.int64)
+            fill = info.max if lowest else info.min
+        else:
+            fill = np.inf if lowest else -np.inf
+        extreme = state.setdefault("value", np.full(self.n_groups, fill, dtype=values.dtype))
+        if extreme.dtype != values.dtype:
+            # Colonne int d'un lot, float d'un autre : on passe tout en float
+            extreme = state["value"] = extreme.astype(np.float64)
+            values = values.astype(np.float64)
+        (np.fmin if lowest else np.fmax).at(extreme, ids[valid], values[valid])
+        state["n"] = state.get("n", 0) + np.bincount(ids[valid], minlength=self.n_groups)
+
+    def merge(self, other):
+        self.sizes += other.sizes
+        self.kinds.update(other.kinds)
+        self.dictionaries.update(other.dictionaries)
+        for agg in self.aggregations:
+            mine, theirs = self.states.setdefault(agg.name, {}), other.states.get(agg.name, {})
+            if not theirs:
+                continue
+            if not mine:
+                mine.update(theirs)
+            elif agg.op == "distinct":
+                mine["groups"], mine["codes"] = _unique_pairs(np.concatenate([mine["groups"], theirs["groups"]]),
+                                                              np.concatenate([mine["codes"], theirs["codes"]]))
+            else:
+                for part, value in theirs.items():
+                    if part == "value":
+                        if mine[part].dtype != value.dtype:
+                            mine[part], value = mine[part].astype(np.float64), value.astype(np.float64)
+                        (np.fmin if agg.op == "min" else np.fmax)(mine[part], value, out=mine[part])
+                    else:
+                        mine[part] = mine[part] + value
+        return self
+
+    def report(self):
+        """{nom: tableau par groupe} ; NaN (flottants) ou None (objets) pour les groupes sans valeur."""
+        result = {}
+        for agg in self.aggregations:
+            state = self.states.get(agg.name, {})
+            counts = state.get("n", np.zeros(self.n_groups, dtype=np.int64))
+            match agg.op:
+                case "count":
+                    result[agg.name] = self.sizes.copy() if agg.field is None else counts
+                case "distinct":
+                    groups = state.get("groups", np.empty(0, dtype=np.int64))
+                    result[agg.name] = np.bincount(groups, minlength=self.n_groups)
+                case "sum":
+                    sums = state.get("sum", np.zeros(self.n_groups))
+                    result[agg.name] = np.where(counts > 0, sums, np.nan) if sums.dtype.kind == "f" \
+                        else _with_none(sums, counts)
+                case "mean":
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        result[agg.name] = state.get("sum", np.zeros(self.n_groups)) / counts
+                case _:
+                    result[agg.name] = self._decode_extreme(agg, state, counts)
+        return result
+
+    def _decode_extreme(self, agg, state, counts):
+        values = state.get("value")
+        if values is None:
+            return np.full(self.n_groups, np.nan)
+        kind = self.kinds.get(agg.name)
+        if kind == ds.KIND_STR:
+            dictionary = self.dictionaries[agg.name]
+            decoded = np.full(self.n_groups, None, dtype=object)
+            found = counts > 0
+            decoded[found] = dictionary[values[found]]
+            return decoded
+        if kind == ds.KIND_BOOL:
+            return _with_none(values.astype(bool), counts)
+        if values.dtype == np.int64:
+            return _with_none(values, counts)
+        return np.where(counts > 0, values, np.nan)
+
+
+def _with_none(values, counts):
+    result = values.astype(object)
+    result[counts == 0] = None
+    return result
+
+
+def aggregate(data, aggregations, rows, ids, n_groups):
+    """GroupAccumulator des lignes `rows` (numéros de groupes `ids`), par partitions si le volume le justifie."""
+    if my_parallel.enabled_for(len(rows)):
+        return my_parallel.group_aggregate(data, aggregations, rows, ids, n_groups)
+    return GroupAccumulator(aggregations, n_groups).update(data, rows, ids)
+
+
+# --- Résultat ---
+
+def _order_keys(values):
+    """
+    Clé de tri numérique d'une colonne de résultat (None / NaN en dernier).
+    Les rangs des colonnes object ne valent que pour `values` : à calculer sur tous les groupes comparés.
+    """
+    if values.dtype.kind in "if":
+        return values.astype(np.float64)
+    nulls = np.array([v is None or v != v for v in values], dtype=bool)
+    ranks = my_sort.object_ranks(values, nulls).astype(np.float64)
+    ranks[nulls] = np.nan
+    return ranks
+
+
+def _json_value(v):
+    if isinstance(v, np.generic): v = v.item()
+    if isinstance(v, float) and v != v: return None
+    return v
+
+
+def _records(data, keys, first_rows, report, groups):
+    """Lignes du résultat pour les groupes `groups` (positions dans `report` / `first_rows`)."""
+    records = data.to_records(first_rows[groups], fields=keys) if keys else [{} for _ in groups]
+    for record, position in zip(records, groups):
+        for field in keys:
+            record.setdefault(field, None)  # clé absente de la ligne : groupe null
+        for name, values in report.items():
+            record[name] = _json_value(values[position])
+    return records
+
+
+def group_by(data, keys, aggregations, rows=None, order=None, offset=0, limit=None):
+    """
+    Regroupe les lignes (toutes, ou `rows`) selon les colonnes `keys` et calcule les agrégations.
+    - order : (nom d'agrégation, reverse) pour trier les groupes, sinon ordre des clés (nulls en dernier)
+    - offset / limit : fenêtre de groupes renvoyée
+    Renvoie (nombre total de groupes, [dict par groupe]).
+    """
+    data = ds.as_dataset(data)
+    aggregations = parse_aggregations(aggregations) if not aggregations or isinstance(aggregations[0], dict) \
+        else aggregations
+    if order is not None and order[0] not in {a.name for a in aggregations}:
+        raise ValueError(f"Tri sur une agrégation inconnue : {order[0]}")
+    rows = np.arange(len(data)) if rows is None else np.asarray(rows, dtype=np.int64)
+    size = config.GROUPBY_MAX_GROUPS
+    with my_metrics.phase("groupby", rows=len(rows)):
+        if len(rows) > size and _groups_bound(data, keys, len(rows)) > size:
+            hashes = _key_hashes(data, keys, rows)
+            hll = sketches.HyperLogLog()
+            hll.update_hashes(hashes)
+            estimate = hll.estimate()
+            if estimate > size:
+                return _group_by_partitions(data, keys, aggregations, rows, hashes, estimate // size + 1,
+                                            order, offset, limit)
+            del hashes
+
+        ids, n_groups, first_rows = group_ids(data, keys, rows)
+        end = n_groups if limit is None else min(offset + limit, n_groups)
+        if offset >= end:
+            return n_groups, []
+
+        report = aggregate(data, aggregations, rows, ids, n_groups).report()
+        if order is None:
+            groups = np.arange(offset, end)
+        else:
+            name, reverse = order
+            values = _order_keys(report[name])
+            groups = np.argsort(-values if reverse else values, kind="stable")[offset:end]
+        return n_groups, _records(data, keys, first_rows, report, groups)
+
+
+def _group_by_partitions(data, keys, aggregations, rows, hashes, n_parts, order, offset, limit):
+    """
+    Trop de groupes pour la mémoire : les lignes sont réparties en `n_parts` partitions selon le hash
+    de leurs clés (un groupe n'est que dans une partition), chacune regroupée et agrégée à son tour,
+    son résultat écrit sur disque. Seuls les numéros de groupes d'une partition sont en mémoire à la fois.
+    La fenêtre est choisie parmi les `end` premiers groupes de chaque partition, comparés ensemble :
+    par l'ordre des clés (tri des lignes de chaque groupe), puis par la valeur d'agrégation si `order`.
+    """
+    parts = (hashes % np.uint64(n_parts)).astype(np.int64)
+    del hashes
+    # Tri stable : les lignes de chaque partition restent dans l'ordre
+    by_part = np.argsort(parts, kind="stable")
+    bounds = np.searchsorted(parts[by_part], np.arange(n_parts + 1))
+    del parts
+    directory = os.path.join(config.TMP_DIR, "groupby", uuid.uuid4().hex)
+    os.makedirs(directory)
+    try:
+        buckets = []
+        for i in range(n_parts):
+            part_rows = rows[by_part[bounds[i]:bounds[i + 1]]]
+            ids, count, first_rows = group_ids(data, keys, part_rows)
+            report = aggregate(data, aggregations, part_rows, ids, count).report()
+            path = os.path.join(directory, f"{i}.pkl")
+            with open(path, "wb") as f:
+                pickle.dump((first_rows, report), f, protocol=pickle.HIGHEST_PROTOCOL)
+            buckets.append((count, path))
+            jobs.checkpoint(rows=int(bounds[i + 1]))
+        del by_part
+
+        n_groups = sum(count for count, _ in buckets)
+        end = n_groups if limit is None else min(offset + limit, n_groups)
+        if offset >= end:
+            return n_groups, []
+
+        # Candidats : (partition, position dans la partition, première ligne, valeur d'agrégation)
+        part_of, local_of, firsts, values = [], [], [], []
+        for i, (count, path) in enumerate(buckets):
+            first_rows, report = _load(path)
+            if order is None:
+                best = np.arange(min(end, count))
+            else:
+                name, reverse = order
+                local = _order_keys(report[name])
+                # Seuls les end premiers de chaque partition peuvent faire partie de la fenêtre
+                best = np.argsort(-local if reverse else local, kind="stable")[:end]
+                values.append(report[name][best])
+            part_of.append(np.full(len(best), i))
+            local_of.append(best)
+            firsts.append(first_rows[best])
+        part_of, local_of, firsts = np.concatenate(part_of), np.concatenate(local_of), np.concatenate(firsts)
+
+        # Rang de chaque candidat dans l'ordre des clés (même ordre que group_ids : nulls en dernier)
+        by_row = np.argsort(firsts)
+        key_order = by_row[np.searchsorted(firsts, my_sort.sort_indices(data, keys, rows=firsts), sorter=by_row)]
+        if order is None:
+            selected = key_order[offset:end]
+        else:
+            key_rank = np.empty(len(firsts), dtype=np.int64)
+            key_rank[key_order] = np.arange(len(firsts))
+            # Clés d'ordre calculées une seule fois sur tous les candidats : comparables entre partitions
+            merged = _order_keys(np.concatenate(values))
+            selected = np.lexsort((key_rank, -merged if order[1] else merged))[offset:end]
+
+        records = [None] * len(selected)
+        for i, (count, path) in enumerate(buckets):
+            inside = np.flatnonzero(part_of[selected] == i)
+            if not len(inside): continue
+            _, report = _load(path)
+            local = local_of[selected[inside]]
+            sliced = {name: column[local] for name, column in report.items()}
+            part = _records(data, keys, firsts[selected[inside]], sliced, np.arange(len(local)))
+            for index, record in zip(inside, part):
+                records[index] = record
+        return n_groups, records
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _load(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,182 @@
+import threading
+import weakref
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+
+# Index construits à la demande, rangés par Dataset : quand un Dataset est remplacé
+# (nouveau fichier, nouvelle version), ses index disparaissent avec lui.
+_INDEXES = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+
+class HashIndex:
+    """
+    Index d'égalité : valeur "normalisée" -> lignes.
+    Stocké à plat (CSR) : `order` contient les lignes groupées par clé, `offsets` les bornes de chaque groupe.
+    Les str sont comparées en minuscules, comme le filtre '='.
+    """
+
+    def __init__(self, col):
+        self.kind = col.kind
+        valid = np.flatnonzero(~col.nulls)
+
+        if col.kind == ds.KIND_STR:
+            # Plusieurs entrées du dictionnaire peuvent avoir la même forme en minuscules
+            lowered = {}
+            for code, s in enumerate(col.dictionary):
+                lowered.setdefault(s.lower(), []).append(code)
+            group_of_code = np.empty(len(col.dictionary), dtype=np.int64)
+            self.keys = {}
+            for group, (key, codes) in enumerate(lowered.items()):
+                group_of_code[codes] = group
+                self.keys[key] = group
+            groups = group_of_code[col.values[valid]] if len(valid) else valid
+            n_groups = len(lowered)
+        elif col.kind == ds.KIND_OBJECT:
+            self.keys = {}
+            groups = np.fromiter(
+                (self.keys.setdefault(str(v).lower(), len(self.keys)) for v in col.values[valid]),
+                dtype=np.int64, count=len(valid)
+            )
+            n_groups = len(self.keys)
+        else:
+            # int / float / bool : groupes = valeurs distinctes triées
+            self.values, groups = np.unique(col.values[valid], return_inverse=True)
+            n_groups = len(self.values)
+
+        order = np.argsort(groups, kind="stable")
+        self.order = valid[order]
+        self.offsets = np.zeros(n_groups + 1, dtype=np.int64)
+        np.cumsum(np.bincount(groups, minlength=n_groups), out=self.offsets[1:])
+
+    def _group(self, value):
+        target = str(value).lower()
+        match self.kind:
+            case ds.KIND_STR | ds.KIND_OBJECT:
+                return self.keys.get(target)
+            case ds.KIND_BOOL:
+                if target not in ("true", "false"): return None
+                number = target == "true"
+            case _:
+                if isinstance(value, bool): return None
+                try:
+                    number = float(value) if not isinstance(value, (int, float)) else value
+                except (TypeError, ValueError):
+                    return None
+        pos = np.searchsorted(self.values, number)
+        if pos < len(self.values) and self.values[pos] == number:
+            return pos
+        return None
+
+    def lookup(self, value):
+        """Lignes (triées) dont la valeur est égale à `value`."""
+        group = self._group(value)
+        if group is None:
+            return np.empty(0, dtype=np.int64)
+        # Les lignes d'un groupe sont déjà dans l'ordre d'origine (tri stable)
+        return self.order[self.offsets[group]:self.offsets[group + 1]]
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.offsets.nbytes
+
+
+class SortedIndex:
+    """Index de plage : valeurs numériques triées + lignes correspondantes, interrogé par dichotomie."""
+
+    def __init__(self, col):
+        valid = ~col.nulls
+        if col.kind == ds.KIND_OBJECT:
+            # Seules les valeurs numériques participent aux comparaisons '>' / '<'
+            valid &= np.fromiter((isinstance(v, (int, float)) for v in col.values), dtype=bool, count=len(col))
+            rows = np.flatnonzero(valid)
+            values = np.array(col.values[rows].tolist(), dtype=np.float64)
+        else:
+            rows = np.flatnonzero(valid)
+            values = col.values[rows]
+        if values.dtype.kind == "f":
+            # NaN n'est ni plus grand ni plus petit qu'aucune valeur : exclu comme les nulls
+            keep = ~np.isnan(values)
+            rows, values = rows[keep], values[keep]
+
+        order = np.argsort(values, kind="stable")
+        self.sorted_values = values[order]
+        self.rows = rows[order]
+
+    def range(self, operator, value):
+        """Lignes (triées) qui vérifient `valeur > value` ou `valeur < value`."""
+        if operator == ">":
+            start = np.searchsorted(self.sorted_values, value, side="right")
+            hits = self.rows[start:]
+        else:
+            end = np.searchsorted(self.sorted_values, value, side="left")
+            hits = self.rows[:end]
+        return np.sort(hits)
+
+    @property
+    def nbytes(self):
+        return self.sorted_values.nbytes + self.rows.nbytes
+
+
+def _index_kind(operator):
+    if operator == "=": return "hash"
+    if operator in (">", "<"): return "sorted"
+    return None
+
+
+def supports(col, operator):
+    if _index_kind(operator) == "sorted":
+        return col.kind != ds.KIND_STR
+    return _index_kind(operator) is not None
+
+
+def get_index(data, field, operator, build=True):
+    """Renvoie l'index de la colonne pour cet opérateur, en le construisant au premier appel."""
+    kind = _index_kind(operator)
+    col = data.column(field)
+    if kind is None or col is None:
+        return None
+
+    with _LOCK:
+        cache = _INDEXES.setdefault(data, {})
+        index = cache.get((field, kind))
+    if index is not None or not build:
+        return index
+
+    index = HashIndex(col) if kind == "hash" else SortedIndex(col)
+    with _LOCK:
+        _INDEXES.setdefault(data, {})[(field, kind)] = index
+    return index
+
+
+def has_index(data, field, operator):
+    return get_index(data, field, operator, build=False) is not None
+
+
+def should_use(data, field, operator, rows=None):
+    """Un index n'est utile que sur un gros Dataset, et sur une sélection partielle seulement s'il existe déjà."""
+    if not config.INDEX_ENABLED or len(data) < config.INDEX_MIN_ROWS:
+        return False
+    col = data.column(field)
+    if col is None or not supports(col, operator):
+        return False
+    return rows is None or has_index(data, field, operator)
+
+
+def invalidate(data, field=None):
+    """Oublie les index d'un Dataset (ou d'une seule de ses colonnes)."""
+    with _LOCK:
+        if field is None:
+            _INDEXES.pop(data, None)
+            return
+        cache = _INDEXES.get(data, {})
+        for key in [k for k in cache if k[0] == field]:
+            del cache[key]
+
+
+def nbytes(data):
+    with _LOCK:
+        return sum(index.nbytes for index in _INDEXES.get(data, {}).values())
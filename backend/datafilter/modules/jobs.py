@@ -0,0 +1,205 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config
+
+# États d'un job
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = {DONE, FAILED, CANCELLED}
+
+# Job exécuté par le thread courant (None pour un appel synchrone, dans la requête)
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """Levée par checkpoint() dans le thread du job quand son annulation a été demandée."""
+
+
+def current():
+    return getattr(_local, "job", None)
+
+
+def checkpoint(rows=None, bytes_read=None):
+    """
+    Point de contrôle des traitements longs (lecture, export...) : met à jour la progression
+    du job courant et l'interrompt s'il a été annulé. Hors job, ne fait rien.
+    """
+    job = current()
+    if job is None: return
+    if rows is not None: job.rows = rows
+    if bytes_read is not None: job.bytes_read = bytes_read
+    if job.cancel_requested:
+        raise JobCancelled("Tâche annulée")
+
+
+def publish_partial(factory):
+    """
+    Résultat partiel du job courant (ex. premier lot d'un chargement), transmis à son callback
+    `on_partial`. `factory` n'est appelée que si quelqu'un l'attend, et une seule fois.
+    """
+    job = current()
+    if job is None or job.on_partial is None or job.has_partial: return
+    job.on_partial(factory())
+    job.has_partial = True
+    job._changed.set()
+
+
+class Job:
+    """Traitement exécuté en arrière-plan : état, progression et résultat."""
+
+    def __init__(self, kind, total_bytes=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind                  # "load", "save", "stats"...
+        self.status = PENDING
+        self.rows = 0                     # lignes lues / écrites
+        self.bytes_read = 0
+        self.total_bytes = total_bytes    # taille du fichier lu, si connue
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.future = None
+        self.on_partial = None            # callback appelé avec le premier résultat partiel
+        self.has_partial = False
+        self._cancel = threading.Event()
+        self._changed = threading.Event()  # résultat partiel publié ou job terminé
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def cancel(self):
+        """Demande l'annulation. Un job pas encore démarré est annulé tout de suite."""
+        if self.done: return False
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+        return True
+
+    def _finish(self, status):
+        self.status = status
+        self.finished = time.time()
+        self._changed.set()
+
+    def wait(self, timeout=None):
+        """Attend un résultat partiel ou la fin du job (au plus `timeout` secondes)."""
+        self._changed.wait(timeout)
+        return self.done
+
+    def join(self, timeout=None):
+        """Attend la fin du job (au plus `timeout` secondes)."""
+        if self.future is not None:
+            futures.wait([self.future], timeout)
+        return self.done
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "state": self.status,
+            "progress": {
+                "rows": self.rows,
+                "bytes_read": self.bytes_read,
+                "total_bytes": self.total_bytes,
+                "fraction": min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else None,
+            },
+            "elapsed": round(end - (self.started or end), 3),
+            "cancel_requested": self.cancel_requested,
+            "partial": self.has_partial and not self.done,
+            "result": self.result if self.status == DONE else None,
+            "error": self.error,
+        }
+
+
+class JobRunner:
+    """
+    Exécute les chargements / exports / statistiques dans un pool de threads :
+    la requête HTTP rend la main tout de suite avec l'id du job, le client suit /jobs/<id>/.
+    Les jobs terminés sont oubliés après `ttl` secondes.
+    """
+
+    def __init__(self, workers=None, ttl=None):
+        self.workers = workers or config.JOB_WORKERS
+        self.ttl = ttl if ttl is not None else config.JOB_TTL
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # id -> Job, du plus ancien au plus récent
+        self._executor = None
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, kind, fn, *args, total_bytes=None, on_partial=None, **kwargs):
+        """
+        Lance fn(*args, **kwargs) en arrière-plan ; sa valeur de retour devient le résultat du job.
+        `on_partial` reçoit, dans le thread du job, le résultat partiel publié par publish_partial().
+        """
+        job = Job(kind, total_bytes)
+        job.on_partial = on_partial
+        with self._lock:
+            self._expire()
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="datafilter-job")
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Renvoie le job (None s'il n'existe pas) après avoir demandé son annulation."""
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job._finish(CANCELLED)
+            return
+        _local.job = job
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            job.result = fn(*args, **kwargs)
+            if job.total_bytes:
+                job.bytes_read = job.total_bytes
+            job._finish(DONE)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job.error = str(e)
+            job._finish(FAILED)
+        finally:
+            _local.job = None
+
+    def _expire(self):
+        if not self.ttl: return
+        limit = time.time() - self.ttl
+        for job_id in [i for i, job in self._jobs.items() if job.done and job.finished < limit]:
+            del self._jobs[job_id]
@@ -0,0 +1,344 @@
+import os
+import sys
+import time
+import bisect
+import threading
+import contextlib
+import contextvars
+from collections import Counter
+
+from . import config
+from . import jobs
+
+# Mesures de performance, exposées au format texte Prometheus (/metrics/) et, pour chaque requête,
+# dans l'en-tête Server-Timing.
+# - requête : durée par endpoint / méthode / code, hausse de la mémoire maximale du processus
+# - phase (parse, convert, filter, sort, stats, groupby, serialize...) : durée, lignes traitées,
+#   octets lus. Les phases imbriquées ne se comptent pas deux fois : chacune ne mesure que
+#   son temps propre (ex. "parse" sans le "convert" des lots qu'elle lit).
+# Hors requête (job en arrière-plan), les phases sont rangées sous l'endpoint "job:<type>".
+# Profilage optionnel (METRICS_PROFILE_SLOW_MS) : les piles des requêtes en cours sont
+# échantillonnées, et celles des requêtes lentes écrites dans METRICS_PROFILE_DIR
+# (format "collapsed", lisible par flamegraph.pl / speedscope).
+
+_request = contextvars.ContextVar("datafilter_request_metrics", default=None)
+_local = threading.local()  # pile des phases en cours dans ce thread
+
+
+def _peak_rss():
+    """Mémoire résidente maximale du processus depuis son démarrage, en octets (None si inconnue)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# --- Stockage ---
+
+class Histogram:
+    """Histogramme à seaux fixes (bornes supérieures, comme Prometheus)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # dernier seau : +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class Registry:
+    """Compteurs, jauges et histogrammes, indexés par nom puis par étiquettes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # nom -> (type, aide, {étiquettes: valeur ou Histogram})
+
+    def _series(self, kind, name, help):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = (kind, help, {})
+        return metric[2]
+
+    def inc(self, name, help, labels, value=1):
+        with self._lock:
+            series = self._series("counter", name, help)
+            series[labels] = series.get(labels, 0) + value
+
+    def set(self, name, help, labels, value):
+        with self._lock:
+            self._series("gauge", name, help)[labels] = value
+
+    def observe(self, name, help, labels, value, buckets):
+        with self._lock:
+            series = self._series("histogram", name, help)
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = Histogram(buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._metrics.clear()
+
+    def render(self):
+        """Texte au format d'exposition Prometheus (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._metrics):
+                kind, help, series = self._metrics[name]
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels in sorted(series):
+                    value = series[labels]
+                    if kind != "histogram":
+                        lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                        continue
+                    for bound, total in value.cumulative():
+                        le = "+Inf" if bound == float("inf") else _number(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {total}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(value.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}" if labels else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+REGISTRY = Registry()
+
+
+# --- Requêtes et phases ---
+
+class RequestMetrics:
+    """Mesures d'une requête en cours (phases dans l'ordre de première apparition)."""
+
+    def __init__(self):
+        self.endpoint = "unknown"
+        self.method = None
+        self.status = None
+        self.started = time.perf_counter()
+        self.duration = None
+        self.phases = {}     # phase -> secondes (temps propre)
+        self.rows = 0
+        self.bytes_read = 0
+        self.peak_rss_growth = None
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing : une entrée par phase, puis le total (en ms)."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        if self.duration is not None:
+            entries.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(entries)
+
+
+class Phase:
+    __slots__ = ("name", "rows", "bytes_read", "_start", "_children")
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows          # lignes traitées, si connues (modifiable dans le bloc)
+        self.bytes_read = None    # octets lus (modifiable dans le bloc)
+        self._start = time.perf_counter()
+        self._children = 0.0      # durée des phases imbriquées
+
+
+def current():
+    """Mesures de la requête en cours dans ce contexte (None hors requête)."""
+    return _request.get()
+
+
+def _endpoint():
+    request = _request.get()
+    if request is not None:
+        return request.endpoint
+    job = jobs.current()
+    return f"job:{job.kind}" if job is not None else "other"
+
+
+@contextlib.contextmanager
+def phase(name, rows=None):
+    """
+    Mesure une phase de traitement :
+        with my_metrics.phase("filter", rows=len(rows)):
+            ...
+    """
+    if not config.METRICS_ENABLED:
+        yield Phase(name, rows)
+        return
+    stack = getattr(_local, "phases", None)
+    if stack is None:
+        stack = _local.phases = []
+    current_phase = Phase(name, rows)
+    stack.append(current_phase)
+    try:
+        yield current_phase
+    finally:
+        stack.pop()
+        elapsed = time.perf_counter() - current_phase._start
+        if stack:
+            stack[-1]._children += elapsed
+        _record_phase(current_phase, max(elapsed - current_phase._children, 0.0))
+
+
+def _record_phase(p, seconds):
+    endpoint = _endpoint()
+    labels = (("endpoint", endpoint), ("phase", p.name))
+    REGISTRY.observe("datafilter_phase_seconds", "Temps propre de chaque phase de traitement (s)",
+                     labels, seconds, config.METRICS_LATENCY_BUCKETS)
+    if p.rows:
+        REGISTRY.inc("datafilter_rows_processed_total", "Lignes traitées par phase", labels, int(p.rows))
+    if p.bytes_read:
+        REGISTRY.inc("datafilter_bytes_read_total", "Octets lus depuis les fichiers de données",
+                     (("endpoint", endpoint),), int(p.bytes_read))
+
+    request = _request.get()
+    if request is not None:
+        request.add_phase(p.name, seconds)
+        request.rows += int(p.rows or 0)
+        request.bytes_read += int(p.bytes_read or 0)
+
+
+@contextlib.contextmanager
+def request():
+    """
+    Mesure une requête HTTP : renseigner endpoint / method / status dans le bloc.
+    Enregistre sa durée, la hausse de la mémoire maximale du processus, et son profil si elle est lente.
+    """
+    if not config.METRICS_ENABLED:
+        yield RequestMetrics()
+        return
+    metrics = RequestMetrics()
+    token = _request.set(metrics)
+    peak_before = _peak_rss()
+    profiling = PROFILER.start() if config.METRICS_PROFILE_SLOW_MS is not None else None
+    try:
+        yield metrics
+    finally:
+        _request.reset(token)
+        metrics.duration = time.perf_counter() - metrics.started
+        peak_after = _peak_rss()
+        if peak_before is not None and peak_after is not None:
+            metrics.peak_rss_growth = peak_after - peak_before
+        if profiling is not None:
+            PROFILER.stop(profiling, metrics)
+        _record_request(metrics, peak_after)
+
+
+def _record_request(metrics, peak):
+    endpoint = (("endpoint", metrics.endpoint),)
+    REGISTRY.observe("datafilter_request_seconds", "Durée des requêtes HTTP (s)",
+                     endpoint + (("method", metrics.method or ""), ("status", str(metrics.status or ""))),
+                     metrics.duration, config.METRICS_LATENCY_BUCKETS)
+    if metrics.peak_rss_growth is not None:
+        REGISTRY.observe("datafilter_request_peak_rss_growth_bytes",
+                         "Hausse de la mémoire résidente maximale du processus pendant la requête (octets)",
+                         endpoint, metrics.peak_rss_growth, config.METRICS_MEMORY_BUCKETS)
+    if peak is not None:
+        REGISTRY.set("datafilter_process_peak_rss_bytes", "Mémoire résidente maximale du processus (octets)",
+                     (), peak)
+
+
+def render():
+    return REGISTRY.render()
+
+
+# --- Profilage des requêtes lentes ---
+
+class SamplingProfiler:
+    """
+    Un seul thread échantillonne, toutes les METRICS_PROFILE_INTERVAL secondes, la pile des
+    threads qui traitent une requête ; le profil n'est écrit que si la requête dépasse le seuil.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}   # id du thread -> Counter(pile -> échantillons)
+        self._thread = None
+
+    def start(self):
+        thread_id = threading.get_ident()
+        samples = Counter()
+        with self._lock:
+            self._active[thread_id] = samples
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="datafilter-profiler", daemon=True)
+                self._thread.start()
+        return thread_id, samples
+
+    def stop(self, profiling, metrics):
+        thread_id, samples = profiling
+        with self._lock:
+            self._active.pop(thread_id, None)
+        if metrics.duration * 1000 >= config.METRICS_PROFILE_SLOW_MS and samples:
+            path = self._write(samples, metrics)
+            REGISTRY.inc("datafilter_slow_requests_profiled_total", "Requêtes lentes dont le profil a été écrit",
+                         (("endpoint", metrics.endpoint),))
+            return path
+        return None
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            time.sleep(config.METRICS_PROFILE_INTERVAL)
+            with self._lock:
+                active = list(self._active.items())
+            if not active: continue
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != own:
+                    samples[_stack(frame)] += 1
+
+    def _write(self, samples, metrics):
+        directory = config.METRICS_PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+        name = f"{stamp}_{metrics.endpoint}_{metrics.duration * 1000:.0f}ms.folded"
+        path = os.path.join(directory, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+        # On ne garde que les profils les plus récents
+        profiles = sorted(os.listdir(directory))
+        for old in profiles[:-config.METRICS_PROFILE_KEEP or None]:
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(directory, old))
+        return path
+
+
+def _stack(frame):
+    """Pile au format collapsed : appels de la racine vers la fonction courante, séparés par ';'."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+PROFILER = SamplingProfiler()
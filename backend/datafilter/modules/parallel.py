@@ -0,0 +1,361 @@
+import os
+import uuid
+import atexit
+import threading
+import weakref
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import jobs
+
+# Exécution parallèle par partitions de lignes.
+# Les tableaux numpy d'une colonne sont rendus lisibles par les processus de calcul à la première
+# tâche qui en a besoin, sans qu'aucune ligne ne soit sérialisée :
+# - colonne relue en mmap depuis le cache disque : les workers projettent le même fichier .npy
+# - autre colonne : copiée une seule fois en mémoire partagée (comptée dans le budget des espaces)
+# Seules les colonnes "object" (listes, dicts, types mélangés) doivent encore être envoyées,
+# et seulement les lignes traitées par chaque worker.
+
+_IN_WORKER = False
+_POOL = None
+_POOL_LOCK = threading.Lock()
+_SHARED = weakref.WeakKeyDictionary()  # Dataset -> SharedColumns
+_SHARED_LOCK = threading.Lock()
+_ATTACHED = {}                         # côté worker : jeton du Dataset -> {segment: SharedMemory ou mmap}
+
+
+def worker_count():
+    return config.PARALLEL_WORKERS or os.cpu_count() or 1
+
+
+def enabled_for(n_rows):
+    """Le parallélisme ne vaut le coût que pour les gros volumes (et jamais depuis un worker)."""
+    return not _IN_WORKER and worker_count() > 1 and n_rows >= config.PARALLEL_MIN_ROWS
+
+
+def _init_worker():
+    global _IN_WORKER
+    _IN_WORKER = True
+
+
+def get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=worker_count(),
+                mp_context=mp.get_context(config.PARALLEL_START_METHOD),
+                initializer=_init_worker,
+            )
+        return _POOL
+
+
+def shutdown():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(cancel_futures=True)
+            _POOL = None
+
+atexit.register(shutdown)
+
+
+# --- Mémoire partagée ---
+
+def _share(array, blocks):
+    """Copie un tableau numpy dans un segment partagé et renvoie de quoi le rouvrir."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    blocks.append(shm)
+    return ("shm", shm.name, array.shape, array.dtype.str)
+
+
+def _mapped_file(array):
+    """Fichier .npy dont `array` est la projection complète (colonne du cache disque), sinon None."""
+    if not isinstance(array, np.memmap) or not array.filename or not array.flags.c_contiguous:
+        return None
+    try:
+        # Une tranche du tableau garde le `filename` et l'`offset` du fichier : elle doit le couvrir en entier
+        if os.path.getsize(array.filename) - array.offset != array.nbytes:
+            return None
+    except OSError:
+        return None  # entrée du cache évincée entre-temps : on se rabat sur une copie
+    return array.filename
+
+
+def _segment(array, blocks):
+    """De quoi relire `array` dans un worker : son fichier .npy s'il est projeté, sinon une copie partagée."""
+    path = _mapped_file(array)
+    if path is not None:
+        return ("npy", path, array.shape, array.dtype.str)
+    return _share(array, blocks)
+
+
+def _attach(spec, token):
+    """Côté worker : vue sur un segment d'un Dataset, gardé ouvert tant que le Dataset existe."""
+    source, name, shape, dtype = spec
+    segments = _ATTACHED.setdefault(token, {})
+    handle = segments.get(name)
+    if handle is None:
+        if source == "npy":
+            handle = np.load(name, mmap_mode="r")
+        else:
+            # Les workers partagent le resource_tracker du process principal, seul propriétaire du segment
+            handle = shared_memory.SharedMemory(name=name)
+        segments[name] = handle
+    if source == "npy":
+        return handle
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=handle.buf)
+
+
+def _detach_stale(live):
+    """Côté worker : ferme les segments des Datasets libérés par le process principal."""
+    for token in [t for t in _ATTACHED if t not in live]:
+        segments = _ATTACHED.pop(token)
+        for name, handle in list(segments.items()):
+            if not isinstance(handle, shared_memory.SharedMemory):
+                del segments[name]  # fichier projeté : libéré avec sa dernière vue
+                continue
+            try:
+                handle.close()
+                del segments[name]
+            except BufferError:
+                pass  # une vue existe encore : on réessaiera à la prochaine tâche
+        if segments:
+            _ATTACHED[token] = segments
+
+
+def _write_shared(spec, start, end, values):
+    """Côté worker : écrit dans un segment à usage unique (résultat d'une tâche), refermé aussitôt."""
+    _, name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)[start:end] = values
+    finally:
+        shm.close()
+
+
+def _run(live, fn, *args):
+    """Exécute une tâche dans un worker, après avoir détaché les Datasets qui n'existent plus."""
+    _detach_stale(live)
+    return fn(*args)
+
+
+def _submit(fn, *args):
+    with _SHARED_LOCK:
+        live = frozenset(shared.token for shared in _SHARED.values())
+    return get_pool().submit(_run, live, fn, *args)
+
+
+def _release(blocks):
+    for shm in blocks:
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedColumns:
+    """
+    Colonnes d'un Dataset lisibles par les workers (segments libérés avec le Dataset).
+    Chaque colonne n'est partagée qu'à la première tâche qui la lit.
+    """
+
+    def __init__(self, data):
+        self.token = uuid.uuid4().hex
+        self.blocks = []
+        self.specs = {}
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(data, _release, self.blocks)
+
+    @property
+    def nbytes(self):
+        """Mémoire partagée occupée par les copies (les fichiers projetés n'en prennent pas)."""
+        with self._lock:
+            return sum(shm.size for shm in self.blocks)
+
+    def _column_spec(self, col):
+        with self._lock:
+            spec = self.specs.get(col.name)
+            if spec is None or any(s is not None and s[0] == "npy" and not os.path.exists(s[1])
+                                   for s in (spec["values"], spec["nulls"], spec["missing"])):
+                # Première tâche sur la colonne, ou fichier du cache disque supprimé depuis
+                spec = self.specs[col.name] = {
+                    "token": self.token,
+                    "kind": col.kind,
+                    "values": None if col.kind == ds.KIND_OBJECT else _segment(col.values, self.blocks),
+                    "nulls": _segment(col.nulls, self.blocks),
+                    "missing": None if col.missing is None else _segment(col.missing, self.blocks),
+                    "dictionary": col.dictionary,
+                }
+            return spec
+
+    def task_spec(self, data, fields, start=None, end=None, rows=None):
+        """
+        Description envoyée au worker ; les colonnes object sont sérialisées, réduites aux lignes
+        [start, end) ou aux lignes `rows` traitées par ce worker.
+        """
+        specs = {}
+        for name in fields:
+            spec = dict(self._column_spec(data.column(name)))
+            if spec["kind"] == ds.KIND_OBJECT:
+                values = data.column(name).values
+                spec["objects"] = values[start:end] if rows is None else values[rows]
+            specs[name] = spec
+        return specs
+
+
+def shared_columns(data):
+    with _SHARED_LOCK:
+        shared = _SHARED.get(data)
+        if shared is None:
+            shared = SharedColumns(data)
+            _SHARED[data] = shared
+        return shared
+
+
+def nbytes(data):
+    """Mémoire partagée occupée par les colonnes de `data` copiées pour les workers."""
+    with _SHARED_LOCK:
+        shared = _SHARED.get(data)
+    return 0 if shared is None else shared.nbytes
+
+
+def _rebuild(specs, start=None, end=None, rows=None):
+    """
+    Côté worker : reconstruit un Dataset sur les lignes [start, end) (vues sans copie)
+    ou sur les lignes `rows` (copie de ces seules lignes, dans l'ordre de `rows`).
+    """
+    def part(segment, token):
+        array = _attach(segment, token)
+        return array[start:end] if rows is None else array[rows]
+
+    columns, length = [], None
+    for name, spec in specs.items():
+        if spec["kind"] == ds.KIND_OBJECT:
+            values = spec["objects"]
+        else:
+            values = part(spec["values"], spec["token"])
+        nulls = part(spec["nulls"], spec["token"])
+        missing = None if spec["missing"] is None else part(spec["missing"], spec["token"])
+        columns.append(ds.Column(name, spec["kind"], values, nulls, dictionary=spec["dictionary"], missing=missing))
+        length = len(nulls)
+    if length is None:
+        length = end - start if rows is None else len(rows)
+    return ds.Dataset(columns, length=length)
+
+
+def partitions(n, parts=None):
+    """Découpe [0, n) en plages contiguës de tailles proches."""
+    parts = max(min(parts or worker_count(), n), 1)
+    bounds = np.linspace(0, n, parts + 1).astype(np.int64)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+# --- Tâches exécutées dans les workers ---
+
+def _filter_task(specs, start, end, rows, field, value, operator, out_spec):
+    from . import filter as my_filter
+    part = _rebuild(specs, start, end, rows)
+    # Le résultat est écrit directement dans le masque partagé
+    _write_shared(out_spec, start, end, my_filter.filter_mask(part, field, value, operator))
+
+
+def _stats_task(specs, start, end, rows):
+    from . import accumulators as acc
+    return acc.StatsAccumulator().update(_rebuild(specs, start, end, rows))
+
+
+def _groupby_task(specs, rows, ids, aggregations, n_groups):
+    from . import groupby
+    part = _rebuild(specs, rows=rows)
+    return groupby.GroupAccumulator(aggregations, n_groups).update(part, np.arange(len(rows)), ids)
+
+
+def _types_task(values):
+    from . import schema
+    return schema.object_types(values)
+
+
+# --- API utilisée par filter / stats / schema ---
+
+def filter_mask(data, field, value, operator="=", rows=None):
+    """Masque du filtre calculé par partitions dans le pool de processus."""
+    size = len(data) if rows is None else len(rows)
+    shared = shared_columns(data)
+    out_blocks = []
+    out_spec = _share(np.zeros(size, dtype=bool), out_blocks)
+    try:
+        futures = []
+        for start, end in partitions(size):
+            task_rows = None if rows is None else rows[start:end]
+            if rows is None:
+                specs = shared.task_spec(data, [field], start, end)
+            else:
+                specs = shared.task_spec(data, [field], rows=task_rows)
+            futures.append(_submit(_filter_task, specs, start, end, task_rows, field, value, operator, out_spec))
+        for future in futures:
+            future.result()
+        return np.ndarray(size, dtype=bool, buffer=out_blocks[0].buf).copy()
+    finally:
+        _release(out_blocks)
+
+
+def compute_stats(data, rows=None):
+    """StatsAccumulator calculé par partitions puis fusionné (dans l'ordre des lignes)."""
+    from . import accumulators as acc
+    shared = shared_columns(data)
+    size = len(data) if rows is None else len(rows)
+    futures = []
+    for start, end in partitions(size):
+        if rows is None:
+            specs = shared.task_spec(data, data.fields, start, end)
+            futures.append(_submit(_stats_task, specs, start, end, None))
+        else:
+            task_rows = rows[start:end]
+            specs = shared.task_spec(data, data.fields, rows=task_rows)
+            futures.append(_submit(_stats_task, specs, None, None, task_rows))
+
+    result = acc.StatsAccumulator()
+    try:
+        for future in futures:
+            jobs.checkpoint()
+            result.merge(future.result())
+    except jobs.JobCancelled:
+        # Les partitions pas encore démarrées ne servent plus à rien
+        for future in futures:
+            future.cancel()
+        raise
+    return result
+
+
+def group_aggregate(data, aggregations, rows, ids, n_groups):
+    """GroupAccumulator calculé par partitions de lignes puis fusionné."""
+    from . import groupby
+    shared = shared_columns(data)
+    fields = list(dict.fromkeys(a.field for a in aggregations if a.field in data.columns))
+    futures = [_submit(_groupby_task, shared.task_spec(data, fields, rows=rows[start:end]), rows[start:end],
+                       ids[start:end], aggregations, n_groups)
+               for start, end in partitions(len(rows))]
+
+    result = groupby.GroupAccumulator(aggregations, n_groups)
+    for future in futures:
+        result.merge(future.result())
+    return result
+
+
+def object_types(values):
+    """Types (et sous-types des listes) d'une colonne object, calculés par partitions."""
+    futures = [_submit(_types_task, values[start:end]) for start, end in partitions(len(values))]
+    base_types, sub_types = set(), set()
+    for future in futures:
+        b, s = future.result()
+        base_types |= b
+        sub_types |= s
+    return base_types, sub_types
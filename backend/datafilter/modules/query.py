@@ -0,0 +1,286 @@
+import json
+import base64
+import itertools
+
+import numpy as np
+
+from . import expression as my_expression
+from . import filter as my_filter
+from . import metrics as my_metrics
+from . import result_cache as my_cache
+from . import schema as my_schema
+from .rowset import RowSet
+from . import sort as my_sort
+from . import stats as my_stats
+
+
+class Predicate:
+    """Condition de filtre simple : champ, opérateur, valeur."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, field, value, operator="="):
+        self.id = next(Predicate._ids)
+        self.field = field
+        self.value = value
+        self.operator = operator
+
+    def select(self, data, rows=None):
+        """Lignes de `data` (parmi `rows`) qui vérifient la condition."""
+        return my_filter.filter_rows(data, self.field, self.value, self.operator, rows=rows)
+
+    def cache_key(self):
+        """Description du filtre indépendante de son id (clé du cache de résultats)."""
+        return [self.field, self.operator, self.value]
+
+    def to_dict(self):
+        return {"id": self.id, "field": self.field, "operator": self.operator, "value": self.value}
+
+
+class Expression(Predicate):
+    """Filtre écrit dans le langage d'expressions (age > 30 and city in ("Paris", "Lyon"))."""
+
+    def __init__(self, text):
+        self.plan = my_expression.compile(text)  # ValueError si l'expression est invalide
+        super().__init__(None, text, "expr")
+
+    def select(self, data, rows=None):
+        return self.plan.rows(data, rows)
+
+    def cache_key(self):
+        # Forme normalisée : même clé quelle que soit la mise en forme du texte
+        return ["expr", str(self.plan)]
+
+    def to_dict(self):
+        return {"id": self.id, "expression": self.value}
+
+
+class Query:
+    """
+    Vue paresseuse sur un Dataset de base : liste de filtres, tri, limit/offset.
+    Rien n'est calculé tant qu'on ne demande pas une page, des stats ou un export.
+    La base n'est jamais modifiée : retirer un filtre ne demande pas de recharger le fichier.
+    Avec une empreinte (`fingerprint`, version du fichier chargé), les résultats sont aussi
+    partagés via le cache de résultats : revenir à des filtres déjà vus ne recalcule rien.
+    """
+
+    def __init__(self, base, predicates=None, sort=None, limit=None, offset=0, fingerprint=None):
+        self.base = base
+        self.fingerprint = fingerprint
+        self.predicates = list(predicates or [])
+        self.sort = sort          # liste de my_sort.SortKey ou None
+        self.limit = limit
+        self.offset = offset
+        self._invalidate()
+
+    _versions = itertools.count(1)
+
+    def _invalidate(self, keep_rows=False):
+        # Change à chaque modification des filtres / du tri : invalide les curseurs de pagination
+        self.version = next(Query._versions)
+        if not keep_rows:
+            self._rowset = None   # lignes retenues par les filtres (RowSet : bitmap ou indices)
+            self._rows = None     # mêmes lignes en indices, matérialisées seulement si besoin (tri, stats...)
+            # Stats et schéma ne dépendent que des lignes retenues, pas du tri
+            self._stats = None
+            self._schema = None
+        self._ordered = None      # mêmes lignes, triées
+        self._materialized = None
+
+    # --- Construction du plan ---
+
+    def add_filter(self, field, value, operator="="):
+        return self._add(Predicate(field, value, operator))
+
+    def add_expression(self, text):
+        """Ajoute un filtre exprimé dans le langage d'expressions (plan compilé et mis en cache)."""
+        return self._add(Expression(text))
+
+    def _add(self, predicate):
+        self.predicates.append(predicate)
+        if self._rowset is not None:
+            # Filtre ajouté en fin de chaîne : on ne réévalue que les lignes déjà retenues
+            rows = self._rowset
+            self._invalidate()
+            self._rowset = self._cached("rows", lambda: self._narrow(rows, predicate, self._cache()))
+        else:
+            self._invalidate()
+        return predicate
+
+    def remove_filter(self, predicate_id):
+        before = len(self.predicates)
+        self.predicates = [p for p in self.predicates if p.id != predicate_id]
+        if len(self.predicates) == before:
+            raise KeyError(f"Filtre {predicate_id} introuvable")
+        self._invalidate()
+
+    def clear_filters(self):
+        self.predicates = []
+        self._invalidate()
+
+    def set_sort(self, keys, reverse=False):
+        """Tri sur une colonne (`reverse` pour l'ordre décroissant) ou sur plusieurs clés (voir my_sort.normalize_keys)."""
+        self.sort = my_sort.normalize_keys(keys, reverse) or None
+        self._invalidate(keep_rows=True)
+
+    # --- Évaluation ---
+
+    def _cache(self):
+        return my_cache.get_cache() if self.fingerprint is not None else None
+
+    def _predicate_key(self, predicate):
+        return my_cache.make_key("predicate", self.fingerprint, predicate.cache_key())
+
+    def _cached(self, kind, compute, *extra):
+        """Résultat `kind` de la requête, lu dans le cache de résultats ou calculé puis ajouté."""
+        cache = self._cache()
+        if cache is None:
+            return compute()
+        # L'ordre des filtres ne change pas les lignes retenues
+        filters = sorted(json.dumps(p.cache_key(), default=str) for p in self.predicates)
+        key = my_cache.make_key(kind, self.fingerprint, filters, *extra)
+        return cache.get_or_compute(kind, key, compute)
+
+    def rowset(self):
+        """Lignes retenues par les filtres (RowSet), tous évalués en une seule passe."""
+        if self._rowset is None:
+            self._rowset = self._cached("rows", self._evaluate)
+        return self._rowset
+
+    def row_ids(self):
+        """Mêmes lignes, en indices triés."""
+        if self._rows is None:
+            self._rows = self.rowset().indices()
+        return self._rows
+
+    def _evaluate(self):
+        cache = self._cache()
+        rows, pending = RowSet.full(len(self.base)), []
+        # Filtres déjà évalués seuls sur ce fichier : simple ET entre bitmaps
+        for p in self.predicates:
+            hit = None if cache is None else cache.get("predicate", self._predicate_key(p))
+            if hit is None:
+                pending.append(p)
+            else:
+                rows &= hit
+        for p in pending:
+            if not len(rows): break
+            rows = self._narrow(rows, p, cache)
+        return rows
+
+    def _narrow(self, rows, predicate, cache):
+        """Lignes de `rows` qui vérifient aussi `predicate`."""
+        with my_metrics.phase("filter", rows=len(rows)):
+            if not rows.is_full:
+                # Le filtre n'est évalué que sur les lignes qui ont passé les précédents
+                return RowSet.from_indices(predicate.select(self.base, rows=rows.indices()), len(self.base))
+            result = RowSet.from_indices(predicate.select(self.base), len(self.base))
+        if cache is not None:
+            # Évalué sur tout le fichier : réutilisable seul, combiné à n'importe quels autres filtres
+            cache.put("predicate", self._predicate_key(predicate), result)
+        return result
+
+    def ordered_ids(self, limit=None):
+        """Lignes filtrées puis triées ; avec `limit`, seul le top-k est calculé."""
+        if self.sort is None:
+            return self.row_ids() if limit is None else self.rowset().select(0, limit)
+        rows = self.row_ids()
+        if self._ordered is not None:
+            return self._ordered if limit is None else self._ordered[:limit]
+
+        if limit is not None and limit >= len(rows):
+            limit = None
+        ordered = self._cached("order", lambda: my_sort.sort_indices(self.base, self.sort, rows=rows, limit=limit),
+                               my_sort.describe_keys(self.sort), limit)
+        if limit is None:
+            self._ordered = ordered
+        return ordered
+
+    def count(self):
+        return len(self.rowset())
+
+    def window(self, offset=0, limit=None, after=None):
+        """
+        Indices des lignes d'une page de la vue.
+        - offset / limit : pagination classique (avec un tri, seul le top offset + limit est calculé)
+        - after : pagination par curseur, la page commence juste après cette ligne
+        """
+        end = None if limit is None else offset + limit
+        if self.sort is None:
+            # Lignes dans l'ordre d'origine : la page est lue directement dans le RowSet
+            rowset = self.rowset()
+            start = 0 if after is None else rowset.rank(after)
+            return rowset.select(start + offset, None if limit is None else start + end)
+        if after is None:
+            return self.ordered_ids(limit=end)[offset:end]
+
+        rows = self.row_ids()
+        if self._ordered is None and limit is not None:
+            return my_sort.rows_after(self.base, self.sort, rows, after, end)[offset:]
+        # Vue déjà triée entièrement : on se repère dans l'ordre complet
+        ordered = self.ordered_ids()
+        position = np.flatnonzero(ordered == after)
+        start = int(position[0]) + 1 if len(position) else len(ordered)
+        return ordered[start + offset:None if limit is None else start + end]
+
+    def page(self, offset=None, limit=None, fields=None, after=None):
+        """Lignes [offset, offset + limit) de la vue (ou après la ligne `after`), sous forme de dictionnaires."""
+        offset = self.offset if offset is None else offset
+        limit = self.limit if limit is None else limit
+        return self.base.to_records(self.window(offset, limit, after), fields=fields)
+
+    def cursor(self, row):
+        """Curseur opaque désignant une ligne de cette version de la vue."""
+        raw = json.dumps({"v": self.version, "row": int(row)}).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def parse_cursor(self, token):
+        """Ligne désignée par un curseur ; ValueError s'il est illisible ou si la vue a changé depuis."""
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            version, row = raw["v"], int(raw["row"])
+        except (ValueError, TypeError, KeyError):
+            raise ValueError("Curseur invalide")
+        if version != self.version or not 0 <= row < len(self.base):
+            raise ValueError("Curseur expiré : la vue a changé, reprenez depuis le début")
+        return row
+
+    def materialize(self):
+        """Dataset complet de la vue (pour les stats et l'export)."""
+        if not self.predicates and self.sort is None:
+            return self.base
+        if self._materialized is None:
+            self._materialized = self.base.take(self.ordered_ids())
+        return self._materialized
+
+    def stats(self):
+        """
+        Rapport de statistiques de la vue, calculé sur les lignes retenues sans copier les données.
+        Le tri n'y entre pas ; sans filtre, ce sont les statistiques calculées au chargement.
+        """
+        if self._stats is None:
+            rows = self.row_ids() if self.predicates else None
+            self._stats = self._cached("stats", lambda: my_stats.analyze_structure(self.base, rows))
+        return self._stats
+
+    def schema(self, confidence=None):
+        """Types de chaque colonne sur les lignes de la vue (déduits du schéma du fichier chargé)."""
+        if confidence is not None:
+            return my_schema.infer(self.base, None if not self.predicates else self.row_ids(), confidence)
+        if self._schema is None:
+            self._schema = my_schema.infer(self.base, self.row_ids() if self.predicates else None)
+        return self._schema
+
+    def describe(self):
+        return {
+            "filters": [p.to_dict() for p in self.predicates],
+            "sort": my_sort.describe_keys(self.sort) if self.sort else None,
+        }
+
+    @property
+    def nbytes(self):
+        total = 0 if self._rowset is None else self._rowset.nbytes
+        for arr in (self._rows, self._ordered):
+            if arr is not None: total += arr.nbytes
+        if self._materialized is not None: total += self._materialized.nbytes
+        return total
@@ -0,0 +1,233 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from . import config
+
+# Cache des résultats de requêtes (lignes filtrées, permutations de tri, rapports de stats),
+# indexé par (empreinte du fichier chargé, requête normalisée) :
+# revenir à un jeu de filtres déjà vu ne recalcule rien.
+# Deux stockages au choix :
+# - "memory" : dans le process, LRU borné en octets
+# - "disk"   : fichiers dans TMP_DIR/results, partagés entre les workers du serveur
+#              (tableaux relus en mmap, sans copie)
+
+
+def make_key(*parts):
+    """Clé de cache stable entre process (hash du JSON des éléments de la requête)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(raw.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+def _nbytes(value):
+    if hasattr(value, "nbytes"):
+        return value.nbytes  # tableaux numpy, RowSet
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class MemoryStore:
+    """Entrées en mémoire du process, les moins récemment utilisées évincées au-delà du budget."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # clé -> (valeur, octets), du plus ancien au plus récent
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None: return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        size = _nbytes(value)
+        if self.budget and size > self.budget: return
+        if isinstance(value, np.ndarray):
+            # Le tableau est partagé par toutes les requêtes qui le relisent : lecture seule
+            value = value.view()
+            value.flags.writeable = False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None: self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.budget and self.size > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskStore:
+    """
+    Entrées dans un dossier partagé : <clé>.npy (tableaux, relus en mmap) ou <clé>.pkl (rapports).
+    L'écriture passe par un fichier temporaire renommé : un lecteur ne voit jamais d'entrée incomplète.
+    La date de modification sert d'ordre LRU pour l'éviction, comme pour le cache des fichiers parsés.
+    """
+
+    def __init__(self, budget, directory=None):
+        self.budget = budget
+        self.directory = directory or os.path.join(config.TMP_DIR, "results")
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _entries(self):
+        return [e for e in os.scandir(self.directory) if e.is_file() and not e.name.startswith(".")]
+
+    def __len__(self):
+        return len(self._entries())
+
+    @property
+    def size(self):
+        return sum(e.stat().st_size for e in self._entries())
+
+    def get(self, key):
+        path = os.path.join(self.directory, key)
+        try:
+            if os.path.exists(path + ".npy"):
+                value = np.load(path + ".npy", mmap_mode="r")
+                os.utime(path + ".npy")
+                return np.asarray(value)  # vue ndarray sur le mmap (lecture seule)
+            with open(path + ".pkl", "rb") as f:
+                value = pickle.load(f)
+            os.utime(path + ".pkl")
+            return value
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError):
+            # Absente, évincée entre-temps par un autre worker ou corrompue : on recalcule
+            return None
+
+    def put(self, key, value):
+        array = isinstance(value, np.ndarray)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if array:
+                    np.save(f, value)
+                else:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, os.path.join(self.directory, key + (".npy" if array else ".pkl")))
+        except OSError:
+            # Disque plein... : le résultat n'est simplement pas mis en cache
+            if os.path.exists(tmp): os.remove(tmp)
+            return
+        self._enforce_budget()
+
+    def _enforce_budget(self):
+        if not self.budget: return
+        entries = []
+        for entry in self._entries():
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        # Un tableau déjà mappé par une requête reste lisible après suppression (Unix)
+        for _, size, path in sorted(entries):
+            if total <= self.budget: break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in self._entries():
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class ResultCache:
+    """Cache de résultats avec compteurs de succès / échecs par type de résultat."""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def _count(self, counters, kind):
+        with self._lock:
+            counters[kind] = counters.get(kind, 0) + 1
+
+    def get(self, kind, key):
+        value = self.store.get(key)
+        self._count(self.misses if value is None else self.hits, kind)
+        return value
+
+    def put(self, kind, key, value):
+        self.store.put(key, value)
+        return value
+
+    def get_or_compute(self, kind, key, compute):
+        value = self.get(kind, key)
+        if value is None:
+            value = self.put(kind, key, compute())
+        return value
+
+    def clear(self):
+        self.store.clear()
+
+    def metrics(self):
+        with self._lock:
+            hits, misses = dict(self.hits), dict(self.misses)
+        total_hits, total_misses = sum(hits.values()), sum(misses.values())
+        return {
+            "store": type(self.store).__name__,
+            "entries": len(self.store),
+            "bytes": self.store.size,
+            "budget": self.store.budget,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_ratio": round(total_hits / (total_hits + total_misses), 4) if total_hits + total_misses else None,
+            "evictions": self.store.evictions,
+            "by_kind": {k: {"hits": hits.get(k, 0), "misses": misses.get(k, 0)} for k in sorted({*hits, *misses})},
+        }
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache():
+    """Cache partagé du process, créé selon config.RESULT_CACHE_STORE (None si désactivé)."""
+    global _CACHE
+    if not config.RESULT_CACHE_STORE:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = configure(config.RESULT_CACHE_STORE)
+        return _CACHE
+
+
+def configure(store, budget=None):
+    """Remplace le cache du process : "memory", "disk" ou un objet store (get / put / clear)."""
+    global _CACHE
+    budget = config.RESULT_CACHE_BUDGET if budget is None else budget
+    if store == "memory":
+        store = MemoryStore(budget)
+    elif store == "disk":
+        store = DiskStore(budget)
+    elif isinstance(store, str):
+        raise ValueError(f"Stockage de cache inconnu : {store} (memory, disk)")
+    _CACHE = None if store is None else ResultCache(store)
+    return _CACHE
@@ -0,0 +1,165 @@
+import numpy as np
+
+# Ensemble de lignes d'un Dataset (résultat de filtres), sous la forme la plus compacte :
+# - toutes les lignes : rien n'est stocké
+# - peu de lignes : indices triés (int32 tant que possible)
+# - sinon : bitmap compressé, 1 bit par ligne du Dataset (np.packbits)
+# Le nombre de lignes est connu dès la construction (popcount), sans matérialiser les indices.
+
+# Au-delà d'une ligne sur 32, le bitmap (1 bit / ligne) est plus petit que les indices (32 bits / ligne retenue)
+_SPARSE_RATIO = 32
+
+# Nombre de bits à 1 de chaque octet
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _index_dtype(size):
+    return np.int32 if size < 2**31 else np.int64
+
+
+class RowSet:
+    """Lignes retenues parmi les `size` lignes d'un Dataset (immuable)."""
+
+    __slots__ = ("size", "count", "bits", "rows")
+
+    def __init__(self, size, count, bits=None, rows=None):
+        self.size = size
+        self.count = count
+        self.bits = bits    # bitmap (uint8, bit de poids faible = première ligne) ou None
+        self.rows = rows    # indices triés ou None ; les deux à None : toutes les lignes
+
+    # --- Construction ---
+
+    @classmethod
+    def full(cls, size):
+        return cls(size, size)
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        count = int(np.count_nonzero(mask))
+        if count == len(mask):
+            return cls.full(len(mask))
+        if count * _SPARSE_RATIO < len(mask):
+            return cls(len(mask), count, rows=np.flatnonzero(mask).astype(_index_dtype(len(mask))))
+        return cls(len(mask), count, bits=np.packbits(mask, bitorder="little"))
+
+    @classmethod
+    def from_indices(cls, rows, size):
+        """À partir d'indices triés et sans doublons."""
+        rows = np.asarray(rows)
+        if len(rows) == size:
+            return cls.full(size)
+        if len(rows) * _SPARSE_RATIO < size:
+            return cls(size, len(rows), rows=rows.astype(_index_dtype(size)))
+        mask = np.zeros(size, dtype=bool)
+        mask[rows] = True
+        return cls(size, len(rows), bits=np.packbits(mask, bitorder="little"))
+
+    @classmethod
+    def _from_bits(cls, bits, size):
+        count = int(_POPCOUNT[bits].sum(dtype=np.int64))
+        if count == size:
+            return cls.full(size)
+        if count * _SPARSE_RATIO < size:
+            return cls.from_mask(cls(size, count, bits=bits).mask())
+        return cls(size, count, bits=bits)
+
+    # --- Accès ---
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def is_full(self):
+        return self.bits is None and self.rows is None
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.bits, self.rows) if a is not None)
+
+    def mask(self):
+        if self.bits is not None:
+            return np.unpackbits(self.bits, count=self.size, bitorder="little").view(bool)
+        mask = np.zeros(self.size, dtype=bool) if self.rows is not None else np.ones(self.size, dtype=bool)
+        if self.rows is not None:
+            mask[self.rows] = True
+        return mask
+
+    def indices(self):
+        """Indices (int64, triés) des lignes retenues."""
+        if self.rows is not None:
+            return self.rows.astype(np.int64)
+        if self.bits is not None:
+            return np.flatnonzero(self.mask())
+        return np.arange(self.size)
+
+    def contains(self, rows):
+        """Masque : chacune des lignes `rows` fait-elle partie de l'ensemble ?"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.bits is not None:
+            return ((self.bits[rows >> 3] >> (rows & 7).astype(np.uint8)) & 1).astype(bool)
+        if self.rows is not None:
+            pos = np.searchsorted(self.rows, rows)
+            return (pos < len(self.rows)) & (self.rows[np.minimum(pos, max(len(self.rows) - 1, 0))] == rows) \
+                if len(self.rows) else np.zeros(len(rows), dtype=bool)
+        return (rows >= 0) & (rows < self.size)
+
+    def rank(self, row):
+        """Nombre de lignes retenues jusqu'à `row` inclus (position de la ligne suivante dans l'ensemble)."""
+        if self.rows is not None:
+            return int(np.searchsorted(self.rows, row, side="right"))
+        if self.bits is None:
+            return min(max(row + 1, 0), self.size)
+        if row < 0: return 0
+        if row >= self.size: return self.count
+        byte, bit = row >> 3, row & 7
+        partial = int(self.bits[byte]) & ((2 << bit) - 1)
+        return int(_POPCOUNT[self.bits[:byte]].sum(dtype=np.int64)) + bin(partial).count("1")
+
+    def select(self, start, stop=None):
+        """Indices des lignes retenues de rang [start, stop), sans matérialiser tout l'ensemble."""
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return np.empty(0, dtype=np.int64)
+        if self.rows is not None:
+            return self.rows[start:stop].astype(np.int64)
+        if self.bits is None:
+            return np.arange(start, stop)
+        # Octets qui contiennent la start-ième et la (stop - 1)-ième ligne, d'après le popcount cumulé
+        cumulative = np.cumsum(_POPCOUNT[self.bits], dtype=np.int64)
+        first = int(np.searchsorted(cumulative, start, side="right"))
+        last = int(np.searchsorted(cumulative, stop - 1, side="right"))
+        before = int(cumulative[first - 1]) if first else 0
+        chunk = np.unpackbits(self.bits[first:last + 1], bitorder="little").view(bool)
+        rows = np.flatnonzero(chunk) + first * 8
+        return rows[start - before:stop - before]
+
+    # --- Combinaisons ---
+
+    def _bits(self):
+        return self.bits if self.bits is not None else np.packbits(self.mask(), bitorder="little")
+
+    def __and__(self, other):
+        if self.is_full: return other
+        if other.is_full: return self
+        if self.rows is not None or other.rows is not None:
+            # Le plus petit ensemble d'indices est testé contre l'autre ensemble
+            small, large = (self, other) if self.rows is not None and (other.rows is None or self.count <= other.count) \
+                else (other, self)
+            return RowSet.from_indices(small.rows[large.contains(small.rows)], self.size)
+        return RowSet._from_bits(np.bitwise_and(self.bits, other.bits), self.size)
+
+    def __or__(self, other):
+        if self.is_full or other.is_full:
+            return RowSet.full(self.size)
+        if self.rows is not None and other.rows is not None:
+            return RowSet.from_indices(np.union1d(self.rows, other.rows), self.size)
+        return RowSet._from_bits(np.bitwise_or(self._bits(), other._bits()), self.size)
+
+    def __sub__(self, other):
+        if other.is_full:
+            return RowSet(self.size, 0, rows=np.empty(0, dtype=_index_dtype(self.size)))
+        if self.rows is not None:
+            return RowSet.from_indices(self.rows[~other.contains(self.rows)], self.size)
+        return RowSet._from_bits(np.bitwise_and(self._bits(), np.invert(other._bits())), self.size)
@@ -0,0 +1,208 @@
+import math
+import itertools
+import threading
+import weakref
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import parallel as my_parallel
+
+# Schéma d'un Dataset : types rencontrés dans chaque colonne (et dans les listes qu'elle contient).
+# - colonnes typées (int, float, bool, str) : le type est connu sans lire les valeurs
+# - colonnes hétérogènes : une seule passe sur les valeurs, par type Python (set(map(type, ...)))
+# Le schéma complet est gardé avec le Dataset (tant qu'il existe) ; pendant un chargement il est
+# construit lot par lot, et celui d'une vue filtrée se déduit du schéma complet.
+
+_SCHEMAS = weakref.WeakKeyDictionary()  # Dataset -> {confidence: Schema}
+_LOCK = threading.Lock()
+
+_TYPE_NAMES = {bool: "bool", int: "int", float: "float", str: "str", list: "list", dict: "dict", type(None): "None"}
+
+
+def _type_name(t):
+    """Nom de type lisible (mêmes règles que utils.get_type_str, sous-classes comprises)."""
+    name = _TYPE_NAMES.get(t)
+    if name is not None: return name
+    for base in (bool, int, float, str, list, dict):
+        if issubclass(t, base): return _TYPE_NAMES[base]
+    return "unknown"
+
+
+def object_types(values):
+    """Types des valeurs (non nulles) d'une colonne hétérogène et types des éléments de ses listes."""
+    types = set(map(type, values))
+    names = {_type_name(t) for t in types}
+    sub = set()
+    if "list" in names:
+        lists = [v for v in values if isinstance(v, list)]
+        sub = {_type_name(t) for t in set(map(type, itertools.chain.from_iterable(lists)))}
+    return names, sub
+
+
+def sample_size(confidence, frequency=None):
+    """
+    Taille d'échantillon telle qu'un type présent dans au moins `frequency` des lignes
+    soit vu avec une probabilité `confidence` : (1 - frequency)^n <= 1 - confidence.
+    """
+    frequency = frequency or config.SCHEMA_SAMPLE_MIN_FREQUENCY
+    if not 0 < confidence < 1:
+        raise ValueError("Le niveau de confiance doit être compris entre 0 et 1 (exclus)")
+    return math.ceil(math.log(1 - confidence) / math.log(1 - frequency))
+
+
+class ColumnSchema:
+    """Types d'une colonne ; `exact` est faux si une partie des valeurs seulement a été lue."""
+
+    def __init__(self, name, kind=None, types=None, sub_types=None, null_count=0, exact=True):
+        self.name = name
+        self.kinds = {kind} if kind is not None and types else set()  # types de colonne des morceaux non vides
+        self.raw_types = set(types or ())
+        self.sub_types = set(sub_types or ())
+        self.null_count = null_count
+        self.exact = exact
+
+    @property
+    def kind(self):
+        # Mêmes règles que concat_columns : int + float -> float, autres mélanges -> hétérogène
+        if len(self.kinds) == 1: return next(iter(self.kinds))
+        if self.kinds and self.kinds <= ds.NUMERIC_KINDS: return ds.KIND_FLOAT
+        return ds.KIND_OBJECT
+
+    @property
+    def types(self):
+        # Les entiers d'une colonne float assemblée deviennent des float
+        return {ds.KIND_FLOAT} if self.kind == ds.KIND_FLOAT and self.raw_types else self.raw_types
+
+    def merge(self, other):
+        self.kinds |= other.kinds
+        self.raw_types |= other.raw_types
+        self.sub_types |= other.sub_types
+        self.null_count += other.null_count
+        self.exact = self.exact and other.exact
+        return self
+
+    def type_str(self):
+        """Description affichable : "list of int,str | float", "unknown" si aucune valeur."""
+        parts = []
+        if "list" in self.types:
+            parts.append(f"list of {','.join(sorted(self.sub_types))}" if self.sub_types else "list")
+        parts.extend(sorted(self.types - {"list"}))
+        return " | ".join(parts) if parts else "unknown"
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "types": sorted(self.types),
+            "list_types": sorted(self.sub_types),
+            "null_count": self.null_count,
+            "exact": self.exact,
+        }
+
+
+class Schema:
+    """Schéma de toutes les colonnes d'un Dataset (ou d'une partie de ses lignes)."""
+
+    def __init__(self, columns=None, rows=0):
+        self.columns = dict(columns or {})
+        self.rows = rows
+
+    @property
+    def exact(self):
+        return all(c.exact for c in self.columns.values())
+
+    def column(self, name):
+        if name not in self.columns:
+            self.columns[name] = ColumnSchema(name)
+        return self.columns[name]
+
+    def update_column(self, col, rows=None, sample=None):
+        """Ajoute les types d'une colonne (lot d'un chargement, ou lignes `rows`)."""
+        self.column(col.name).merge(_infer_column(col, rows, sample))
+
+    def merge(self, other):
+        for name, column in other.columns.items():
+            self.column(name).merge(column)
+        self.rows += other.rows
+        return self
+
+    def type_strs(self):
+        return {name: self.columns[name].type_str() for name in sorted(self.columns)}
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "exact": self.exact,
+            "columns": {name: self.columns[name].to_dict() for name in sorted(self.columns)},
+        }
+
+
+def _infer_column(col, rows=None, sample=None):
+    nulls = col.nulls if rows is None else col.nulls[rows]
+    null_count = int(np.count_nonzero(nulls))
+    if null_count == len(nulls):
+        return ColumnSchema(col.name, null_count=null_count)
+    if col.kind != ds.KIND_OBJECT:
+        # Colonne typée : un seul type possible, pas besoin de parcourir les lignes
+        return ColumnSchema(col.name, col.kind, {col.kind}, null_count=null_count)
+
+    result = ColumnSchema(col.name, null_count=null_count)
+
+    positions = np.flatnonzero(~nulls)
+    if sample is not None and len(positions) > sample:
+        # Échantillon reproductible, dans l'ordre des lignes
+        positions = np.sort(np.random.default_rng(0).choice(positions, sample, replace=False))
+        result.exact = False
+    values = col.values[positions] if rows is None else col.values[np.asarray(rows)[positions]]
+    if result.exact and my_parallel.enabled_for(len(values)):
+        types, result.sub_types = my_parallel.object_types(values)
+    else:
+        types, result.sub_types = object_types(values)
+    result.kinds, result.raw_types = {ds.KIND_OBJECT}, types
+    return result
+
+
+def _derive_column(full, col, rows, sample):
+    """Schéma d'une colonne sur `rows` à partir de celui du Dataset complet."""
+    if col.kind == ds.KIND_OBJECT and (len(full.types) > 1 or len(full.sub_types) > 1 or "list" in full.types):
+        # Plusieurs types possibles : seule une lecture des lignes retenues dit lesquels restent
+        return _infer_column(col, rows, sample)
+    null_count = int(np.count_nonzero(col.nulls[rows]))
+    if null_count == len(rows):
+        return ColumnSchema(full.name, null_count=null_count)
+    return ColumnSchema(full.name, col.kind, full.types, null_count=null_count, exact=full.exact)
+
+
+def remember(data, schema):
+    """Associe au Dataset un schéma déjà calculé (par exemple pendant son chargement)."""
+    with _LOCK:
+        _SCHEMAS.setdefault(data, {})[None] = schema
+
+
+def infer(data, rows=None, confidence=None):
+    """
+    Schéma du Dataset (ou des lignes `rows`), en une passe sur les colonnes hétérogènes.
+    Avec `confidence` (ex. 0.99), ces colonnes ne sont lues que sur un échantillon : un type présent
+    dans au moins SCHEMA_SAMPLE_MIN_FREQUENCY des lignes est vu avec cette probabilité.
+    Le schéma du Dataset complet est mis en cache ; celui d'une vue filtrée en est déduit.
+    """
+    data = ds.as_dataset(data)
+    sample = None if confidence is None else sample_size(confidence)
+    with _LOCK:
+        cached = _SCHEMAS.get(data, {})
+        full = cached.get(None) or cached.get(confidence)
+    if full is None:
+        full = Schema(rows=len(data))
+        for col in data.columns.values():
+            full.update_column(col, sample=sample)
+        with _LOCK:
+            _SCHEMAS.setdefault(data, {})[confidence] = full
+    if rows is None:
+        return full
+
+    rows = np.asarray(rows, dtype=np.int64)
+    result = Schema(rows=len(rows))
+    for name, column in full.columns.items():
+        result.columns[name] = _derive_column(column, data.column(name), rows, sample)
+    return result
@@ -0,0 +1,195 @@
+import math
+import hashlib
+
+import numpy as np
+
+from . import config
+
+# Résumés de taille fixe, fusionnables entre partitions :
+# - HyperLogLog : nombre de valeurs distinctes
+# - KLL : médiane et percentiles
+# - Heavy hitters : valeurs les plus fréquentes
+# Chaque résumé est dimensionné à partir d'une erreur cible (voir config).
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _splitmix64(x):
+    """Mélange 64 bits vectorisé (splitmix64), déterministe d'un process à l'autre."""
+    with np.errstate(over='ignore'):
+        x = x.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def hash_numbers(values):
+    """Hash 64 bits de valeurs numériques (1 et 1.0 ont le même hash)."""
+    floats = np.asarray(values, dtype=np.float64) + 0.0  # normalise -0.0
+    return _splitmix64(floats.view(np.uint64))
+
+
+def hash_strings(values):
+    """Hash 64 bits stable de chaînes (le hash() de Python change à chaque démarrage)."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(str(v).encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+         for v in values),
+        dtype=np.uint64, count=len(values)
+    )
+
+
+def combine_hashes(hashes, other):
+    """Hash 64 bits d'un couple de hashes (dépend de l'ordre), pour les clés sur plusieurs colonnes."""
+    return _splitmix64(np.asarray(hashes, dtype=np.uint64) ^ np.asarray(other, dtype=np.uint64))
+
+
+class HyperLogLog:
+    """Estimation du nombre de valeurs distinctes, erreur relative ~ 1.04 / sqrt(2^p)."""
+
+    def __init__(self, error=None):
+        error = error or config.STATS_DISTINCT_ERROR
+        self.p = min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18)
+        self.m = 1 << self.p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def update_hashes(self, hashes):
+        if not len(hashes): return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        w = (hashes << np.uint64(self.p)) & _MASK64
+        # Rang = position du premier bit à 1 (zéros de poids faible + 1), via le bit isolé w & -w
+        lowest = w & (~w + np.uint64(1))
+        rank = np.where(w == 0, 64 - self.p + 1, np.log2(lowest.astype(np.float64)).astype(np.int64) - self.p + 1)
+        np.maximum.at(self.registers, idx, rank.astype(np.uint8))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Petites cardinalités : comptage linéaire
+            return round(m * math.log(m / zeros))
+        return round(float(raw))
+
+
+class KLLSketch:
+    """
+    Résumé de quantiles KLL : des "compacteurs" par niveau, un élément du niveau h pèse 2^h.
+    Erreur de rang normalisée ~ 3.3 / k.
+    """
+
+    def __init__(self, error=None, seed=0):
+        error = error or config.STATS_QUANTILE_ERROR
+        self.k = max(int(math.ceil(3.3 / error)), 8)
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self.count = 0
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values): return
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                items = np.sort(items)
+                # Nombre pair d'éléments compactés : on garde un élément sur deux (au hasard pair/impair)
+                keep = items[:len(items) % 2]
+                pairs = items[len(items) % 2:]
+                promoted = pairs[self._rng.integers(2)::2]
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            level += 1
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def quantiles(self, qs):
+        if not self.count: return [None for _ in qs]
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 1 << level, dtype=np.int64)
+                                  for level, items in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        values, cumulative = values[order], np.cumsum(weights[order])
+        total = cumulative[-1]
+        result = []
+        for q in qs:
+            pos = int(np.searchsorted(cumulative, q * total, side="left"))
+            result.append(float(values[min(pos, len(values) - 1)]))
+        return result
+
+
+class HeavyHitters:
+    """
+    Valeurs les plus fréquentes (résumé de type Space-Saving / Misra-Gries, fusionnable).
+    On garde au plus `capacity` compteurs ; chaque compte est sous-estimé d'au plus `error`.
+    """
+
+    def __init__(self, error=None):
+        error = error or config.STATS_TOP_K_ERROR
+        self.capacity = max(int(math.ceil(1 / error)), config.STATS_TOP_K)
+        self.counters = {}
+        self.total = 0
+        self.error = 0
+
+    def update_counts(self, items, counts):
+        """Ajoute des valeurs déjà comptées (ex : bincount sur les codes d'une colonne str)."""
+        counts = np.asarray(counts, dtype=np.int64)
+        if not len(counts): return
+        self.total += int(counts.sum())
+
+        # On ne fusionne que les meilleurs candidats du lot
+        if len(counts) > self.capacity:
+            top = np.argpartition(-counts, self.capacity)[:self.capacity + 1]
+            top = top[np.argsort(-counts[top], kind="stable")]
+            self.error += int(counts[top[-1]])
+            top = top[:-1]
+        else:
+            top = np.arange(len(counts))
+        for i in top:
+            item = items[i]
+            self.counters[item] = self.counters.get(item, 0) + int(counts[i])
+        self._truncate()
+
+    def update(self, values):
+        items, counts = np.unique(np.asarray(values, dtype=object), return_counts=True)
+        self.update_counts(items.tolist(), counts)
+
+    def merge(self, other):
+        self.total += other.total
+        self.error += other.error
+        for item, count in other.counters.items():
+            self.counters[item] = self.counters.get(item, 0) + count
+        self._truncate()
+
+    def _truncate(self):
+        if len(self.counters) <= self.capacity: return
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1], reverse=True)
+        self.error += ranked[self.capacity][1]
+        self.counters = dict(ranked[:self.capacity])
+
+    def top(self, k=None):
+        k = k or config.STATS_TOP_K
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1], reverse=True)[:k]
+        return [{'value': item, 'count': count} for item, count in ranked]
@@ -1,8 +1,278 @@
-def sort_data(data, field, reverse=False):
-    if not data:
+import os
+import json
+import uuid
+import heapq
+import shutil
+import itertools
+from collections import namedtuple
+
+import numpy as np
+
+from . import config
+from . import dataset as ds
+from . import jobs
+from . import metrics as my_metrics
+from . import utils
+
+# Clé de tri : colonne, sens, position des nulls (et des lignes où la clé n'existe pas)
+SortKey = namedtuple("SortKey", ["field", "reverse", "nulls_first"], defaults=[False, False])
+
+# Colonnes hétérogènes : on trie d'abord par type, puis par valeur à l'intérieur d'un type
+_TYPE_RANKS = {bool: 0, int: 1, float: 1, str: 2}
+_OTHER_RANK = 3  # listes, dicts... comparés par leur texte JSON
+
+
+def normalize_keys(keys, reverse=False):
+    """
+    Liste de SortKey à partir d'un nom de colonne, d'une SortKey, d'un dict {field, reverse, nulls}
+    ou d'une liste de ces éléments. ValueError si la spécification est invalide.
+    """
+    if keys is None:
         return []
-    
+    if isinstance(keys, (str, SortKey, dict)):
+        keys = [keys]
+    result = []
+    for key in keys:
+        if isinstance(key, SortKey):
+            result.append(key)
+        elif isinstance(key, str):
+            result.append(SortKey(key, reverse))
+        elif isinstance(key, dict) and isinstance(key.get("field"), str):
+            nulls = key.get("nulls", "last")
+            if nulls not in ("first", "last"):
+                raise ValueError(f"nulls doit valoir 'first' ou 'last' (colonne {key['field']})")
+            result.append(SortKey(key["field"], utils.is_true(key.get("reverse", False)), nulls == "first"))
+        else:
+            raise ValueError("Chaque clé de tri doit être un nom de colonne ou un objet {field, reverse, nulls}")
+    return result
+
+
+def describe_keys(keys):
+    return [{"field": k.field, "reverse": k.reverse, "nulls": "first" if k.nulls_first else "last"} for k in keys]
+
+
+def _object_key(v):
+    rank = _TYPE_RANKS.get(type(v))
+    if rank is None:
+        return (_OTHER_RANK, json.dumps(v, sort_keys=True, default=str))
+    return (rank, v)
+
+
+def object_ranks(values, nulls):
+    """
+    Rangs denses (int64) des valeurs d'une colonne hétérogène : ordre par type
+    (bool < nombre < texte < autres), puis par valeur. Les valeurs égales ont le même rang.
+    """
+    keys = [None if null else _object_key(v) for v, null in zip(values, nulls)]
+    distinct = sorted({k for k in keys if k is not None})
+    position = {k: i for i, k in enumerate(distinct)}
+    return np.fromiter((0 if k is None else position[k] for k in keys), dtype=np.int64, count=len(keys))
+
+
+def _value_key(col, rows, reverse, ranks=None):
+    """Clé numérique de tri d'une colonne sur les lignes `rows` (l'ordre des codes str suit le dictionnaire trié)."""
+    if col.kind == ds.KIND_OBJECT:
+        keys = ranks[rows] if ranks is not None else object_ranks(col.values[rows], col.nulls[rows])
+    else:
+        keys = col.values[rows]
+        if col.kind in (ds.KIND_BOOL, ds.KIND_STR):
+            keys = keys.astype(np.int64)
+    if not reverse:
+        return keys
+    # ~x inverse l'ordre des entiers sans débordement (contrairement à -x sur le minimum int64)
+    return -keys if keys.dtype.kind == "f" else ~keys
+
+
+def _flagged_keys(col, rows, key, ranks=None, always=False):
+    """
+    Clés d'une colonne de tri : drapeau "null", drapeau "NaN" (colonnes float) puis la clé de valeur.
+    NaN a son propre drapeau (après les nombres, avant les nulls en fin de tri) : les clés de valeur
+    n'en contiennent jamais, ce qui donne un ordre total à np.partition, aux comparaisons et à heapq.merge.
+    Sans `always`, un drapeau n'est ajouté que s'il est utile sur ces lignes.
+    """
+    arrays = []
+    nulls = col.nulls[rows]
+    if always or nulls.any():
+        # False avant True : les nulls à la fin, sauf nulls_first
+        arrays.append(~nulls if key.nulls_first else nulls)
+    values = _value_key(col, rows, key.reverse, ranks)
+    if values.dtype.kind == "f":
+        nans = np.isnan(values) & ~nulls
+        if always or nans.any():
+            arrays.append(nans)
+        nulls = nulls | nans
+    if nulls.any():
+        values = np.where(nulls, np.zeros(1, dtype=values.dtype), values)
+    arrays.append(values)
+    return arrays
+
+
+def _key_arrays(data, keys, rows, ranks=None):
+    """Tableaux de clés de tri, du plus prioritaire au moins prioritaire (voir _flagged_keys)."""
+    arrays = []
+    for key in keys:
+        field_ranks = None if ranks is None else ranks.get(key.field)
+        arrays.extend(_flagged_keys(data.column(key.field), rows, key, field_ranks))
+    return arrays
+
+
+def _select(arrays, positions, k):
+    """
+    Positions (parmi `positions`, croissantes) des k premières lignes selon les clés, dans le désordre.
+    Sélection sur la première clé (np.partition), puis départage des ex aequo par les clés suivantes.
+    """
+    if k <= 0:
+        return positions[:0]
+    if k >= len(positions):
+        return positions
+    if not arrays:
+        return positions[:k]  # ex aequo sur toutes les clés : ordre d'origine
+    keys = arrays[0][positions]
+    kth = np.partition(keys, k - 1)[k - 1]
+    less = positions[keys < kth]
+    ties = positions[keys == kth]
+    return np.concatenate([less, _select(arrays[1:], ties, k - len(less))])
+
+
+def _lexsort(arrays, limit=None):
+    """
+    Permutation (stable) qui trie selon plusieurs clés ; avec `limit`, seul le top-k est trié,
+    après une sélection qui élimine les lignes qui ne peuvent pas en faire partie.
+    """
+    positions = None
+    if limit is not None and limit < len(arrays[0]):
+        positions = np.sort(_select(arrays, np.arange(len(arrays[0])), limit))
+        arrays = [a[positions] for a in arrays]
+    if len(arrays) == 1:
+        order = np.argsort(arrays[0], kind="stable")
+    else:
+        # np.lexsort trie d'abord sur la dernière clé passée, et il est stable
+        order = np.lexsort(arrays[::-1])
+    order = order[:limit]
+    return order if positions is None else positions[order]
+
+
+def sort_indices(data, keys, reverse=False, rows=None, limit=None):
+    """
+    Renvoie la permutation des lignes triées (argsort : les données ne sont pas copiées).
+    - keys : colonne ou liste de clés (voir normalize_keys) ; `reverse` s'applique aux noms de colonnes seuls
+    - rows : lignes candidates (par défaut toutes)
+    - limit : ne renvoie que les `limit` premières (top-k, sans trier tout le reste)
+    Les colonnes inconnues sont ignorées ; les colonnes hétérogènes sont triées par type puis par valeur.
+    Au-delà de SORT_MEMORY_BUDGET, le tri complet se fait par morceaux sur disque (tri fusion externe).
+    """
+    data = ds.as_dataset(data)
+    if rows is None:
+        rows = np.arange(len(data))
+    rows = np.asarray(rows, dtype=np.int64)
+
+    with my_metrics.phase("sort", rows=len(rows)):
+        keys = [k for k in normalize_keys(keys, reverse) if data.column(k.field) is not None]
+        if not keys:
+            return rows[:limit]
+
+        if limit is None and config.SORT_MEMORY_BUDGET and _key_bytes(keys) * len(rows) > config.SORT_MEMORY_BUDGET:
+            return external_sort(data, keys, rows)
+
+        return rows[_lexsort(_key_arrays(data, keys, rows), limit)]
+
+
+def rows_after(data, keys, rows, after, limit, reverse=False):
+    """
+    Pagination par curseur : les `limit` lignes qui suivent la ligne `after` dans l'ordre du tri.
+    On ne garde que les lignes dont la clé (clés de tri..., n° de ligne) est plus grande, puis top-k :
+    le coût ne dépend pas de la position de la page dans le résultat.
+    """
+    data = ds.as_dataset(data)
+    rows = np.asarray(rows, dtype=np.int64)
+    with my_metrics.phase("sort", rows=len(rows)):
+        keys = [k for k in normalize_keys(keys, reverse) if data.column(k.field) is not None]
+        if not keys:
+            return rows[rows > after][:limit]
+
+        # La ligne `after` est ajoutée en dernier pour partager les mêmes rangs (colonnes hétérogènes)
+        arrays = _key_arrays(data, keys, np.append(rows, after))
+        greater = np.zeros(len(rows), dtype=bool)
+        equal = np.ones(len(rows), dtype=bool)
+        for array in arrays:
+            values, pivot = array[:-1], array[-1]
+            greater |= equal & (values > pivot)
+            equal &= values == pivot
+        greater |= equal & (rows > after)
+
+        kept = np.flatnonzero(greater)
+        return rows[kept[_lexsort([a[:-1][kept] for a in arrays], limit)]]
+
+
+# --- Tri externe ---
+
+def _key_bytes(keys):
+    """Mémoire par ligne d'un tri : drapeaux null / NaN + clé de valeur par colonne, n° de ligne, permutation."""
+    return 10 * len(keys) + 16
+
+
+def external_sort(data, keys, rows, run_size=None):
+    """
+    Tri fusion externe : chaque morceau de `run_size` lignes est trié en mémoire puis écrit sur disque
+    (clés + n° de ligne), et les morceaux sont fusionnés par un tas (heapq.merge) en les relisant en mmap.
+    Seules les clés d'un morceau et la permutation finale sont en mémoire.
+    """
+    keys = [k for k in normalize_keys(keys) if data.column(k.field) is not None]
+    if run_size is None:
+        run_size = max(config.SORT_MEMORY_BUDGET // _key_bytes(keys), 1)
+    # Les rangs des colonnes hétérogènes doivent être communs à tous les morceaux
+    ranks = {}
+    for key in keys:
+        col = data.column(key.field)
+        if col.kind == ds.KIND_OBJECT and key.field not in ranks:
+            ranks[key.field] = object_ranks(col.values, col.nulls)
+
+    directory = os.path.join(config.TMP_DIR, "sort", uuid.uuid4().hex)
+    os.makedirs(directory)
     try:
-        return sorted(data, key=lambda x: x.get(field, 0), reverse=reverse)
-    except:
-        return data
\ No newline at end of file
+        runs = []
+        for start in range(0, len(rows), run_size):
+            chunk = rows[start:start + run_size]
+            # Toutes les clés sont présentes dans chaque morceau (drapeaux null compris) pour la fusion
+            fields = _run_fields(data, keys, chunk, ranks)
+            order = _lexsort(fields)
+            run = np.rec.fromarrays([f[order] for f in fields] + [chunk[order]])
+            path = os.path.join(directory, f"{len(runs)}.npy")
+            np.save(path, run)
+            runs.append(path)
+            jobs.checkpoint(rows=start + len(chunk))
+
+        result = np.empty(len(rows), dtype=np.int64)
+        merged = heapq.merge(*(_iter_run(path) for path in runs))
+        position = 0
+        while True:
+            block = list(itertools.islice(merged, config.DATASET_BATCH_SIZE))
+            if not block: break
+            result[position:position + len(block)] = [item[-1] for item in block]
+            position += len(block)
+            jobs.checkpoint(rows=position)
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _run_fields(data, keys, rows, ranks):
+    """Clés de tri d'un morceau, toujours avec les drapeaux : même structure pour tous les morceaux."""
+    fields = []
+    for key in keys:
+        fields.extend(_flagged_keys(data.column(key.field), rows, key, ranks.get(key.field), always=True))
+    return fields
+
+
+def _iter_run(path):
+    run = np.load(path, mmap_mode="r")
+    for start in range(0, len(run), config.DATASET_BATCH_SIZE):
+        yield from run[start:start + config.DATASET_BATCH_SIZE].tolist()
+
+
+def sort_data(data, keys, reverse=False):
+    data = ds.as_dataset(data)
+    if not data:
+        return ds.Dataset()
+
+    return data.take(sort_indices(data, keys, reverse))
@@ -0,0 +1,205 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+from . import config
+from . import index as my_index
+from . import parallel as my_parallel
+from . import query as my_query
+
+
+class Workspace:
+    """Espace de travail d'un utilisateur : le fichier chargé et la vue courante."""
+
+    def __init__(self, handle, path, base, key=None, partial=False, job=None):
+        self.handle = handle
+        self.path = path
+        self.key = key
+        self.base = base                      # Dataset chargé (immuable, éventuellement partagé)
+        self.query = my_query.Query(base, fingerprint=key)  # Vue courante (filtres / tri, évalués à la demande)
+        self.partial = partial                # base = début du fichier, la lecture continue en arrière-plan
+        self.job = job                        # job de chargement en cours (si partial)
+        self.last_access = time.monotonic()
+
+    def touch(self):
+        self.last_access = time.monotonic()
+
+    def reset(self):
+        self.query = my_query.Query(self.base, fingerprint=self.key)
+
+    @property
+    def data(self):
+        """Vue courante matérialisée."""
+        return self.query.materialize()
+
+    @property
+    def nbytes(self):
+        """Mémoire propre à cet espace (la base partagée est comptée à part)."""
+        return self.query.nbytes
+
+
+def file_key(path):
+    """Identifie une version d'un fichier : chemin réel, date de modification et taille."""
+    st = os.stat(path)
+    return (os.path.realpath(path), st.st_mtime_ns, st.st_size)
+
+
+def new_handle():
+    return uuid.uuid4().hex
+
+
+class WorkspaceManager:
+    """
+    Gère les espaces de travail par session / handle.
+    - budget mémoire : on évince les espaces les moins récemment utilisés (LRU)
+    - TTL : les espaces inactifs trop longtemps sont supprimés
+    - les sessions qui ouvrent le même fichier partagent le même Dataset de base
+    """
+
+    def __init__(self, memory_budget=None, ttl=None, share_base=None):
+        self.memory_budget = memory_budget if memory_budget is not None else config.WORKSPACE_MEMORY_BUDGET
+        self.ttl = ttl if ttl is not None else config.WORKSPACE_TTL
+        self.share_base = share_base if share_base is not None else config.WORKSPACE_SHARE_BASE
+
+        self._lock = threading.RLock()
+        self._workspaces = OrderedDict()  # handle -> Workspace, du plus ancien au plus récent
+        self._bases = {}                  # file_key -> Dataset
+        self._loading = {}                # file_key -> Lock (évite de parser deux fois le même fichier)
+
+    def __len__(self):
+        return len(self._workspaces)
+
+    def get(self, handle):
+        """Renvoie l'espace associé au handle (ou None s'il a expiré / n'existe pas)."""
+        with self._lock:
+            self._expire()
+            ws = self._workspaces.get(handle)
+            if ws is not None:
+                ws.touch()
+                self._workspaces.move_to_end(handle)
+            return ws
+
+    def open(self, handle, path, loader, variant=None):
+        """
+        Charge `path` dans l'espace `handle` (en réutilisant la base partagée si possible).
+        `variant` distingue les chargements partiels d'un même fichier (colonnes / filtres à la lecture).
+        """
+        key = file_key(path) if variant is None else (*file_key(path), variant)
+
+        def register(base):
+            # Appelé sous le verrou global, avec la publication de la base : elle ne peut pas être
+            # libérée (index invalidés) avant que cet espace ne l'utilise
+            ws = Workspace(handle, path, base, key=key)
+            previous = self._workspaces.get(handle)
+            if previous is not None and previous.partial and previous.path == path:
+                # Fin d'un chargement progressif : on garde les filtres et le tri posés entre-temps
+                ws.query = my_query.Query(base, predicates=previous.query.predicates, sort=previous.query.sort,
+                                          fingerprint=key)
+            self._workspaces[handle] = ws
+            self._workspaces.move_to_end(handle)
+            self._release_unused_bases()
+            self._enforce_budget(keep=handle)
+            return ws
+
+        return self._get_base(key, path, loader, register)
+
+    def open_partial(self, handle, path, base, job=None):
+        """
+        Espace provisoire sur le début du fichier (premier lot lu) pendant que `job` continue le chargement.
+        open() le remplacera par le fichier complet.
+        """
+        with self._lock:
+            ws = Workspace(handle, path, base, partial=True, job=job)
+            self._workspaces[handle] = ws
+            self._workspaces.move_to_end(handle)
+            self._enforce_budget(keep=handle)
+            return ws
+
+    def drop_partial(self, handle, job):
+        """Retire l'espace provisoire laissé par un chargement progressif qui a échoué ou été annulé."""
+        with self._lock:
+            ws = self._workspaces.get(handle)
+            if ws is not None and ws.partial and ws.job is job:
+                self.drop(handle)
+
+    def update(self, handle):
+        """À appeler après avoir modifié la vue d'un espace, pour revérifier le budget mémoire."""
+        with self._lock:
+            self._enforce_budget(keep=handle)
+
+    def drop(self, handle):
+        with self._lock:
+            self._workspaces.pop(handle, None)
+            self._release_unused_bases()
+
+    @property
+    def memory_usage(self):
+        with self._lock:
+            return self._memory_usage()
+
+    def _get_base(self, key, path, loader, register):
+        """
+        Base de `key` (partagée, ou chargée par `loader`), passée à register(base) sous le verrou global,
+        dans la même section critique que sa publication. Renvoie le résultat de register.
+        """
+        if not self.share_base:
+            base = loader(path)
+            with self._lock:
+                return register(base)
+
+        with self._lock:
+            if key in self._bases:
+                return register(self._bases[key])
+            lock = self._loading.setdefault(key, threading.Lock())
+
+        # Le parsing se fait hors du verrou global : les autres sessions ne sont pas bloquées
+        try:
+            with lock:
+                with self._lock:
+                    if key in self._bases:
+                        return register(self._bases[key])
+                base = loader(path)
+                with self._lock:
+                    self._bases[key] = base
+                    return register(base)
+        finally:
+            # Y compris si le loader a échoué : un prochain essai repartira d'un nouveau verrou
+            with self._lock:
+                if self._loading.get(key) is lock:
+                    del self._loading[key]
+
+    def _memory_usage(self):
+        # Un Dataset compte avec ses index et ses colonnes copiées en mémoire partagée pour les workers
+        def usage(ds):
+            return ds.nbytes + my_index.nbytes(ds) + my_parallel.nbytes(ds)
+
+        shared = {id(ds): usage(ds) for ds in self._bases.values()}
+        for ws in self._workspaces.values():
+            shared.setdefault(id(ws.base), usage(ws.base))
+        return sum(shared.values()) + sum(ws.nbytes for ws in self._workspaces.values())
+
+    def _expire(self):
+        if not self.ttl: return
+        limit = time.monotonic() - self.ttl
+        expired = [h for h, ws in self._workspaces.items() if ws.last_access < limit]
+        for handle in expired:
+            del self._workspaces[handle]
+        if expired:
+            self._release_unused_bases()
+
+    def _release_unused_bases(self):
+        used = {ws.key for ws in self._workspaces.values()}
+        for key in [k for k in self._bases if k not in used]:
+            my_index.invalidate(self._bases.pop(key))
+
+    def _enforce_budget(self, keep=None):
+        self._expire()
+        if not self.memory_budget: return
+        # On évince les espaces inactifs les plus anciens, sans toucher à celui en cours
+        for handle in list(self._workspaces):
+            if self._memory_usage() <= self.memory_budget: break
+            if handle == keep: continue
+            del self._workspaces[handle]
+            self._release_unused_bases()
@@ -1,3 +1,1463 @@
-from django.test import TestCase
+import csv
+import glob
+import gzip
+import importlib.util
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from datafilter.modules import config
+from datafilter.modules import dataset as ds
+from datafilter.modules import file_manager as fm
+from datafilter.modules import jobs as my_jobs
+from datafilter.modules import sort as my_sort
+
+from datafilter import views
+
+
+NAN = float("nan")
+
+
+class TmpDirMixin:
+    """Fichiers temporaires (tri externe, caches, spill) dans un dossier propre à chaque test."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+        patcher = mock.patch.object(config, "TMP_DIR", self.tmp_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _number(value):
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return None
+
+
+def baseline_csv(path):
+    """Lecture CSV d'origine : chaque cellule décodée en JSON si possible, sinon gardée comme texte."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = [row for row in csv.DictReader(f)]
+    for row in data:
+        for k, v in row.items():
+            try:
+                if v: row[k] = json.loads(v.strip())
+            except (json.JSONDecodeError, TypeError):
+                row[k] = v.strip() if v else ""
+    return data
+
+
+def baseline_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def data_files(extension):
+    return sorted(glob.glob(os.path.join(config.DATA_DIR, f"*{extension}")))
+
+
+class DatasetTests(SimpleTestCase):
+    RECORDS = [
+        {"n": 1, "f": 1.5, "b": True, "s": "b", "l": [1, 2], "m": 1},
+        {"n": None, "f": 2.0, "b": False, "s": "a", "l": [], "m": "x"},
+        {"f": None, "s": None, "l": None, "m": {"k": 1}},
+        {"n": 3, "b": None, "s": "b", "m": None, "extra": 0},
+    ]
+
+    def test_records_round_trip_with_missing_keys(self):
+        data = ds.Dataset.from_records(self.RECORDS)
+        self.assertEqual(len(data), 4)
+        self.assertEqual(data.to_records(), self.RECORDS)
+
+    def test_column_kinds(self):
+        data = ds.Dataset.from_records(self.RECORDS)
+        kinds = {name: col.kind for name, col in data.columns.items()}
+        self.assertEqual(kinds, {"n": ds.KIND_INT, "f": ds.KIND_FLOAT, "b": ds.KIND_BOOL, "s": ds.KIND_STR,
+                                 "l": ds.KIND_OBJECT, "m": ds.KIND_OBJECT, "extra": ds.KIND_INT})
+        s = data.column("s")
+        self.assertEqual(s.dictionary.tolist(), ["a", "b"])
+        self.assertEqual(s.nulls.tolist(), [False, False, True, False])
+        self.assertEqual(data.column("n").missing.tolist(), [False, False, True, False])
+
+    def test_take_reorders_rows(self):
+        data = ds.Dataset.from_records(self.RECORDS)
+        self.assertEqual(data.take([3, 0]).to_records(), [self.RECORDS[3], self.RECORDS[0]])
+        self.assertEqual(data.to_records([2, 1]), [self.RECORDS[2], self.RECORDS[1]])
+
+
+class LoaderTests(TmpDirMixin, SimpleTestCase):
+
+    def test_csv_matches_baseline(self):
+        for path in data_files(".csv"):
+            with self.subTest(path=os.path.basename(path)):
+                self.assertEqual(fm.load_data(path).to_records(), baseline_csv(path))
+
+    def test_json_matches_baseline(self):
+        for path in data_files(".json"):
+            with self.subTest(path=os.path.basename(path)):
+                self.assertEqual(fm.load_data(path).to_records(), baseline_json(path))
+
+    def test_yaml_matches_json(self):
+        import yaml
+        for source in data_files(".json"):
+            with self.subTest(path=os.path.basename(source)):
+                records = baseline_json(source)
+                path = os.path.join(self.tmp_dir, os.path.basename(source)[:-5] + ".yml")
+                with open(path, "w", encoding="utf-8") as f:
+                    yaml.safe_dump(records, f, allow_unicode=True)
+                self.assertEqual(fm.load_data(path).to_records(), records)
+
+    def test_xml_records(self):
+        path = os.path.join(self.tmp_dir, "a.xml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("<records>"
+                    "<record id=\"1\"><name>Alice</name><age>22</age><ok>true</ok><tag>a</tag><tag>b</tag></record>"
+                    "<record id=\"2\"><name>Bob</name><score>1.5</score></record>"
+                    "</records>")
+        self.assertEqual(fm.load_data(path).to_records(), [
+            {"id": 1, "name": "Alice", "age": 22, "ok": True, "tag": ["a", "b"]},
+            {"id": 2, "name": "Bob", "score": 1.5},
+        ])
+
+    def test_reload_from_dataset_cache(self):
+        for path in data_files(".csv"):
+            with self.subTest(path=os.path.basename(path)):
+                first = fm.load_data(path).to_records()
+                with mock.patch.object(fm.fcsv, "load", side_effect=AssertionError("fichier relu")):
+                    self.assertEqual(fm.load_data(path).to_records(), first)
+
+
+class WorkspaceTests(TmpDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        from datafilter.modules import workspace as my_workspace
+        self.manager = my_workspace.WorkspaceManager(memory_budget=0, ttl=0, share_base=True)
+        self.path = os.path.join(self.tmp_dir, "a.csv")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("x\n1\n")
+
+    def loader(self, path):
+        return ds.Dataset.from_records([{"x": 1}])
+
+    def test_failed_load_releases_the_loading_lock(self):
+        def failing(path):
+            raise ValueError("fichier illisible")
+        with self.assertRaises(ValueError):
+            self.manager.open("a", self.path, failing)
+        self.assertEqual(self.manager._loading, {})
+        ws = self.manager.open("a", self.path, self.loader)
+        self.assertEqual(ws.query.count(), 1)
+        self.assertEqual(self.manager._loading, {})
+
+    def test_sessions_share_the_base_until_the_last_one_is_dropped(self):
+        a = self.manager.open("a", self.path, self.loader)
+        b = self.manager.open("b", self.path, mock.Mock(side_effect=AssertionError("fichier relu")))
+        self.assertIs(a.base, b.base)
+        self.manager.drop("a")
+        self.assertEqual(len(self.manager._bases), 1)
+        self.manager.drop("b")
+        self.assertEqual(self.manager._bases, {})
+
+    def test_memory_usage_counts_columns_shared_with_workers(self):
+        from datafilter.modules import parallel as my_parallel
+        ws = self.manager.open("a", self.path, self.loader)
+        before = self.manager.memory_usage
+        shared = my_parallel.shared_columns(ws.base)
+        shared.task_spec(ws.base, ["x"], 0, 1)
+        self.assertGreater(shared.nbytes, 0)
+        self.assertEqual(self.manager.memory_usage, before + shared.nbytes)
+
+    def test_memory_budget_evicts_the_least_recently_used(self):
+        from datafilter.modules import workspace as my_workspace
+        other = os.path.join(self.tmp_dir, "b.csv")
+        with open(other, "w", encoding="utf-8") as f:
+            f.write("x\n2\n")
+        manager = my_workspace.WorkspaceManager(memory_budget=1, ttl=0, share_base=True)
+        manager.open("a", self.path, self.loader)
+        manager.open("b", other, self.loader)
+        # Le budget ne tient pas : l'espace le plus ancien est évincé, jamais celui qu'on vient d'ouvrir
+        self.assertIsNone(manager.get("a"))
+        self.assertIsNotNone(manager.get("b"))
+        self.assertEqual(len(manager._bases), 1)
+
+
+class QueryTests(SimpleTestCase):
+    def setUp(self):
+        from datafilter.modules import query as my_query
+        self.records = [{"n": (i * 37) % 101, "s": ["a", "b", "c"][i % 3]} for i in range(101)]
+        self.data = ds.Dataset.from_records(self.records)
+        self.query = my_query.Query(self.data)
+
+    def test_filters_and_sort_match_reference(self):
+        self.query.add_filter("n", 20, ">")
+        self.query.add_filter("s", "B", "=")
+        self.query.set_sort("n", True)
+        expected = sorted((r for r in self.records if r["n"] > 20 and r["s"] == "b"), key=lambda r: -r["n"])
+        self.assertEqual(self.query.count(), len(expected))
+        self.assertEqual(self.query.page(0, None), expected)
+        self.assertEqual(self.query.page(3, 4), expected[3:7])
+
+    def test_remove_filter_keeps_the_base(self):
+        first = self.query.add_filter("n", 50, "<")
+        self.query.add_filter("s", "a", "=")
+        self.query.remove_filter(first.id)
+        self.assertEqual(self.query.page(0, None), [r for r in self.records if r["s"] == "a"])
+        self.assertEqual(self.data.to_records(), self.records)
+        with self.assertRaises(KeyError):
+            self.query.remove_filter(first.id)
+
+
+class FilterIndexTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        records = []
+        for i in range(600):
+            record = {"n": int(rng.integers(-20, 20)), "s": ["Paris", "lyon", "LYON", None][i % 4]}
+            if i % 5:
+                record["f"] = float(rng.integers(10)) / 2 if i % 9 else None
+            record["mixed"] = [1, "1", 2.5, None, [1]][i % 5]
+            records.append(record)
+        self.data = ds.Dataset.from_records(records)
+        self.records = records
+
+    def filter_rows(self, field, value, operator, rows=None, index=True):
+        from datafilter.modules import filter as my_filter
+        from datafilter.modules import index as my_index
+        self.addCleanup(my_index.invalidate, self.data)
+        with mock.patch.object(config, "INDEX_ENABLED", index), mock.patch.object(config, "INDEX_MIN_ROWS", 0):
+            return my_filter.filter_rows(self.data, field, value, operator, rows=rows).tolist()
+
+    def cases(self):
+        yield "n", 3, "="
+        yield "n", "3", "="
+        yield "n", 0, ">"
+        yield "n", -5.5, "<"
+        yield "s", "lyon", "="
+        yield "s", "None", "="
+        yield "f", 2.5, "="
+        yield "f", 1, ">"
+        yield "f", 3, "<"
+        yield "f", "none", "="
+        yield "mixed", 1, "="
+        yield "mixed", 2, "<"
+        yield "n", "abc", ">"
+
+    def test_index_matches_scan(self):
+        from datafilter.modules import index as my_index
+        for field, value, operator in self.cases():
+            with self.subTest(field=field, value=value, operator=operator):
+                scan = self.filter_rows(field, value, operator, index=False)
+                self.assertEqual(self.filter_rows(field, value, operator), scan)
+        for field, operator in (("n", "="), ("n", ">"), ("s", "="), ("f", "<")):
+            self.assertTrue(my_index.has_index(self.data, field, operator), (field, operator))
+
+    def test_index_matches_scan_on_a_selection(self):
+        rows = np.arange(0, len(self.data), 7)
+        for field, value, operator in self.cases():
+            with self.subTest(field=field, value=value, operator=operator):
+                self.filter_rows(field, value, operator)  # index construit
+                self.assertEqual(self.filter_rows(field, value, operator, rows=rows),
+                                 self.filter_rows(field, value, operator, rows=rows, index=False))
+
+    def test_nan_is_outside_every_range(self):
+        from datafilter.modules import filter as my_filter
+        from datafilter.modules import index as my_index
+        # "f" : colonne float, "o" : colonne hétérogène ; la ligne 2 vaut NaN dans les deux
+        data = ds.Dataset.from_records([
+            {"f": 1.0, "o": 1}, {"f": 2.0, "o": "a"}, {"f": NAN, "o": NAN}, {"f": None, "o": None}, {"f": 3.0, "o": 3.0},
+        ])
+        self.addCleanup(my_index.invalidate, data)
+        for field in ("f", "o"):
+            for value, operator in ((1.5, ">"), (2.5, "<"), (-1, ">"), (10, "<")):
+                with self.subTest(field=field, value=value, operator=operator):
+                    with mock.patch.object(config, "INDEX_ENABLED", False):
+                        scan = my_filter.filter_rows(data, field, value, operator).tolist()
+                    with mock.patch.object(config, "INDEX_MIN_ROWS", 0):
+                        indexed = my_filter.filter_rows(data, field, value, operator).tolist()
+                    self.assertEqual(indexed, scan)
+                    self.assertNotIn(2, indexed)
+            self.assertTrue(my_index.has_index(data, field, ">"))
+
+    def test_scan_matches_python_reference(self):
+        def expected(field, value, operator):
+            rows = []
+            for i, record in enumerate(self.records):
+                if field not in record:
+                    continue
+                v = record[field]
+                if operator == "=":
+                    ok = str(v).lower() == str(value).lower() or _is_number(v) and _number(value) == v
+                else:
+                    ok = _is_number(v) and _is_number(value) and (v > value if operator == ">" else v < value)
+                if ok:
+                    rows.append(i)
+            return rows
+
+        for field, value, operator in self.cases():
+            with self.subTest(field=field, value=value, operator=operator):
+                self.assertEqual(self.filter_rows(field, value, operator, index=False),
+                                 expected(field, value, operator))
+
+
+class CsvTests(TmpDirMixin, SimpleTestCase):
+    TEXT = (
+        "id,n,ok,name,tags\n"
+        "1,10,true,Alice,\"[1, 2]\"\n"
+        "2,,false, Bob ,[]\n"
+        "3,1.5,maybe,\"{\"\"a\"\": 1}\",x\n"
+        "\n"
+        "4,abc,true,12,\"[\"\"a\"\"]\"\n"
+        "5,-7,,null\n"
+        "6,2e3,false,\"O'Neil\",\"{\"\"b\"\": [true]}\"\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp_dir, "a.csv")
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(self.TEXT)
+
+    def test_chunks_match_baseline(self):
+        from datafilter.modules.formats import fcsv
+        expected = baseline_csv(self.path)
+        # Types devinés sur les deux premières lignes, puis démentis dans les blocs suivants
+        with mock.patch.object(config, "CSV_SAMPLE_ROWS", 2):
+            for chunk_size in (1, 2, 3, 100):
+                with self.subTest(chunk_size=chunk_size):
+                    fcsv._INFERENCE_CACHE.clear()
+                    self.assertEqual(fcsv.load(self.path, chunk_size=chunk_size).to_records(), expected)
+
+    def test_inferred_types_are_reused_for_the_same_file_version(self):
+        from datafilter.modules.formats import fcsv
+        fcsv._INFERENCE_CACHE.clear()
+        first = fcsv.load(self.path).to_records()
+        with mock.patch.object(fcsv, "infer_converters", side_effect=AssertionError("types redevinés")):
+            self.assertEqual(fcsv.load(self.path).to_records(), first)
+
+
+class StatsMergeTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.records = [
+            {"n": int(rng.integers(100)), "f": float(rng.normal()) if i % 6 else None,
+             "s": f"v{rng.integers(8)}", "b": bool(i % 3), "l": [0] * (i % 4),
+             **({"mixed": [1, "a", 2.5][i % 3]} if i % 4 else {})}
+            for i in range(300)
+        ]
+        self.data = ds.Dataset.from_records(self.records)
+
+    def normalized(self, value):
+        """Rapport comparable : flottants arrondis, valeurs fréquentes à égalité dans un ordre fixe."""
+        if isinstance(value, dict):
+            return {k: self.normalized(v) for k, v in value.items()}
+        if isinstance(value, list):
+            items = [self.normalized(v) for v in value]
+            if items and all(isinstance(v, dict) and set(v) == {"value", "count"} for v in items):
+                items.sort(key=lambda v: (-v["count"], str(v["value"])))
+            return items
+        if isinstance(value, float):
+            return round(value, 9)
+        return value
+
+    def test_report_matches_python_reference(self):
+        from datafilter.modules import accumulators as acc
+        report = acc.StatsAccumulator().update(self.data).report()
+        for field in ("n", "f", "b", "mixed"):
+            values = [r[field] for r in self.records if r.get(field) is not None]
+            numbers = [v for v in values if _is_number(v)]
+            with self.subTest(field=field):
+                self.assertEqual(report[field]["non_null_count"], len(values))
+                self.assertEqual(report[field]["null_count"], len(self.records) - len(values))
+                if numbers:
+                    stats = report[field]["type_stats"]["number"]
+                    self.assertEqual((stats["count"], stats["min"], stats["max"]),
+                                     (len(numbers), min(numbers), max(numbers)))
+                    self.assertAlmostEqual(stats["mean"], sum(numbers) / len(numbers))
+        bools = report["b"]["type_stats"]["bool"]
+        self.assertEqual(bools["true_count"], sum(1 for r in self.records if r["b"]))
+        sizes = report["l"]["type_stats"]["list"]
+        self.assertEqual((sizes["size_min"], sizes["size_max"]), (0, 3))
+
+    def test_partitions_merge_like_a_single_pass(self):
+        from datafilter.modules import accumulators as acc
+        single = acc.StatsAccumulator().update(self.data).report()
+        for bounds in ((0, 300), (0, 1, 300), (0, 100, 101, 250, 300)):
+            merged = acc.StatsAccumulator()
+            for start, end in zip(bounds[:-1], bounds[1:]):
+                merged.merge(acc.StatsAccumulator().update(self.data, np.arange(start, end)))
+            self.assertEqual(self.normalized(merged.report()), self.normalized(single), bounds)
+
+    def test_rows_match_a_copy(self):
+        from datafilter.modules import accumulators as acc
+        rows = np.arange(2, 300, 3)
+        report = acc.StatsAccumulator().update(self.data, rows).report()
+        self.assertEqual(self.normalized(report),
+                         self.normalized(acc.StatsAccumulator().update(self.data.take(rows)).report()))
+
+
+class QueryStatsTests(SimpleTestCase):
+    def setUp(self):
+        from datafilter.modules import query as my_query
+        self.data = ds.Dataset.from_records([{"n": i % 10, "s": f"v{i % 4}"} for i in range(100)])
+        self.query = my_query.Query(self.data)
+
+    def test_sort_only_view_reuses_base_stats_without_sorting(self):
+        from datafilter.modules import stats as my_stats
+        base = my_stats.analyze_structure(self.data)
+        self.query.set_sort([{"field": "n", "reverse": True}])
+        with mock.patch.object(my_sort, "sort_indices", side_effect=AssertionError("tri inutile")), \
+                mock.patch.object(my_stats, "analyze_structure", wraps=my_stats.analyze_structure) as analyze:
+            report = self.query.stats()
+        self.assertEqual(report, base)
+        self.assertIsNone(analyze.call_args.args[1])
+
+    def test_stats_are_computed_at_load_only_when_enabled(self):
+        from datafilter.modules import stats as my_stats
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir, ignore_errors=True)
+        path = os.path.join(tmp_dir, "a.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.data.to_records(), f)
+
+        with mock.patch.object(config, "DATASET_CACHE_ENABLED", False):
+            data = fm.load_data(path)
+            self.assertIsNone(data.stats)
+            lazy = my_stats.compute(data)
+            self.assertIs(data.stats, lazy)
+            self.assertIs(my_stats.compute(data), lazy)
+            with mock.patch.object(config, "STATS_AT_LOAD", True):
+                loaded = fm.load_data(path)
+        self.assertIsNotNone(loaded.stats)
+        self.assertEqual(loaded.stats.report(), lazy.report())
+
+    def test_filtered_stats_use_row_ids_and_survive_sort_changes(self):
+        self.query.add_filter("n", 3, ">")
+        report = self.query.stats()
+        self.assertEqual(report["n"]["non_null_count"], 60)
+        self.query.set_sort("s")
+        with mock.patch.object(my_sort, "sort_indices", side_effect=AssertionError("tri inutile")):
+            self.assertIs(self.query.stats(), report)
+
+
+class SketchTests(SimpleTestCase):
+    def test_hyperloglog_estimate_and_merge(self):
+        from datafilter.modules import sketches
+        values = np.arange(20000) * 7
+        single = sketches.HyperLogLog()
+        single.update_hashes(sketches.hash_numbers(values))
+        self.assertLess(abs(single.estimate() - 20000) / 20000, 3 * config.STATS_DISTINCT_ERROR)
+
+        # Deux partitions qui se recouvrent : la fusion donne exactement le même résumé
+        left, right = sketches.HyperLogLog(), sketches.HyperLogLog()
+        left.update_hashes(sketches.hash_numbers(values[:12000]))
+        right.update_hashes(sketches.hash_numbers(values[8000:]))
+        left.merge(right)
+        self.assertEqual(left.registers.tolist(), single.registers.tolist())
+
+    def test_hashes_are_stable_and_numbers_ignore_their_type(self):
+        from datafilter.modules import sketches
+        self.assertEqual(sketches.hash_numbers([1, -0.0]).tolist(), sketches.hash_numbers([1.0, 0.0]).tolist())
+        self.assertEqual(sketches.hash_strings(["a", "é"]).tolist(), sketches.hash_strings(["a", "é"]).tolist())
+        self.assertNotEqual(*sketches.hash_strings(["a", "b"]).tolist())
+
+    def test_kll_quantiles_within_rank_error(self):
+        from datafilter.modules import sketches
+        rng = np.random.default_rng(2)
+        values = rng.permutation(100000).astype(np.float64)
+        single = sketches.KLLSketch()
+        merged = sketches.KLLSketch()
+        for part in np.array_split(values, 7):
+            single.update(part)
+            other = sketches.KLLSketch(seed=len(part))
+            other.update(part)
+            merged.merge(other)
+        qs = [0.1, 0.5, 0.9, 0.99]
+        for sketch in (single, merged):
+            self.assertEqual(sketch.count, len(values))
+            for q, estimate in zip(qs, sketch.quantiles(qs)):
+                # Les valeurs sont 0..n-1 : la valeur est son propre rang
+                self.assertLess(abs(estimate - q * len(values)) / len(values), 3 * config.STATS_QUANTILE_ERROR)
+
+    def test_heavy_hitters_find_the_most_frequent_values(self):
+        from datafilter.modules import sketches
+        rng = np.random.default_rng(4)
+        values = ["a"] * 3000 + ["b"] * 2000 + [f"x{i}" for i in rng.integers(0, 5000, 10000)]
+        rng.shuffle(values)
+        merged = sketches.HeavyHitters()
+        for part in np.array_split(np.array(values, dtype=object), 5):
+            hitters = sketches.HeavyHitters()
+            hitters.update(part)
+            merged.merge(hitters)
+        top = merged.top(2)
+        self.assertEqual([t["value"] for t in top], ["a", "b"])
+        for t, exact in zip(top, (3000, 2000)):
+            # Comptes sous-estimés d'au plus error * total
+            self.assertLessEqual(t["count"], exact)
+            self.assertGreaterEqual(t["count"], exact - config.STATS_TOP_K_ERROR * len(values) * 5)
+
+
+class ParallelTests(SimpleTestCase):
+    def dataset(self, n=2000):
+        return ds.Dataset.from_records([
+            {"n": i % 97, "f": (i % 13) / 4 if i % 11 else None, "name": f"v{i % 7}",
+             "mixed": [i % 3] if i % 2 else i % 5}
+            for i in range(n)
+        ])
+
+    def test_worker_caches_dataset_segments_only_while_alive(self):
+        from datafilter.modules import parallel as my_parallel
+        data = self.dataset()
+        shared = my_parallel.shared_columns(data)
+        out_blocks = []
+        out_spec = my_parallel._share(np.zeros(10, dtype=bool), out_blocks)
+        self.addCleanup(my_parallel._release, out_blocks)
+        self.addCleanup(my_parallel._ATTACHED.clear)
+
+        rows = np.arange(0, 100, 10)
+        self.assertEqual(shared.nbytes, 0)
+        specs = shared.task_spec(data, ["mixed"], rows=rows)
+        # Colonne object : seules les lignes de la tâche sont envoyées
+        self.assertEqual(len(specs["mixed"]["objects"]), len(rows))
+        # Seule la colonne de la tâche est partagée, et la mémoire partagée est comptée
+        self.assertEqual(set(shared.specs), {"mixed"})
+        self.assertEqual(my_parallel.nbytes(data), shared.nbytes)
+        self.assertGreaterEqual(shared.nbytes, data.column("mixed").nulls.nbytes)
+        my_parallel._run({shared.token}, my_parallel._filter_task, specs, 0, 10, rows, "mixed", 1, "=", out_spec)
+        # Le segment du résultat n'est pas gardé ouvert, ceux du Dataset le sont
+        self.assertEqual(set(my_parallel._ATTACHED), {shared.token})
+        self.assertNotIn(out_spec[1], my_parallel._ATTACHED[shared.token])
+        self.assertEqual(np.ndarray(10, dtype=bool, buffer=out_blocks[0].buf).tolist(),
+                         [data.column("mixed").values[r] == 1 for r in rows])
+
+        # Dataset libéré côté process principal : ses segments sont fermés à la tâche suivante
+        my_parallel._run(frozenset(), my_parallel._types_task, data.column("mixed").values[:5])
+        self.assertEqual(my_parallel._ATTACHED, {})
+
+    def test_pool_matches_serial(self):
+        from datafilter.modules import accumulators as acc
+        from datafilter.modules import filter as my_filter
+        from datafilter.modules import parallel as my_parallel
+        data = self.dataset()
+        rows = np.arange(1, len(data), 3)
+        serial = (
+            my_filter.filter_mask(data, "n", 50, ">").tolist(),
+            my_filter.filter_mask(data, "mixed", 2, "=", rows=rows).tolist(),
+            acc.StatsAccumulator().update(data, rows).report(),
+        )
+        with mock.patch.object(config, "PARALLEL_WORKERS", 2), mock.patch.object(config, "PARALLEL_MIN_ROWS", 1):
+            self.addCleanup(my_parallel.shutdown)
+            parallel = (
+                my_parallel.filter_mask(data, "n", 50, ">").tolist(),
+                my_parallel.filter_mask(data, "mixed", 2, "=", rows=rows).tolist(),
+                my_parallel.compute_stats(data, rows).report(),
+            )
+        self.assertEqual(parallel[:2], serial[:2])
+        def counts(report):
+            return {f: (r["non_null_count"], r["null_count"], sorted(r["type_stats"])) for f, r in report.items()}
+        self.assertEqual(counts(parallel[2]), counts(serial[2]))
+
+    def test_pool_groupby_matches_serial(self):
+        from datafilter.modules import groupby as my_groupby
+        from datafilter.modules import parallel as my_parallel
+        data = self.dataset()
+        rows = np.arange(1, len(data), 3)
+        aggregations = my_groupby.parse_aggregations([{"op": "count"}, {"op": "sum", "field": "n"},
+                                                      {"op": "distinct", "field": "mixed"}])
+        ids, n_groups, _ = my_groupby.group_ids(data, ["name"], rows)
+        serial = my_groupby.GroupAccumulator(aggregations, n_groups).update(data, rows, ids).report()
+        with mock.patch.object(config, "PARALLEL_WORKERS", 2), mock.patch.object(config, "PARALLEL_MIN_ROWS", 1):
+            self.addCleanup(my_parallel.shutdown)
+            parallel = my_parallel.group_aggregate(data, aggregations, rows, ids, n_groups).report()
+        for name in serial:
+            self.assertEqual(parallel[name].tolist(), serial[name].tolist())
+
+
+class DiskCacheTests(TmpDirMixin, SimpleTestCase):
+    def write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def test_store_and_reload(self):
+        from datafilter.modules import disk_cache
+        path = f"{self.tmp_dir}/a.csv"
+        self.write(path, "x\n1\n")
+        data = ds.Dataset.from_records([{"x": 1, "y": [1, 2]}, {"x": None, "y": "a"}])
+        disk_cache.store(path, data)
+        self.assertEqual(disk_cache.load(path).to_records(), data.to_records())
+
+    def test_workers_map_cached_columns_from_their_files(self):
+        from datafilter.modules import disk_cache
+        from datafilter.modules import parallel as my_parallel
+        path = f"{self.tmp_dir}/a.csv"
+        self.write(path, "x\n1\n")
+        disk_cache.store(path, ds.Dataset.from_records([{"n": i % 5, "s": "ab"[i % 2]} for i in range(40)]))
+        data = disk_cache.load(path)
+        shared = my_parallel.shared_columns(data)
+        out_blocks = []
+        out_spec = my_parallel._share(np.zeros(40, dtype=bool), out_blocks)
+        self.addCleanup(my_parallel._release, out_blocks)
+        self.addCleanup(my_parallel._ATTACHED.clear)
+
+        specs = shared.task_spec(data, ["n"], 0, 40)
+        # Colonne en mmap : le worker rouvre le fichier .npy, rien n'est copié en mémoire partagée
+        self.assertEqual((specs["n"]["values"][0], specs["n"]["nulls"][0]), ("npy", "npy"))
+        self.assertEqual(my_parallel.nbytes(data), 0)
+        my_parallel._run({shared.token}, my_parallel._filter_task, specs, 0, 40, None, "n", 2, ">", out_spec)
+        self.assertEqual(np.ndarray(40, dtype=bool, buffer=out_blocks[0].buf).tolist(),
+                         [i % 5 > 2 for i in range(40)])
+
+        # Une tranche du fichier n'est pas le fichier : elle est copiée
+        self.assertEqual(my_parallel._segment(data.column("n").values[1:], shared.blocks)[0], "shm")
+
+    def test_changed_file_is_not_served_from_the_cache(self):
+        from datafilter.modules import disk_cache
+        path = f"{self.tmp_dir}/a.csv"
+        self.write(path, "x\n1\n")
+        disk_cache.store(path, ds.Dataset.from_records([{"x": 1}]))
+        self.write(path, "x\n1\n2\n")
+        self.assertIsNone(disk_cache.load(path))
+
+    def test_new_version_drops_stale_entry_without_unpickling(self):
+        from datafilter.modules import disk_cache
+        path = f"{self.tmp_dir}/a.csv"
+        self.write(path, "x\n1\n")
+        old = disk_cache.store(path, ds.Dataset.from_records([{"x": 1}]))
+        self.write(path, "x\n1\n2\n")
+        with mock.patch.object(disk_cache, "_read_meta", side_effect=AssertionError("meta.pkl lu")):
+            new = disk_cache.store(path, ds.Dataset.from_records([{"x": 1}, {"x": 2}]))
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(new))
+
+
+class EndpointTests(TmpDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = [{"id": i, "city": ["Paris", "Lyon", "Lille"][i % 3], "n": (i * 7) % 10}
+                        for i in range(130)]
+        self.path = os.path.join(self.tmp_dir, "a.json")
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.records, f)
+        response = self.client.post("/datafilter/load/", {"path": self.path}, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["count"], len(self.records))
+
+    def rows(self, **params):
+        return self.client.get("/datafilter/rows/", params)
+
+    def test_rows_offset_limit_and_fields(self):
+        body = self.rows(offset=10, limit=5, fields="id,n").json()
+        self.assertEqual(body["count"], 130)
+        self.assertEqual(body["data"], [{"id": r["id"], "n": r["n"]} for r in self.records[10:15]])
+        self.assertIsNotNone(body["next_cursor"])
+        self.assertEqual(self.rows(offset=128, limit=5).json()["data"], self.records[128:])
+
+    def test_rows_cursor_pages_over_a_sorted_view(self):
+        self.client.post("/datafilter/sort/", {"field": "n", "reverse": False}, content_type="application/json")
+        pages, cursor = [], None
+        while True:
+            body = self.rows(limit=40, **({"cursor": cursor} if cursor else {})).json()
+            pages.extend(body["data"])
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(pages, sorted(self.records, key=lambda r: r["n"]))
+
+    def test_cursor_is_rejected_once_the_view_changes(self):
+        cursor = self.rows(limit=10).json()["next_cursor"]
+        self.client.post("/datafilter/filter/", {"field": "n", "value": 5, "operator": ">"},
+                         content_type="application/json")
+        self.assertEqual(self.rows(limit=10, cursor=cursor).status_code, 400)
+
+    def test_rows_errors(self):
+        for params in ({"limit": 0}, {"offset": -1}, {"limit": "x"}, {"fields": "id,nope"}):
+            with self.subTest(params=params):
+                response = self.rows(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["status"], "error")
+
+    def test_groupby(self):
+        response = self.client.post("/datafilter/groupby/", {
+            "keys": ["city"],
+            "aggregations": [{"op": "count"}, {"op": "sum", "field": "n"}],
+            "order": {"field": "sum_n", "reverse": True},
+            "limit": 2,
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        totals = {}
+        for r in self.records:
+            count, total = totals.get(r["city"], (0, 0))
+            totals[r["city"]] = (count + 1, total + r["n"])
+        expected = sorted(({"city": c, "count": count, "sum_n": total} for c, (count, total) in totals.items()),
+                          key=lambda g: -g["sum_n"])
+        self.assertEqual(body["groups"], 3)
+        self.assertEqual(body["data"], expected[:2])
+
+    def test_groupby_on_filtered_view(self):
+        self.client.post("/datafilter/filter/", {"field": "n", "value": 5, "operator": ">"},
+                         content_type="application/json")
+        body = self.client.post("/datafilter/groupby/", {"keys": "city", "aggregations": [{"op": "count"}]},
+                                content_type="application/json").json()
+        self.assertEqual({g["city"]: g["count"] for g in body["data"]},
+                         {c: sum(1 for r in self.records if r["city"] == c and r["n"] > 5)
+                          for c in ("Paris", "Lyon", "Lille")})
+
+    def test_groupby_errors(self):
+        for payload in ({"keys": ["city"], "limit": 0}, {"keys": ["city"], "offset": "x"},
+                        {"keys": ["city"], "aggregations": [{"op": "nope"}]}):
+            with self.subTest(payload=payload):
+                response = self.client.post("/datafilter/groupby/", payload, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+
+
+class JsonStreamTests(TmpDirMixin, SimpleTestCase):
+    RECORDS = [
+        {"a": 1, "s": "x, ] y", "nested": {"l": [1, {"b": "}"}]}},
+        {"a": 2.5, "s": "\\\"quoted\\\"", "nested": None},
+        {"s": "é ☃"},
+        {"a": None, "s": "", "list": []},
+    ]
+
+    def write(self, name, text):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_array_split_across_blocks(self):
+        from datafilter.modules.formats import fjson
+        path = self.write("a.json", json.dumps(self.RECORDS, indent=2, ensure_ascii=False))
+        for block_size in (1, 5, 64, 1 << 16):
+            with self.subTest(block_size=block_size), mock.patch.object(config, "JSON_BLOCK_SIZE", block_size):
+                self.assertEqual(list(fjson.iter_values(path)), self.RECORDS)
+                self.assertEqual(fjson.load(path, chunk_size=3).to_records(), self.RECORDS)
+
+    def test_json_lines(self):
+        from datafilter.modules.formats import fjson
+        text = "\n".join(json.dumps(r) for r in self.RECORDS[:2]) + "\n\n" + json.dumps(self.RECORDS[2]) + "\n"
+        path = self.write("a.jsonl", text)
+        self.assertEqual(fm.load_data(path).to_records(), self.RECORDS[:3])
+
+    def test_single_object_and_errors(self):
+        from datafilter.modules.formats import fjson
+        self.assertEqual(fjson.load(self.write("one.json", '{"a": 1}')).to_records(), [{"a": 1}])
+        for name, text in (("open.json", '[{"a": 1},'), ("garbage.json", '[{"a": 1}] x'),
+                           ("bad.jsonl", '{"a": 1}\n{"a": \n'), ("empty.json", "")):
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                fjson.load(self.write(name, text))
+
+
+class ExportTests(TmpDirMixin, SimpleTestCase):
+    RECORDS = [
+        {"a": 1, "b": "x", "c": [1, 2]},
+        {"a": 2, "c": {"k": "v"}},
+        {"a": None, "b": "y,z", "c": "texte"},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(config, "OUTPUT_DIR", self.tmp_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.data = ds.Dataset.from_records(self.RECORDS)
+
+    def test_json_matches_json_dump(self):
+        path = fm.save_data(self.data, "export.json")
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), json.dumps(self.RECORDS, indent=4))
+        with mock.patch.object(config, "DATASET_BATCH_SIZE", 2):
+            path = fm.save_data(self.data, "compact.json", indices=np.array([2, 0]), compact=True)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), [self.RECORDS[2], self.RECORDS[0]])
+
+    def test_gzip_csv_and_jsonl(self):
+        # Mêmes cellules que l'export d'origine : texte brut pour les str, JSON pour le reste
+        path = fm.save_data(self.data, "export.csv.gz")
+        self.assertTrue(path.endswith("export.csv.gz"))
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["a", "b", "c"])
+        self.assertEqual(rows[1:], [["1", "x", "[1, 2]"], ["2", "null", '{"k": "v"}'], ["null", "y,z", "texte"]])
+
+        path = fm.save_data(self.data, "export.jsonl", compression="gzip")
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            self.assertEqual([json.loads(line) for line in f], self.RECORDS)
+
+    def test_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            fm.save_data(self.data, "export.csv", compression="lz4")
+
+    @skipUnless(importlib.util.find_spec("zstandard"), "zstandard n'est pas installé")
+    def test_zstd(self):
+        import zstandard
+        path = fm.save_data(self.data, "export.json.zst")
+        with open(path, "rb") as f:
+            text = zstandard.ZstdDecompressor().stream_reader(f).read().decode("utf-8")
+        self.assertEqual(json.loads(text), self.RECORDS)
+
+
+class ParquetTests(TmpDirMixin, SimpleTestCase):
+    def test_row_group_pruning(self):
+        from datafilter.modules.formats import fparquet
+        statistics = {"n": (10, 20)}
+        cases = [
+            ([("n", "=", "15")], True), ([("n", "=", "25")], False), ([("n", "=", "none")], True),
+            ([("n", ">", 20)], False), ([("n", ">", 19)], True),
+            ([("n", "<", 10)], False), ([("n", "<", 11)], True),
+            ([("n", ">", "20")], False), ([("n", ">", " 19 ")], True), ([("n", "<", "10.0")], False),
+            ([("n", ">", "abc")], True), ([("n", ">", True)], True),
+            ([("other", "=", "1")], True), ([("n", "=", "abc")], True),
+            ([("n", ">", 5), ("n", "<", 8)], False),
+        ]
+        for filters, expected in cases:
+            with self.subTest(filters=filters):
+                self.assertEqual(fparquet._may_match(statistics, filters), expected)
+
+    def test_partial_load_of_text_file(self):
+        path = os.path.join(self.tmp_dir, "a.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("id,n,s\n1,5,a\n2,15,b\n3,25,c\n")
+        data = fm.load_data(path, columns=["id"], filters=[("n", ">", 10)])
+        self.assertEqual(data.to_records(), [{"id": 2}, {"id": 3}])
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow n'est pas installé")
+    def test_parquet_round_trip_with_pushdown(self):
+        records = [{"id": i, "n": float(i % 7), "s": f"v{i % 3}", "l": [i]} for i in range(50)]
+        with mock.patch.object(config, "OUTPUT_DIR", self.tmp_dir), \
+                mock.patch.object(config, "PARQUET_ROW_GROUP_SIZE", 10):
+            path = fm.save_data(ds.Dataset.from_records(records), "export.parquet")
+        self.assertEqual(fm.load_data(path).to_records(),
+                         [dict(r, l=json.dumps(r["l"])) for r in records])
+        data = fm.load_data(path, columns=["id", "s"], filters=[("id", ">", 44)])
+        self.assertEqual(data.to_records(), [{"id": r["id"], "s": r["s"]} for r in records[45:]])
+
+
+class JobTests(SimpleTestCase):
+    def setUp(self):
+        self.runner = my_jobs.JobRunner(workers=2, ttl=0)
+        self.addCleanup(self.runner.shutdown)
+
+    def finish(self, job):
+        job.future.result(timeout=5)
+        return job.to_dict()
+
+    def test_result_and_progress(self):
+        def work():
+            my_jobs.checkpoint(rows=5, bytes_read=10)
+            self.assertEqual(my_jobs.current().rows, 5)
+            return {"answer": 42}
+
+        job = self.runner.submit("load", work, total_bytes=40)
+        state = self.finish(job)
+        self.assertEqual(state["state"], my_jobs.DONE)
+        self.assertEqual(state["result"], {"answer": 42})
+        self.assertEqual(state["progress"]["fraction"], 1.0)
+        self.assertIs(self.runner.get(job.id), job)
+
+    def test_cancel_stops_at_the_next_checkpoint(self):
+        started = threading.Event()
+
+        def work():
+            started.set()
+            while True:
+                my_jobs.checkpoint()
+
+        job = self.runner.submit("stats", work)
+        self.assertTrue(started.wait(5))
+        self.assertIs(self.runner.cancel(job.id), job)
+        state = self.finish(job)
+        self.assertEqual(state["state"], my_jobs.CANCELLED)
+        self.assertFalse(job.cancel())
+
+    def test_cancelled_stats_job_stops_between_columns(self):
+        from datafilter.modules import accumulators as acc
+        data = ds.Dataset.from_records([{"a": i, "b": i * 2, "c": str(i)} for i in range(10)])
+        updated = []
+        update_column = acc.StatsAccumulator.update_column
+
+        def work():
+            my_jobs.current().cancel()
+            return acc.StatsAccumulator().update(data)
+
+        def spy(self, col, rows=None):
+            updated.append(col.name)
+            return update_column(self, col, rows)
+
+        with mock.patch.object(acc.StatsAccumulator, "update_column", spy):
+            state = self.finish(self.runner.submit("stats", work))
+        self.assertEqual(state["state"], my_jobs.CANCELLED)
+        self.assertEqual(updated, [])
+
+    def test_failure_is_reported(self):
+        def work():
+            raise ValueError("boom")
+
+        state = self.finish(self.runner.submit("save", work))
+        self.assertEqual((state["state"], state["error"]), (my_jobs.FAILED, "boom"))
+
+    def test_checkpoint_outside_a_job_does_nothing(self):
+        my_jobs.checkpoint(rows=1)
+        self.assertIsNone(my_jobs.current())
+
+
+class JobEndpointTests(TmpDirMixin, SimpleTestCase):
+    def test_background_stats_and_unknown_job(self):
+        path = os.path.join(self.tmp_dir, "a.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([{"n": i} for i in range(10)], f)
+        self.client.post("/datafilter/load/", {"path": path}, content_type="application/json")
+
+        response = self.client.get("/datafilter/stats/", {"background": "true"})
+        self.assertEqual(response.status_code, 202)
+        job = views.JOBS.get(response.json()["job_id"])
+        job.future.result(timeout=5)
+        body = self.client.get(f"/datafilter/jobs/{job.id}/").json()
+        self.assertEqual(body["state"], my_jobs.DONE)
+        self.assertEqual(body["result"]["report"]["n"]["non_null_count"], 10)
+
+        self.assertEqual(self.client.get("/datafilter/jobs/nope/").status_code, 404)
+        self.assertEqual(self.client.delete("/datafilter/jobs/nope/").status_code, 404)
+
+    def test_background_load_answers_with_the_first_batch(self):
+        records = [{"id": i, "s": f"v{i}"} for i in range(6)]
+        path = os.path.join(self.tmp_dir, "b.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        release = threading.Event()
+
+        def slow_load(path):
+            my_jobs.publish_partial(lambda: ds.Dataset.from_records(records[:2]))
+            release.wait(5)
+            return ds.Dataset.from_records(records)
+
+        with mock.patch.object(fm, "load_data", side_effect=slow_load):
+            response = self.client.post("/datafilter/load/", {"path": path, "background": True},
+                                        content_type="application/json")
+            self.assertEqual(response.status_code, 202, response.content)
+            body = response.json()
+            self.assertTrue(body["partial"])
+            self.assertEqual((body["count"], body["data"]), (2, records[:2]))
+
+            rows = self.client.get("/datafilter/rows/").json()
+            self.assertTrue(rows["partial"])
+            self.assertEqual(rows["count"], 2)
+
+            release.set()
+            rows = self.client.get("/datafilter/rows/", {"wait": "true"}).json()
+            self.assertNotIn("partial", rows)
+            self.assertEqual(rows["data"], records)
+
+    def test_background_partial_load_previews_the_reduced_batch(self):
+        records = [{"id": i, "s": f"v{i}"} for i in range(6)]
+        path = os.path.join(self.tmp_dir, "c.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(records, f)
+        release = threading.Event()
+
+        def slow_load(path, columns=None, filters=None):
+            # Comme un fichier texte : le premier lot publié est celui du fichier complet
+            my_jobs.publish_partial(lambda: ds.Dataset.from_records(records[:4]))
+            release.wait(5)
+            return fm.reduce_data(ds.Dataset.from_records(records), columns, filters)
+
+        self.addCleanup(release.set)
+        with mock.patch.object(fm, "load_data", side_effect=slow_load):
+            response = self.client.post("/datafilter/load/", {
+                "path": path, "background": True, "columns": ["id"],
+                "filters": [{"field": "id", "operator": ">", "value": 1}],
+            }, content_type="application/json")
+            self.assertEqual(response.status_code, 202, response.content)
+            body = response.json()
+            self.assertEqual((body["count"], body["data"]), (2, [{"id": 2}, {"id": 3}]))
+            self.assertEqual(body["schema"], {"id": ds.KIND_INT})
+
+            release.set()
+            rows = self.client.get("/datafilter/rows/", {"wait": "true"}).json()
+            self.assertEqual(rows["data"], [{"id": r["id"]} for r in records[2:]])
+
+
+class ExpressionTests(SimpleTestCase):
+    def setUp(self):
+        self.records = [
+            {"name": "Alice", "age": 25, "city": "Paris", "score": 12.5},
+            {"name": "Bob", "age": 35, "city": "Lyon", "score": 18},
+            {"name": "Anna", "age": None, "city": "Paris"},
+            {"name": "Carl", "city": None, "score": 9.5},
+            {"name": "alan", "age": 31, "city": "Lille", "score": 20},
+            {"name": "Dora", "age": 42, "city": "Lyon", "score": None},
+        ]
+        self.data = ds.Dataset.from_records(self.records)
+
+    def names(self, text):
+        from datafilter.modules import expression
+        return [r["name"] for r in self.data.to_records(expression.compile(text).rows(self.data))]
+
+    def expected(self, predicate):
+        return [r["name"] for r in self.records if predicate(r)]
+
+    def test_matches_python_reference(self):
+        def num(r, k):
+            return r.get(k) if _is_number(r.get(k)) else None
+        cases = {
+            "age > 30": lambda r: num(r, "age") is not None and r["age"] > 30,
+            "age >= 35 or city = \"Paris\"":
+                lambda r: num(r, "age") is not None and r["age"] >= 35 or r.get("city") == "Paris",
+            "age < 40 and city != \"Lyon\"":
+                lambda r: num(r, "age") is not None and r["age"] < 40 and r.get("city") not in ("Lyon", None),
+            "city in (\"Paris\", \"Lille\")": lambda r: r.get("city") in ("Paris", "Lille"),
+            "city not in (\"Paris\", \"Lille\")": lambda r: r.get("city") in ("Lyon",),
+            "score between 10 and 18": lambda r: num(r, "score") is not None and 10 <= r["score"] <= 18,
+            "name ~ \"^A\"": lambda r: r["name"].startswith("A"),
+            "name !~ \"^A\"": lambda r: not r["name"].startswith("A"),
+            # Clé absente : ni égale ni différente de null
+            "age = null": lambda r: "age" in r and r["age"] is None,
+            "city != null": lambda r: r.get("city") is not None,
+            "score != null and (age > 30 or city = \"Paris\")":
+                lambda r: r.get("score") is not None
+                and (num(r, "age") is not None and r["age"] > 30 or r.get("city") == "Paris"),
+        }
+        for text, predicate in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self.names(text), self.expected(predicate))
+
+    def test_unknown_field_matches_nothing(self):
+        self.assertEqual(self.names("nope > 1"), [])
+
+    def test_invalid_expression(self):
+        from datafilter.modules import expression
+        for text in ("age >", "age > 1 and", "(age > 1", "age ? 1"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                expression.compile(text)
+
+
+class ExpressionNotTests(SimpleTestCase):
+    def setUp(self):
+        self.data = ds.Dataset.from_records([
+            {"name": "a", "age": 25, "city": "Paris"},
+            {"name": "b", "age": 35, "city": "Lyon"},
+            {"name": "c", "age": None, "city": "Paris"},
+            {"name": "d", "city": None},
+            {"name": "e", "age": 31},
+        ])
+
+    def names(self, text):
+        from datafilter.modules import expression
+        rows = expression.compile(text).rows(self.data)
+        return [r["name"] for r in self.data.to_records(rows)]
+
+    def test_not_excludes_null_and_missing_like_the_inverse_comparison(self):
+        self.assertEqual(self.names("not (age > 30)"), ["a"])
+        self.assertEqual(self.names("not (age > 30)"), self.names("age <= 30"))
+        self.assertEqual(self.names("not (age = 31)"), self.names("age != 31"))
+        self.assertEqual(self.names("not not (age > 30)"), self.names("age > 30"))
+
+    def test_not_on_null_tests(self):
+        self.assertEqual(self.names("not (age = null)"), ["a", "b", "e"])
+        self.assertEqual(self.names("not (age != null)"), ["c"])
+        self.assertEqual(self.names("not (city in (\"Lyon\", null))"), ["a", "c"])
+
+    def test_three_valued_and_or(self):
+        # age inconnu mais city = "Lyon" faux : la conjonction est fausse, sa négation vraie
+        self.assertEqual(self.names("not (age > 30 and city = \"Lyon\")"), ["a", "c"])
+        # age inconnu et city = "Paris" faux : la disjonction reste inconnue
+        self.assertEqual(self.names("not (age > 30 or city = \"Lyon\")"), ["a"])
+
+
+def reference_order(values, reverse=False):
+    """Ordre attendu : nombres (stable), puis NaN, puis nulls, dans l'ordre d'origine pour les ex aequo."""
+    numbers = [i for i, v in enumerate(values) if v is not None and not math.isnan(v)]
+    numbers.sort(key=lambda i: -values[i] if reverse else values[i])
+    nans = [i for i, v in enumerate(values) if v is not None and math.isnan(v)]
+    nulls = [i for i, v in enumerate(values) if v is None]
+    return numbers + nans + nulls
+
+
+class SortTests(TmpDirMixin, SimpleTestCase):
+    VALUES = [3.5, NAN, 1.5, None, NAN, 2.5, None, 5.5, 1.5, NAN]
+
+    def dataset(self, values=None):
+        return ds.Dataset.from_records([{"x": v} for v in (values or self.VALUES)])
+
+    def test_full_sort_nan_and_nulls(self):
+        data = self.dataset()
+        for reverse in (False, True):
+            order = my_sort.sort_indices(data, "x", reverse=reverse)
+            self.assertEqual(order.tolist(), reference_order(self.VALUES, reverse))
+
+    def test_top_k_with_nan_kth_key(self):
+        values = [3, NAN, 1, NAN, 2, NAN, 5]
+        data = self.dataset(values)
+        expected = reference_order(values)
+        for limit in range(1, len(values) + 1):
+            self.assertEqual(my_sort.sort_indices(data, "x", limit=limit).tolist(), expected[:limit])
+
+    def test_top_k_matches_full_sort(self):
+        data = self.dataset()
+        for reverse in (False, True):
+            full = my_sort.sort_indices(data, "x", reverse=reverse).tolist()
+            for limit in range(1, len(self.VALUES) + 1):
+                top = my_sort.sort_indices(data, "x", reverse=reverse, limit=limit)
+                self.assertEqual(top.tolist(), full[:limit])
+
+    def test_cursor_pages_cover_nan_and_nulls(self):
+        data = self.dataset()
+        rows = np.arange(len(data))
+        for nulls in ("first", "last"):
+            keys = [{"field": "x", "nulls": nulls}]
+            full = my_sort.sort_indices(data, keys).tolist()
+            pages, after = [], None
+            while True:
+                page = my_sort.sort_indices(data, keys, limit=3) if after is None \
+                    else my_sort.rows_after(data, keys, rows, after, 3)
+                pages.extend(page.tolist())
+                if len(page) < 3:
+                    break
+                after = int(page[-1])
+            self.assertEqual(pages, full)
+
+    def test_external_sort_matches_memory_sort(self):
+        values = [v for _ in range(7) for v in self.VALUES]
+        data = self.dataset(values)
+        rows = np.arange(len(data))
+        for keys in (["x"], [{"field": "x", "reverse": True, "nulls": "first"}]):
+            expected = my_sort.sort_indices(data, keys)
+            result = my_sort.external_sort(data, keys, rows, run_size=4)
+            self.assertEqual(result.tolist(), expected.tolist())
+
+    def test_multi_key_sort(self):
+        records = [{"a": ["x", "y", None][i % 3], "b": (i * 5) % 7} for i in range(20)]
+        data = ds.Dataset.from_records(records)
+        keys = [{"field": "a"}, {"field": "b", "reverse": True}]
+        expected = sorted(range(len(records)),
+                          key=lambda i: (records[i]["a"] is None, records[i]["a"] or "", -records[i]["b"]))
+        self.assertEqual(my_sort.sort_indices(data, keys).tolist(), expected)
+        self.assertEqual(my_sort.sort_indices(data, keys, limit=5).tolist(), expected[:5])
+
+    def test_reverse_flag_from_client_text(self):
+        self.assertFalse(my_sort.normalize_keys({"field": "x", "reverse": "false"})[0].reverse)
+        self.assertTrue(my_sort.normalize_keys({"field": "x", "reverse": "true"})[0].reverse)
+        self.assertTrue(my_sort.normalize_keys({"field": "x", "reverse": True})[0].reverse)
+
+
+class GroupByTests(TmpDirMixin, SimpleTestCase):
+    AGGREGATIONS = [
+        {"op": "count"},
+        {"op": "sum", "field": "n"},
+        {"op": "mean", "field": "f"},
+        {"op": "min", "field": "name"},
+        {"op": "max", "field": "n"},
+        {"op": "distinct", "field": "name"},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        rng = np.random.default_rng(7)
+        records = []
+        for i in range(400):
+            key = int(rng.integers(40))
+            record = {"k": key, "tag": ["a", "b", None][i % 3], "name": f"n{rng.integers(10)}"}
+            # Certains groupes n'ont aucune valeur de n : sum / max à None (tableaux object)
+            if key % 5:
+                record["n"] = int(rng.integers(-1000, 1000))
+            record["f"] = float(rng.normal()) if i % 7 else None
+            records.append(record)
+        self.data = ds.Dataset.from_records(records)
+
+    def group(self, keys, **options):
+        from datafilter.modules import groupby as my_groupby
+        return my_groupby.group_by(self.data, keys, self.AGGREGATIONS, **options)
+
+    def reference(self, keys):
+        """Regroupement naïf en Python, ordre des clés (nulls en dernier)."""
+        groups = {}
+        for record in self.data.to_records():
+            groups.setdefault(tuple(record.get(k) for k in keys), []).append(record)
+        return groups
+
+    def test_matches_python_reference(self):
+        count, records = self.group(["k", "tag"])
+        reference = self.reference(["k", "tag"])
+        self.assertEqual(count, len(reference))
+        for record in records:
+            members = reference[(record["k"], record["tag"])]
+            numbers = [m["n"] for m in members if m.get("n") is not None]
+            self.assertEqual(record["count"], len(members))
+            self.assertEqual(record["sum_n"], sum(numbers) if numbers else None)
+            self.assertEqual(record["max_n"], max(numbers) if numbers else None)
+            self.assertEqual(record["min_name"], min(m["name"] for m in members))
+            self.assertEqual(record["distinct_name"], len({m["name"] for m in members}))
+        order = [(r["k"], r["tag"]) for r in records]
+        self.assertEqual(order, sorted(order, key=lambda kv: (kv[0], kv[1] is None, kv[1] or "")))
+
+    def test_distinct_on_object_column_counts_equal_values_once(self):
+        from datafilter.modules import groupby as my_groupby
+        data = ds.Dataset.from_records([
+            {"k": "a", "o": 1}, {"k": "a", "o": 1.0}, {"k": "a", "o": True}, {"k": "a", "o": "1"},
+            {"k": "b", "o": {"x": 1, "y": 2}}, {"k": "b", "o": {"y": 2, "x": 1}}, {"k": "b", "o": [1]},
+            {"k": "b", "o": None},
+        ])
+        _, records = my_groupby.group_by(data, ["k"], [{"op": "distinct", "field": "o"}])
+        self.assertEqual([(r["k"], r["distinct_o"]) for r in records], [("a", 3), ("b", 2)])
+
+    def test_spilled_matches_memory(self):
+        cases = [None, ("sum_n", True), ("sum_n", False), ("max_n", True), ("min_name", False),
+                 ("mean_f", True), ("count", False)]
+        for order in cases:
+            for offset, limit in ((0, None), (0, 5), (7, 11), (70, 20)):
+                expected = self.group(["k", "tag"], order=order, offset=offset, limit=limit)
+                with mock.patch.object(config, "GROUPBY_MAX_GROUPS", 3):
+                    spilled = self.group(["k", "tag"], order=order, offset=offset, limit=limit)
+                self.assertEqual(spilled, expected, (order, offset, limit))
+
+    def test_spill_partitions_rows_by_key_hash(self):
+        from datafilter.modules import groupby as my_groupby
+        with mock.patch.object(config, "GROUPBY_MAX_GROUPS", 3), \
+                mock.patch.object(my_groupby, "group_ids", wraps=my_groupby.group_ids) as group_ids:
+            count, _ = self.group(["k"])
+        self.assertEqual(count, 40)
+        # Numéros de groupes calculés partition par partition, jamais sur toutes les lignes à la fois
+        self.assertGreater(group_ids.call_count, 1)
+        self.assertTrue(all(len(call.args[2]) < len(self.data) for call in group_ids.call_args_list))
+
+
+class ResultCacheTests(TmpDirMixin, SimpleTestCase):
+    def test_memory_store_is_a_bounded_lru(self):
+        from datafilter.modules import result_cache as my_cache
+        store = my_cache.MemoryStore(budget=250)
+        for key in ("a", "b", "c"):
+            store.put(key, np.arange(10))  # 80 octets
+        store.get("a")
+        store.put("d", np.arange(10))
+        self.assertIsNone(store.get("b"))
+        self.assertEqual(store.get("a").tolist(), list(range(10)))
+        self.assertFalse(store.get("a").flags.writeable)
+        self.assertEqual((len(store), store.evictions), (3, 1))
+        store.put("huge", np.arange(100))
+        self.assertIsNone(store.get("huge"))
+
+    def test_disk_store_round_trip_and_budget(self):
+        from datafilter.modules import result_cache as my_cache
+        store = my_cache.DiskStore(budget=0, directory=os.path.join(self.tmp_dir, "results"))
+        store.put("rows", np.arange(5))
+        store.put("report", {"n": {"null_count": 1}})
+        self.assertEqual(store.get("rows").tolist(), list(range(5)))
+        self.assertEqual(store.get("report"), {"n": {"null_count": 1}})
+        self.assertIsNone(store.get("nope"))
+        store.budget = store.size - 1
+        store._enforce_budget()
+        self.assertEqual((len(store), store.evictions), (1, 1))
+        store.clear()
+        self.assertEqual(len(store), 0)
+
+    def test_queries_share_results_whatever_the_filter_order(self):
+        from datafilter.modules import query as my_query
+        from datafilter.modules import result_cache as my_cache
+        previous = my_cache._CACHE
+        self.addCleanup(setattr, my_cache, "_CACHE", previous)
+        cache = my_cache.configure("memory", 0)
+
+        data = ds.Dataset.from_records([{"n": i % 10, "s": "ab"[i % 2]} for i in range(50)])
+        first = my_query.Query(data, fingerprint="v1")
+        first.add_filter("n", 4, ">")
+        first.add_filter("s", "a", "=")
+        first.set_sort("n", True)
+        expected = first.page(0, None)
+
+        second = my_query.Query(data, fingerprint="v1")
+        second.add_filter("s", "a", "=")
+        second.add_filter("n", 4, ">")
+        second.set_sort("n", True)
+        self.assertEqual(second.page(0, None), expected)
+        metrics = cache.metrics()
+        self.assertEqual(metrics["by_kind"]["rows"]["hits"], 1)
+        self.assertEqual(metrics["by_kind"]["order"]["hits"], 1)
+
+        # Autre version du fichier : rien n'est réutilisé
+        other = my_query.Query(data, fingerprint="v2")
+        other.add_filter("n", 4, ">")
+        other.page(0, None)
+        self.assertEqual(cache.metrics()["hits"], 2)
+
+
+class RowSetTests(SimpleTestCase):
+    SIZE = 1000
+
+    def rowsets(self):
+        """Ensembles de chaque représentation : complet, vide, indices (creux), bitmap (dense)."""
+        from datafilter.modules.rowset import RowSet
+        rng = np.random.default_rng(5)
+        sets = [RowSet.full(self.SIZE), RowSet.from_mask(np.zeros(self.SIZE, dtype=bool))]
+        for density in (0.01, 0.02, 0.3, 0.7):
+            sets.append(RowSet.from_mask(rng.random(self.SIZE) < density))
+        self.assertTrue(any(s.rows is not None and len(s) for s in sets))
+        self.assertTrue(any(s.bits is not None for s in sets))
+        return sets
+
+    def test_set_operations_match_python_sets(self):
+        sets = self.rowsets()
+        for a in sets:
+            for b in sets:
+                left, right = set(a.indices().tolist()), set(b.indices().tolist())
+                for name, result, expected in (("&", a & b, left & right), ("|", a | b, left | right),
+                                               ("-", a - b, left - right)):
+                    with self.subTest(op=name, a=len(a), b=len(b)):
+                        self.assertEqual(result.indices().tolist(), sorted(expected))
+                        self.assertEqual(len(result), len(expected))
+
+    def test_contains_rank_and_select(self):
+        probe = np.arange(self.SIZE)
+        for s in self.rowsets():
+            rows = s.indices().tolist()
+            with self.subTest(count=len(s)):
+                self.assertEqual(s.contains(probe).tolist(), s.mask().tolist())
+                self.assertEqual([s.rank(r) for r in (0, 5, 499, self.SIZE - 1)],
+                                 [sum(1 for x in rows if x <= r) for r in (0, 5, 499, self.SIZE - 1)])
+                for start, stop in ((0, 10), (3, 4), (len(rows) - 2, len(rows) + 5), (len(rows), None)):
+                    self.assertEqual(s.select(max(start, 0), stop).tolist(), rows[max(start, 0):stop])
+
+
+def baseline_column_types(records):
+    """utils.get_column_types d'origine : types de base et types des éléments de listes, par colonne."""
+    from datafilter.modules import utils
+    result = {}
+    for row in records:
+        for key, value in row.items():
+            base, sub = result.setdefault(key, (set(), set()))
+            if value is None: continue
+            base.add(utils.get_type_str(value))
+            if isinstance(value, list):
+                sub.update(utils.get_type_str(item) for item in value)
+    return result
+
+
+class SchemaTests(SimpleTestCase):
+    RECORDS = [
+        {"a": 1, "b": "x", "c": [1, "y"], "d": {"k": 1}},
+        {"a": 2, "b": None, "c": 3, "d": True, "e": [1.5]},
+        {"a": 3, "c": "z", "e": [2.5, 3.5]},
+        {"a": 4, "b": "w", "c": [None], "d": None},
+    ]
+
+    def test_matches_baseline_types(self):
+        from datafilter.modules import schema
+        data = ds.Dataset.from_records(self.RECORDS)
+        inferred = schema.infer(data)
+        for name, (base, sub) in baseline_column_types(self.RECORDS).items():
+            with self.subTest(column=name):
+                self.assertEqual(inferred.columns[name].types, base)
+                self.assertEqual(inferred.columns[name].sub_types, sub)
+        self.assertEqual(inferred.type_strs()["c"], "list of None,int,str | int | str")
+        self.assertIs(schema.infer(data), inferred)
+
+    def test_view_schema_matches_a_copy(self):
+        from datafilter.modules import schema
+        data = ds.Dataset.from_records(self.RECORDS)
+        for rows in ([0], [1, 2], [2, 3], []):
+            with self.subTest(rows=rows):
+                derived = schema.infer(data, rows=rows).to_dict()["columns"]
+                copy = schema.infer(data.take(np.array(rows, dtype=np.int64))).to_dict()["columns"]
+                self.assertEqual({k: (v["types"], v["list_types"], v["null_count"]) for k, v in derived.items()},
+                                 {k: (v["types"], v["list_types"], v["null_count"])
+                                  for k, v in copy.items() if k in derived})
+
+    def test_sampled_schema_is_flagged_inexact(self):
+        from datafilter.modules import schema
+        records = [{"v": i if i % 2 else str(i)} for i in range(5000)]
+        inferred = schema.infer(ds.Dataset.from_records(records), confidence=0.9)
+        self.assertFalse(inferred.exact)
+        self.assertEqual(inferred.columns["v"].types, {"int", "str"})
+
+    def test_text_column_absent_from_a_whole_batch(self):
+        builder = ds.DatasetBuilder()
+        builder.add_records([{"s": "a"}, {"s": "b"}])
+        builder.add_records([{"n": 1}])
+        builder.add_records([{"s": "c", "n": 2}])
+        self.assertEqual(builder.build().to_records(), [{"s": "a"}, {"s": "b"}, {"n": 1}, {"s": "c", "n": 2}])
+
+
+class XmlTests(TmpDirMixin, SimpleTestCase):
+    def load(self, text):
+        from datafilter.modules.formats import fxml
+        path = os.path.join(self.tmp_dir, "a.xml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return fxml.load(path).to_records()
+
+    def test_text_only_record_keeps_its_text(self):
+        records = self.load("<records><record>just text</record><record><a>1</a></record>"
+                            "<record id=\"3\">x</record><record/></records>")
+        self.assertEqual(records, [{"#text": "just text"}, {"a": 1}, {"id": 3, "#text": "x"}, {}])
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        from datafilter.modules import metrics as my_metrics
+        self.registry = my_metrics.Registry()
+        patcher = mock.patch.object(my_metrics, "REGISTRY", self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_phases_count_their_own_time(self):
+        from datafilter.modules import metrics as my_metrics
+        with my_metrics.request() as metrics:
+            metrics.endpoint = "test"
+            with my_metrics.phase("parse") as parse:
+                parse.bytes_read = 100
+                with my_metrics.phase("convert", rows=10):
+                    time.sleep(0.02)
+        self.assertGreaterEqual(metrics.phases["convert"], 0.02)
+        self.assertLess(metrics.phases["parse"], metrics.phases["convert"])
+        self.assertEqual((metrics.rows, metrics.bytes_read), (10, 100))
+        self.assertRegex(metrics.server_timing(), r"^convert;dur=[0-9.]+, parse;dur=[0-9.]+, total;dur=[0-9.]+$")
+
+        text = self.registry.render()
+        self.assertIn('datafilter_rows_processed_total{endpoint="test",phase="convert"} 10', text)
+        self.assertIn('datafilter_bytes_read_total{endpoint="test"} 100', text)
+        self.assertIn('datafilter_phase_seconds_count{endpoint="test",phase="parse"} 1', text)
+
+    def test_histogram_rendering(self):
+        self.registry.observe("h", "aide", (("a", 'x"y'),), 0.3, (0.1, 0.5))
+        self.registry.observe("h", "aide", (("a", 'x"y'),), 2, (0.1, 0.5))
+        self.assertEqual(self.registry.render().splitlines(), [
+            "# HELP h aide",
+            "# TYPE h histogram",
+            'h_bucket{a="x\\"y",le="0.1"} 0',
+            'h_bucket{a="x\\"y",le="0.5"} 1',
+            'h_bucket{a="x\\"y",le="+Inf"} 2',
+            'h_sum{a="x\\"y"} 2.3',
+            'h_count{a="x\\"y"} 2',
+        ])
+
+    def test_phases_in_a_job_are_labelled_with_its_kind(self):
+        from datafilter.modules import metrics as my_metrics
+        runner = my_jobs.JobRunner(workers=1)
+        self.addCleanup(runner.shutdown)
+
+        def work():
+            with my_metrics.phase("write", rows=3):
+                pass
+
+        runner.submit("save", work).future.result(timeout=5)
+        self.assertIn('datafilter_rows_processed_total{endpoint="job:save",phase="write"} 3', self.registry.render())
+
+    def test_server_timing_header_and_metrics_endpoint(self):
+        response = self.client.get("/datafilter/files/")
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertIn("serialize;dur=", response["Server-Timing"])
+        text = self.client.get("/datafilter/metrics/").content.decode()
+        self.assertIn('datafilter_request_seconds_count{endpoint="list_files",method="GET",status="200"} 1', text)
@@ -8,7 +8,15 @@ urlpatterns = [
     path('load/', views.load_file, name='load_file'),
     path('save/', views.save_file, name='save_file'),
     path('filter/', views.filter_data, name='filter_data'),
+    path('filter/<int:filter_id>/', views.remove_filter, name='remove_filter'),
+    path('reset/', views.reset_view, name='reset_view'),
+    path('rows/', views.get_rows, name='get_rows'),
     path('sort/', views.sort_data, name='sort_data'),
     path('stats/', views.get_stats, name='get_stats'),
+    path('groupby/', views.group_by, name='group_by'),
+    path('schema/', views.get_schema, name='get_schema'),
     path('preview/', views.preview_file, name='preview_file'),
+    path('jobs/<str:job_id>/', views.job_status, name='job_status'),
+    path('cache/', views.cache_status, name='cache_status'),
+    path('metrics/', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,15 +1,76 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from django.http import HttpResponse
 import os
+import json
+import functools
 
 from .modules import config
 from .modules import file_manager as fm
-from .modules import filter as my_filter
-from .modules import sort as my_sort
-from .modules import stats as my_stats
+from .modules import groupby as my_groupby
+from .modules import jobs as my_jobs
+from .modules import metrics as my_metrics
+from .modules import result_cache as my_cache
+from .modules import utils
+from .modules import workspace as my_workspace
 
-CURRENT_DATA = []
-CURRENT_FILEPATH = ""
+# Nombre de lignes renvoyées avec chaque réponse
+PAGE_SIZE = 50
+# Taille maximale d'une page demandée à /rows/
+MAX_PAGE_SIZE = 1000
+
+# Un espace de travail par session / handle (remplace CURRENT_DATA / CURRENT_FILEPATH)
+WORKSPACES = my_workspace.WorkspaceManager()
+# Chargements / exports / statistiques lancés en arrière-plan (option "background")
+JOBS = my_jobs.JobRunner()
+
+def get_handle(request):
+    """Handle explicite (body, query string ou en-tête) sinon celui de la session."""
+    handle = (request.data.get('handle') if hasattr(request.data, 'get') else None) \
+        or request.query_params.get('handle') \
+        or request.headers.get('X-Workspace')
+    if handle:
+        return str(handle)
+    return request.session.get('workspace')
+
+def get_flag(request, name):
+    """Option booléenne, dans le body ou la query string."""
+    value = (request.data.get(name) if hasattr(request.data, 'get') else None) \
+        or request.query_params.get(name)
+    return utils.is_true(value)
+
+def wait_loaded(ws):
+    """Attend la fin d'un chargement progressif et renvoie l'espace sur le fichier complet."""
+    if not ws.partial:
+        return ws
+    ws.job.join()
+    loaded = WORKSPACES.get(ws.handle)
+    if loaded is None or loaded.partial:
+        raise ValueError(ws.job.error or "Chargement du fichier interrompu")
+    return loaded
+
+def get_workspace(request):
+    """
+    Espace de travail de la requête. Pendant un chargement progressif, c'est le début du fichier
+    (réponses marquées "partial"), sauf si le client demande à attendre la fin (option "wait").
+    """
+    handle = get_handle(request)
+    ws = WORKSPACES.get(handle) if handle else None
+    if ws is not None and ws.partial and get_flag(request, 'wait'):
+        # Chargement échoué ou annulé : l'espace provisoire a disparu, comme s'il n'y avait rien de chargé
+        ws.job.join()
+        ws = WORKSPACES.get(handle)
+    return ws
+
+def partial_flag(ws):
+    return {"partial": True} if ws.partial else {}
+
+def run_job(request, kind, fn, total_bytes=None, **extra):
+    """Exécute fn() tout de suite, ou en arrière-plan si le client l'a demandé (réponse 202)."""
+    if not get_flag(request, 'background'):
+        return Response({"status": "success", **extra, **fn()})
+    job = JOBS.submit(kind, fn, total_bytes=total_bytes)
+    return Response({"status": "accepted", **extra, **job.to_dict()}, status=202)
 
 @api_view(['GET'])
 def list_files(request):
@@ -24,88 +85,353 @@ def list_files(request):
         return Response({"status": "error", "message": str(e)}, status=500)
     
     
+def parse_load_options(data):
+    """
+    Options de chargement partiel : `columns` (liste de noms) et `filters` ([{field, value, operator}]).
+    Renvoie (columns, filters) ou lève ValueError.
+    """
+    columns = data.get('columns')
+    if columns is not None:
+        if not isinstance(columns, list) or not all(isinstance(c, str) for c in columns):
+            raise ValueError("columns doit être une liste de noms de colonnes")
+
+    filters = []
+    for f in data.get('filters') or []:
+        if not isinstance(f, dict) or 'field' not in f:
+            raise ValueError("Chaque filtre doit être un objet {field, value, operator}")
+        operator = f.get('operator', '=')
+        if operator not in ('=', '>', '<'):
+            raise ValueError(f"Opérateur non supporté: {operator}")
+        filters.append((f['field'], operator, f.get('value')))
+    return columns, filters
+
 @api_view(['POST'])
 def load_file(request):
-    global CURRENT_DATA, CURRENT_FILEPATH
     path = request.data.get('path')
     
     if not path:
         return Response({"status": "error", "message": "Chemin vide"}, status=400)
         
     try:
-        CURRENT_DATA = fm.load_data(path)
-        CURRENT_FILEPATH = path
-        return Response({
-            "status": "success", 
-            "count": len(CURRENT_DATA),
-            "data": CURRENT_DATA[:50]
-        })
+        columns, filters = parse_load_options(request.data)
+        loader, variant = fm.load_data, None
+        if columns is not None or filters:
+            # Chargement partiel : base distincte de celle du fichier complet
+            loader = functools.partial(fm.load_data, columns=columns, filters=filters)
+            variant = json.dumps([columns, filters], sort_keys=True)
+
+        handle = get_handle(request) or my_workspace.new_handle()
+        full_path = fm.resolve_path(path)
+        request.session['workspace'] = handle
+
+        def load():
+            try:
+                ws = WORKSPACES.open(handle, full_path, loader, variant=variant)
+            except Exception:
+                WORKSPACES.drop_partial(handle, my_jobs.current())
+                raise
+            return {"count": ws.query.count(), "data": ws.query.page(0, PAGE_SIZE)}
+
+        if not get_flag(request, 'background'):
+            return Response({"status": "success", "handle": handle, **load()})
+        reduce = None
+        if variant is not None and not fm.is_binary(full_path):
+            # Les formats texte sont lus en entier puis réduits : leur premier lot doit l'être aussi
+            reduce = functools.partial(fm.reduce_data, columns=columns, filters=filters)
+        return start_load(handle, full_path, load, reduce)
     except Exception as e:
         return Response({"status": "error", "message": str(e)}, status=400)
 
+def start_load(handle, path, load, reduce=None):
+    """
+    Chargement en arrière-plan. On répond dès que le premier lot est lu : première page et schéma
+    du début du fichier (marqués "partial"), la suite arrive dans l'espace de travail au fil du job.
+    `reduce` applique au premier lot les colonnes / filtres d'un chargement partiel.
+    """
+    previous = WORKSPACES.get(handle)
+    if previous is not None and previous.partial:
+        # Nouveau fichier demandé avant la fin du précédent : on abandonne l'ancien chargement
+        previous.job.cancel()
+
+    def on_partial(base):
+        if reduce is not None:
+            base = reduce(base)
+        WORKSPACES.open_partial(handle, path, base, job=my_jobs.current())
+
+    job = JOBS.submit("load", load, total_bytes=os.path.getsize(path), on_partial=on_partial)
+    job.wait(config.LOAD_PREVIEW_WAIT)
+    if job.status == my_jobs.DONE:
+        # Petit fichier (ou déjà en cache) : chargé avant la fin de l'attente
+        return Response({"status": "success", "handle": handle, "job_id": job.id, **job.result})
+    if job.status == my_jobs.FAILED:
+        return Response({"status": "error", "message": job.error}, status=400)
+
+    body = {"status": "accepted", "handle": handle, **job.to_dict()}
+    ws = WORKSPACES.get(handle)
+    if ws is not None and ws.partial and ws.job is job:
+        body.update(count=ws.query.count(), data=ws.query.page(0, PAGE_SIZE), schema=ws.base.schema())
+    return Response(body, status=202)
+
 @api_view(['POST'])
 def filter_data(request):
-    global CURRENT_DATA
+    """
+    Ajoute un filtre à la vue : soit `field` / `value` / `operator` (=, >, <),
+    soit `expression` (ex : age > 30 and city in ("Paris", "Lyon") and name ~ "^A").
+    """
     field = request.data.get('field')
     value = request.data.get('value')
+    operator = request.data.get('operator', '=')
+    expression = request.data.get('expression')
+    ws = get_workspace(request)
     
-    if not CURRENT_DATA:
+    if ws is None or not ws.base:
         return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+    if expression is None and operator not in ('=', '>', '<'):
+        return Response({"status": "error", "message": f"Opérateur non supporté: {operator}"}, status=400)
 
     try:
-        filtered = my_filter.filter_data(CURRENT_DATA, field, value)
-        CURRENT_DATA = filtered
+        if expression is not None:
+            predicate = ws.query.add_expression(str(expression))
+        else:
+            predicate = ws.query.add_filter(field, value, operator)
+        WORKSPACES.update(ws.handle)
         return Response({
             "status": "success", 
-            "count": len(CURRENT_DATA),
-            "data": CURRENT_DATA[:50]
+            "filter_id": predicate.id,
+            "count": ws.query.count(),
+            "data": ws.query.page(0, PAGE_SIZE),
+            **ws.query.describe(),
+            **partial_flag(ws)
+        })
+    except Exception as e:
+        return Response({"status": "error", "message": str(e)}, status=400)
+
+@api_view(['DELETE'])
+def remove_filter(request, filter_id):
+    """Retire un filtre de la vue courante, sans recharger le fichier"""
+    ws = get_workspace(request)
+    if ws is None:
+        return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+
+    try:
+        ws.query.remove_filter(filter_id)
+        return Response({
+            "status": "success",
+            "count": ws.query.count(),
+            "data": ws.query.page(0, PAGE_SIZE),
+            **ws.query.describe(),
+            **partial_flag(ws)
+        })
+    except KeyError as e:
+        return Response({"status": "error", "message": e.args[0]}, status=404)
+    except Exception as e:
+        return Response({"status": "error", "message": str(e)}, status=400)
+
+@api_view(['POST'])
+def reset_view(request):
+    """Supprime tous les filtres et le tri : on revient au fichier chargé"""
+    ws = get_workspace(request)
+    if ws is None:
+        return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+
+    ws.reset()
+    return Response({
+        "status": "success",
+        "count": ws.query.count(),
+        "data": ws.query.page(0, PAGE_SIZE),
+        **ws.query.describe(),
+        **partial_flag(ws)
+    })
+
+@api_view(['GET'])
+def get_rows(request):
+    """
+    Renvoie une fenêtre de la vue courante.
+    - offset / limit : pagination classique
+    - cursor : pagination par curseur (valeur next_cursor de la réponse précédente)
+    - fields : colonnes à renvoyer, séparées par des virgules
+    """
+    ws = get_workspace(request)
+    if ws is None:
+        return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+
+    try:
+        offset = int(request.query_params.get('offset', 0))
+        limit = int(request.query_params.get('limit', PAGE_SIZE))
+    except ValueError:
+        return Response({"status": "error", "message": "offset et limit doivent être des entiers"}, status=400)
+    if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        return Response({"status": "error", "message": f"offset >= 0 et 0 < limit <= {MAX_PAGE_SIZE}"}, status=400)
+
+    fields = request.query_params.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if ws.base.column(f) is None]
+        if unknown:
+            return Response({"status": "error", "message": f"Champs inconnus : {', '.join(unknown)}"}, status=400)
+
+    try:
+        query = ws.query
+        cursor = request.query_params.get('cursor')
+        after = query.parse_cursor(cursor) if cursor else None
+        rows = query.window(offset, limit, after)
+        WORKSPACES.update(ws.handle)
+        return Response({
+            "status": "success",
+            "count": query.count(),
+            "offset": offset,
+            "limit": limit,
+            "data": ws.base.to_records(rows, fields=fields or None),
+            "next_cursor": query.cursor(rows[-1]) if len(rows) == limit else None,
+            **partial_flag(ws)
         })
     except Exception as e:
         return Response({"status": "error", "message": str(e)}, status=400)
 
 @api_view(['POST'])
 def sort_data(request):
-    global CURRENT_DATA
+    """
+    Trie la vue : `field` (+ `reverse`, `nulls` : 'first' / 'last'),
+    ou `keys` : [{field, reverse, nulls}, ...] pour un tri sur plusieurs colonnes.
+    """
     field = request.data.get('field')
+    keys = request.data.get('keys')
+    ws = get_workspace(request)
     
-    if not CURRENT_DATA:
+    if ws is None or not ws.base:
         return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
 
     try:
-        CURRENT_DATA = my_sort.sort_data(CURRENT_DATA, field)
+        if keys is None and field:
+            keys = {"field": field, "reverse": request.data.get('reverse', False),
+                    "nulls": request.data.get('nulls', 'last')}
+        ws.query.set_sort(keys)
+        WORKSPACES.update(ws.handle)
         return Response({
             "status": "success", 
-            "data": CURRENT_DATA[:50]
+            "count": ws.query.count(),
+            "data": ws.query.page(0, PAGE_SIZE),
+            **partial_flag(ws)
         })
     except Exception as e:
         return Response({"status": "error", "message": str(e)}, status=400)
 
 @api_view(['GET'])
 def get_stats(request):
-    global CURRENT_DATA
-    if not CURRENT_DATA:
+    ws = get_workspace(request)
+    if ws is None or not ws.query.count():
         return Response({"status": "error", "message": "Aucune donnée"}, status=400)
     
     try:
-        report = my_stats.analyze_structure(CURRENT_DATA)
-        return Response({"status": "success", "report": report})
+        query = ws.query
+        # Pendant un chargement progressif, le rapport ne porte que sur le début du fichier
+        return run_job(request, "stats", lambda: {"report": query.stats()}, **partial_flag(ws))
+    except Exception as e:
+        return Response({"status": "error", "message": str(e)}, status=400)
+
+@api_view(['POST'])
+def group_by(request):
+    """
+    Agrège la vue par groupes.
+    - keys : colonnes de regroupement
+    - aggregations : [{op, field, name}], op parmi count, sum, mean, min, max, distinct
+    - order : {field: nom d'agrégation, reverse} pour trier les groupes (sinon ordre des clés)
+    - offset / limit : fenêtre de groupes renvoyée
+    """
+    ws = get_workspace(request)
+    if ws is None or not ws.base:
+        return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+
+    keys = request.data.get('keys') or []
+    if isinstance(keys, str):
+        keys = [keys]
+    try:
+        offset = int(request.data.get('offset', 0))
+        limit = int(request.data.get('limit', MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return Response({"status": "error", "message": "offset et limit doivent être des entiers"}, status=400)
+    if offset < 0 or not 0 < limit <= MAX_PAGE_SIZE:
+        return Response({"status": "error", "message": f"offset >= 0 et 0 < limit <= {MAX_PAGE_SIZE}"}, status=400)
+
+    try:
+        aggregations = my_groupby.parse_aggregations(request.data.get('aggregations'))
+        order = request.data.get('order')
+        if order is not None:
+            order = (order.get('field'), utils.is_true(order.get('reverse', False)))
+        base, rows = ws.base, ws.query.row_ids()
+
+        def group():
+            count, data = my_groupby.group_by(base, keys, aggregations, rows=rows, order=order,
+                                              offset=offset, limit=limit)
+            return {"groups": count, "data": data}
+
+        return run_job(request, "groupby", group, **partial_flag(ws))
+    except Exception as e:
+        return Response({"status": "error", "message": str(e)}, status=400)
+
+@api_view(['GET'])
+def get_schema(request):
+    """
+    Types de chaque colonne de la vue courante (et des éléments des listes).
+    - confidence : lecture des colonnes hétérogènes sur un échantillon (ex. 0.99)
+    """
+    ws = get_workspace(request)
+    if ws is None:
+        return Response({"status": "error", "message": "Aucune donnée chargée"}, status=400)
+
+    try:
+        confidence = request.query_params.get('confidence', config.SCHEMA_SAMPLE_CONFIDENCE)
+        confidence = None if confidence is None else float(confidence)
+        return Response({"status": "success", **ws.query.schema(confidence).to_dict(), **partial_flag(ws)})
     except Exception as e:
         return Response({"status": "error", "message": str(e)}, status=400)
 
 @api_view(['POST'])
 def save_file(request):
-    global CURRENT_DATA
     path = request.data.get('path')
+    ws = get_workspace(request)
     
-    if not CURRENT_DATA:
+    if ws is None or not ws.query.count():
         return Response({"status": "error", "message": "Rien à sauvegarder"}, status=400)
         
     try:
-        output_path = fm.save_data(CURRENT_DATA, path)
-        return Response({"status": "success", "path": output_path})
+        compression = request.data.get('compression')
+        compact = bool(request.data.get('compact'))
+
+        def save():
+            # Un export porte toujours sur le fichier complet : on attend la fin d'un chargement progressif
+            loaded = wait_loaded(ws)
+            # Export direct depuis le fichier chargé, dans l'ordre de la vue : aucune copie des données
+            return {"path": fm.save_data(loaded.base, path, indices=loaded.query.ordered_ids(),
+                                         compression=compression, compact=compact)}
+
+        return run_job(request, "save", save)
     except Exception as e:
         return Response({"status": "error", "message": str(e)}, status=400)
     
+@api_view(['GET', 'DELETE'])
+def job_status(request, job_id):
+    """Suivi d'une tâche en arrière-plan (GET) ou demande d'annulation (DELETE)"""
+    job = JOBS.cancel(job_id) if request.method == 'DELETE' else JOBS.get(job_id)
+    if job is None:
+        return Response({"status": "error", "message": "Tâche introuvable"}, status=404)
+    return Response({"status": "success", **job.to_dict()})
+
+@api_view(['GET', 'DELETE'])
+def cache_status(request):
+    """Compteurs du cache de résultats (GET) ou vidage du cache (DELETE)"""
+    cache = my_cache.get_cache()
+    if cache is None:
+        return Response({"status": "error", "message": "Cache de résultats désactivé"}, status=404)
+    if request.method == 'DELETE':
+        cache.clear()
+    return Response({"status": "success", **cache.metrics()})
+
+@api_view(['GET'])
+def metrics(request):
+    """Mesures de performance au format texte Prometheus (durées par endpoint et par phase, lignes, octets lus, mémoire)"""
+    return HttpResponse(my_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 @api_view(['POST'])
 def preview_file(request):
     """Renvoie les 10 premières lignes du fichier brut pour prévisualisation"""
@@ -120,6 +446,14 @@ def preview_file(request):
         if not os.path.exists(full_path):
             return Response({"status": "error", "message": "Fichier introuvable"}, status=404)
 
+        if fm.is_binary(full_path):
+            # Parquet / Arrow : on montre les premières lignes décodées
+            records = fm.preview_records(full_path)
+            return Response({
+                "status": "success",
+                "preview": "\n".join(json.dumps(r, ensure_ascii=False, default=str) for r in records)
+            })
+
         preview_lines = []
         with open(full_path, 'r', encoding='utf-8') as f:
             for _ in range(5):